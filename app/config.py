@@ -8,14 +8,116 @@ API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
 API_PORT: int = int(os.getenv("API_PORT", "8000"))
 
 DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./radprogressor.db")
+SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_MB: int = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+SQLITE_MMAP_SIZE_MB: int = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
 
 CV_MODEL_NAME: str = os.getenv("CV_MODEL_NAME", "densenet121")
+CV_MODEL_VERSION: str = os.getenv("CV_MODEL_VERSION", "1")
+CV_BACKEND: str = os.getenv("CV_BACKEND", "eager")
+CV_NUM_THREADS: int = int(os.getenv("CV_NUM_THREADS", "0"))
+CV_BACKEND_MAX_DRIFT: float = float(os.getenv("CV_BACKEND_MAX_DRIFT", "0.05"))
+# Real images for the backend drift check and int8_static calibration;
+# random inputs when unset.
+CV_CALIBRATION_DIR: str = os.getenv("CV_CALIBRATION_DIR", "")
+CV_CALIBRATION_IMAGES: int = int(os.getenv("CV_CALIBRATION_IMAGES", "32"))
 NLP_MODEL_NAME: str = os.getenv("NLP_MODEL_NAME", "emilyalsentzer/Bio_ClinicalBERT")
+NLP_MODE: str = os.getenv("NLP_MODE", "rules")
+NLP_MAX_LENGTH: int = int(os.getenv("NLP_MAX_LENGTH", "512"))
+NLP_BATCH_SIZE: int = int(os.getenv("NLP_BATCH_SIZE", "32"))
+NLP_BATCHING_ENABLED: bool = os.getenv("NLP_BATCHING_ENABLED", "true").lower() == "true"
+NLP_MAX_BATCH_WAIT_MS: float = float(os.getenv("NLP_MAX_BATCH_WAIT_MS", "5"))
+SHARED_WEIGHTS_ENABLED: bool = (
+    os.getenv("SHARED_WEIGHTS_ENABLED", "false").lower() == "true"
+)
+SHARED_WEIGHTS_DIR: str = os.getenv("SHARED_WEIGHTS_DIR", "./data/weights")
 
 OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+GENAI_ENABLED: bool = (
+    os.getenv("GENAI_ENABLED", str(bool(OPENAI_API_KEY))).lower() == "true"
+)
+GENAI_BASE_URL: str = os.getenv("GENAI_BASE_URL", "https://api.openai.com/v1")
+GENAI_MODEL: str = os.getenv("GENAI_MODEL", "gpt-4o-mini")
+GENAI_MAX_TOKENS: int = int(os.getenv("GENAI_MAX_TOKENS", "160"))
+GENAI_TIMEOUT_S: float = float(os.getenv("GENAI_TIMEOUT_S", "8"))
+GENAI_MAX_CONCURRENCY: int = int(os.getenv("GENAI_MAX_CONCURRENCY", "8"))
+GENAI_MAX_CONNECTIONS: int = int(os.getenv("GENAI_MAX_CONNECTIONS", "16"))
+GENAI_CACHE_ITEMS: int = int(os.getenv("GENAI_CACHE_ITEMS", "4096"))
+GENAI_LABEL_DECIMALS: int = int(os.getenv("GENAI_LABEL_DECIMALS", "2"))
 
-DEFAULT_ALPHA: float = 0.7
-DEFAULT_BETA: float = 0.3
+CV_BATCHING_ENABLED: bool = os.getenv("CV_BATCHING_ENABLED", "true").lower() == "true"
+CV_MAX_BATCH_SIZE: int = int(os.getenv("CV_MAX_BATCH_SIZE", "16"))
+CV_MAX_BATCH_WAIT_MS: float = float(os.getenv("CV_MAX_BATCH_WAIT_MS", "10"))
+
+IO_POOL_SIZE: int = int(os.getenv("IO_POOL_SIZE", "8"))
+DECODE_POOL_KIND: str = os.getenv("DECODE_POOL_KIND", "thread")
+DECODE_POOL_SIZE: int = int(
+    os.getenv("DECODE_POOL_SIZE", str(min(4, os.cpu_count() or 1)))
+)
+INFERENCE_POOL_SIZE: int = int(os.getenv("INFERENCE_POOL_SIZE", str(CV_MAX_BATCH_SIZE)))
+
+JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+JOB_SPOOL_DIR: str = os.getenv("JOB_SPOOL_DIR", "./data/jobs")
+JOB_RETENTION_HOURS: float = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Running jobs heartbeat every quarter of this, so it only needs to cover a few
+# missed beats; a restarted process's jobs are requeued once it has passed.
+JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", "60"))
+JOB_JANITOR_INTERVAL_S: float = float(os.getenv("JOB_JANITOR_INTERVAL_S", "15"))
+JOB_EVENTS_POLL_MS: float = float(os.getenv("JOB_EVENTS_POLL_MS", "250"))
+
+WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_BATCH_SIZES = [
+    int(size)
+    for size in os.getenv("WARMUP_BATCH_SIZES", f"1,{CV_MAX_BATCH_SIZE}").split(",")
+    if size.strip()
+]
+
+DICOM_MAX_BYTES: int = int(os.getenv("DICOM_MAX_BYTES", str(128 * 1024 * 1024)))
+DICOM_MAX_FRAME_PIXELS: int = int(os.getenv("DICOM_MAX_FRAME_PIXELS", str(8192 * 8192)))
+DICOM_ALLOWED_MODALITIES = [
+    m.strip().upper()
+    for m in os.getenv("DICOM_ALLOWED_MODALITIES", "CR,DX,OT").split(",")
+    if m.strip()
+]
+DICOM_DECODE_TARGET_SIZE: int = int(os.getenv("DICOM_DECODE_TARGET_SIZE", "224"))
+DICOM_TRACE_MEMORY: bool = os.getenv("DICOM_TRACE_MEMORY", "false").lower() == "true"
+# Batch upload archives are expanded in memory; larger ones are rejected.
+ARCHIVE_MAX_MEMBERS: int = int(os.getenv("ARCHIVE_MAX_MEMBERS", "10000"))
+ARCHIVE_MAX_BYTES: int = int(os.getenv("ARCHIVE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+CV_CACHE_ENABLED: bool = os.getenv("CV_CACHE_ENABLED", "true").lower() == "true"
+CV_CACHE_MEMORY_ITEMS: int = int(os.getenv("CV_CACHE_MEMORY_ITEMS", "2048"))
+CV_CACHE_MAX_ROWS: int = int(os.getenv("CV_CACHE_MAX_ROWS", "100000"))
+RESPONSE_CACHE_ITEMS: int = int(os.getenv("RESPONSE_CACHE_ITEMS", "1024"))
+
+TENSOR_STORE_ENABLED: bool = (
+    os.getenv("TENSOR_STORE_ENABLED", "false").lower() == "true"
+)
+TENSOR_STORE_DIR: str = os.getenv("TENSOR_STORE_DIR", "./data/tensors")
+TENSOR_STORE_DTYPE: str = os.getenv("TENSOR_STORE_DTYPE", "float32")
+TENSOR_STORE_CHUNK_ROWS: int = int(os.getenv("TENSOR_STORE_CHUNK_ROWS", "4096"))
+# A row is indexed only when its analysis commits, so compaction leaves chunks
+# written to more recently than this alone; keep it above the longest analysis.
+TENSOR_STORE_COMPACT_GRACE_SECONDS: float = float(
+    os.getenv("TENSOR_STORE_COMPACT_GRACE_SECONDS", "3600")
+)
+
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./data/profiles")
+PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MAX_BYTES: int = int(os.getenv("PROFILE_MAX_BYTES", str(256 * 1024 * 1024)))
+PROFILE_TOKEN: Optional[str] = os.getenv("PROFILE_TOKEN") or None
+
+# Progression score weights for new studies; scripts/rescore.py applies new
+# weights to stored studies.
+DEFAULT_ALPHA: float = float(os.getenv("DEFAULT_ALPHA", "0.7"))
+DEFAULT_BETA: float = float(os.getenv("DEFAULT_BETA", "0.3"))
+TREND_EWMA_ALPHA: float = float(os.getenv("TREND_EWMA_ALPHA", "0.3"))
 
 CHEST_XRAY_LABELS = [
     "atelectasis",
@@ -1,13 +1,69 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+import asyncio
+import functools
+import hashlib
+import itertools
 import json
+import logging
 
 from app.schemas.io import AnalyzeRequest, StudyAnalysis, PatientTimeline, PatientSnapshot
-from app.services.parsing import load_image
-from app.services.inference import analyze_study
-from app.services.storage import get_timeline, get_last_study
-from app.models.progression import trend_summary
+from app.config import (
+    ARCHIVE_MAX_BYTES,
+    ARCHIVE_MAX_MEMBERS,
+    CV_MAX_BATCH_SIZE,
+    JOB_EVENTS_POLL_MS,
+    PROFILING_ENABLED,
+    WARMUP_ON_STARTUP,
+)
+from app.services.parsing import (
+    ImageValidationError,
+    load_pixels,
+    read_archive,
+    parse_manifest,
+    find_manifest,
+    match_file,
+)
+from app.services.inference import analyze_study, analyze_study_batch, order_studies
+from app.services.storage import (
+    DEFAULT_TIMELINE_FIELDS,
+    get_patient_version,
+    get_snapshot,
+    iter_timeline,
+    timeline_page,
+)
+from app.services.batching import batcher_stats
+from app.services.cache import cache_stats, get_response_cache
+from app.services.cohort import cohort_progression
+from app.services.executors import run_in_pool, shutdown_executors
+from app.services.genai_client import close_summary_client, genai_stats
+from app.services.jobs import TERMINAL_STATUSES, get_job, get_job_runner
+from app.services.memory import memory_metrics, memory_report
+from app.services.metrics import MetricsMiddleware, register_collector, render, span
+from app.services.profiling import (
+    PROFILE_HEADER,
+    Profiler,
+    get_profiler,
+    profiling_requested,
+)
+from app.services.warmup import mark_ready, readiness, warm_up
+from app.models.progression import slope_per_year, summarize_trend
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="RadProgressor API", version="0.1.0")
 
@@ -18,17 +74,124 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+def _cache_metrics() -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+    stats = cache_stats()
+    caches = {"responses": (stats["responses"]["hits"], stats["responses"]["misses"])}
+    if stats["cv"] is not None:
+        cv = stats["cv"]
+        caches["cv"] = (cv["memory_hits"] + cv["sqlite_hits"], cv["misses"])
+    genai = genai_stats()
+    if genai.get("enabled", True):
+        caches["genai"] = (genai["cache"]["hits"], genai["cache"]["misses"])
+    return [
+        (
+            "radprogressor_cache_hits_total",
+            "counter",
+            "Cache hits.",
+            [({"cache": name}, hits) for name, (hits, _) in caches.items()],
+        ),
+        (
+            "radprogressor_cache_misses_total",
+            "counter",
+            "Cache misses.",
+            [({"cache": name}, misses) for name, (_, misses) in caches.items()],
+        ),
+        (
+            "radprogressor_cache_hit_ratio",
+            "gauge",
+            "Cache hits over lookups since start.",
+            [
+                ({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+                for name, (hits, misses) in caches.items()
+            ],
+        ),
+    ]
+
+register_collector(_cache_metrics)
+register_collector(memory_metrics)
 
 @app.on_event("startup")
 async def startup_event():
-    pass
+    await run_in_pool("io", get_job_runner().start)
+    if not WARMUP_ON_STARTUP:
+        mark_ready()
+        return
+    # Warm up in the background so /api/health answers while /api/ready
+    # reports 503 until the models are loaded and exercised.
+    app.state.warmup = asyncio.ensure_future(run_in_pool("inference", warm_up))
+    app.state.warmup.add_done_callback(_log_warmup_failure)
+
+def _log_warmup_failure(task: "asyncio.Future") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Startup warm-up failed: %s", task.exception())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Running jobs are left as they are; the next start requeues them.
+    get_job_runner().stop(wait=False)
+    shutdown_executors(wait=False)
+    close_summary_client()
 
 @app.get("/api/health")
 async def health_check():
     return {"ok": True}
 
+@app.get("/api/ready")
+async def ready_check():
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/api/batching/stats")
+async def get_batching_stats():
+    return batcher_stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return cache_stats()
+
+@app.get("/api/genai/stats")
+async def get_genai_stats():
+    return genai_stats()
+
+@app.get("/api/memory")
+async def get_memory():
+    return memory_report()
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return Response(render(), media_type="text/plain; version=0.0.4")
+
+def _profile_admin(request: Request) -> Profiler:
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
+    profiler = get_profiler()
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        raise HTTPException(
+            status_code=403, detail="X-Profile must carry PROFILE_TOKEN"
+        )
+    return profiler
+
+@app.post("/api/profiles/arm")
+async def arm_profiles(request: Request, count: int = Query(1, ge=0, le=100)):
+    return {"armed": _profile_admin(request).arm(count)}
+
+@app.get("/api/profiles")
+async def list_profiles(request: Request):
+    return {"profiles": _profile_admin(request).list()}
+
+@app.get("/api/profiles/{name}")
+async def download_profile(request: Request, name: str):
+    path = _profile_admin(request).path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
 @app.post("/api/analyze")
 async def analyze(
+    request: Request,
+    response: Response,
     patient_id: str = Form(...),
     study_date: str = Form(...),
     image: UploadFile = File(...),
@@ -36,37 +199,364 @@ async def analyze(
 ):
     try:
         image_content = await image.read()
-        pil_image, _ = load_image(image_content, image.filename)
+        with span("load_image"):
+            pixels = await run_in_pool(
+                "decode", load_pixels, image_content, image.filename
+            )
         
-        result = analyze_study(patient_id, study_date, pil_image, report or "")
+        run, profile_ids = analyze_study, []
+        if profiling_requested(request.headers.get(PROFILE_HEADER)):
+            run = get_profiler().wrap(analyze_study, "analyze", profile_ids.append)
+        result = await run_in_pool(
+            "inference", run, patient_id, study_date, pixels, report or ""
+        )
+        if profile_ids:
+            response.headers["X-Profile-Id"] = profile_ids[0]
         
         return result
+    except ImageValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    patient_id: str = Form(...),
+    study_date: str = Form(...),
+    image: UploadFile = File(...),
+    report: Optional[str] = Form(None)
+):
+    try:
+        image_content = await image.read()
+        job = await run_in_pool(
+            "io",
+            get_job_runner().submit,
+            patient_id,
+            study_date,
+            image_content,
+            image.filename,
+            report or "",
+        )
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/jobs/{job['job_id']}",
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await run_in_pool("io", get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    job = await run_in_pool("io", get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(_job_events(job_id, job), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+async def _job_events(job_id: str, job: Optional[Dict[str, Any]]) -> AsyncIterator[str]:
+    # Poll the job row and emit an event whenever status or stage changes,
+    # ending with the full job once it reaches a terminal status.
+    last = None
+    while job is not None:
+        state = (job["status"], job["stage"])
+        if job["status"] in TERMINAL_STATUSES:
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            return
+        if state != last:
+            last = state
+            progress = {"job_id": job_id, "status": state[0], "stage": state[1]}
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+        await asyncio.sleep(JOB_EVENTS_POLL_MS / 1000)
+        job = await run_in_pool("io", get_job, job_id)
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(
+    images: List[UploadFile] = File(default=[]),
+    archive: Optional[UploadFile] = File(None),
+    manifest: Optional[str] = Form(None)
+):
+    try:
+        files: Dict[str, bytes] = {}
+        for upload in images:
+            files[upload.filename] = await upload.read()
+        if archive is not None:
+            files.update(
+                await run_in_pool(
+                    "decode",
+                    read_archive,
+                    await archive.read(),
+                    archive.filename,
+                    ARCHIVE_MAX_MEMBERS,
+                    ARCHIVE_MAX_BYTES,
+                )
+            )
+        if manifest:
+            studies = parse_manifest(manifest)
+        else:
+            manifest_name, manifest_content = find_manifest(files)
+            studies = parse_manifest(manifest_content, manifest_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        _stream_batch(files, order_studies(studies)), media_type="application/x-ndjson"
+    )
+
+def _ndjson(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload) + "\n"
+
+def _batch_error(study: Dict[str, Any], error: Exception) -> str:
+    return _ndjson({
+        "filename": study["filename"],
+        "patient_id": study["patient_id"],
+        "study_date": study["study_date"],
+        "error": str(error)
+    })
+
+async def _decode_entry(files: Dict[str, bytes], study: Dict[str, Any]):
+    return await run_in_pool(
+        "decode", load_pixels, match_file(files, study["filename"]), study["filename"]
+    )
+
+async def _stream_batch(
+    files: Dict[str, bytes], studies: List[Dict[str, Any]]
+) -> AsyncIterator[str]:
+    for start in range(0, len(studies), CV_MAX_BATCH_SIZE):
+        chunk = studies[start:start + CV_MAX_BATCH_SIZE]
+        images = await asyncio.gather(
+            *(_decode_entry(files, study) for study in chunk), return_exceptions=True
+        )
+
+        ready = []
+        for study, image in zip(chunk, images):
+            if isinstance(image, Exception):
+                yield _batch_error(study, image)
+            else:
+                ready.append({**study, "image": image})
+
+        try:
+            results = await run_in_pool("inference", analyze_study_batch, ready)
+        except Exception as e:
+            for study in ready:
+                yield _batch_error(study, e)
+            continue
+
+        for study, result in zip(ready, results):
+            yield _ndjson({"filename": study["filename"], **result})
+
+def _not_modified(request: Request, etag: str,
+                  last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+async def _conditional_json(request: Request, patient_id: str, view: str, params: Tuple,
+                            build: Callable[[], Any]) -> Optional[Response]:
+    """Serve ``build()`` as JSON with validators from the patient's version stamp.
+
+    An unchanged patient costs one primary-key lookup: a 304 when the client's
+    ``If-None-Match``/``If-Modified-Since`` still matches, otherwise the cached
+    body for this view, version and parameters. Returns None if ``build``
+    finds nothing.
+
+    HTTP dates only have one-second granularity, so ``Last-Modified`` is sent
+    (and ``If-Modified-Since`` honoured) only once the second of the last write
+    is over; until then another write could land under the same date, and the
+    ETag is the only validator.
+    """
+    stamp = await run_in_pool("io", get_patient_version, patient_id)
+    if stamp is None:
+        content = await run_in_pool("io", build)
+        return None if content is None else JSONResponse(content)
+
+    version, updated_at = stamp
+    key = (view, patient_id, version, params)
+    etag = '"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+    last_modified: Optional[datetime] = updated_at.replace(
+        microsecond=0, tzinfo=timezone.utc
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified < datetime.now(timezone.utc).replace(microsecond=0):
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    else:
+        last_modified = None
+
+    cache = get_response_cache()
+    if _not_modified(request, etag, last_modified):
+        cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    body = cache.get(key)
+    if body is None:
+        content = await run_in_pool("io", build)
+        if content is None:
+            return None
+        body = JSONResponse(content).body
+        cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _timeline_lines(
+    first: Optional[Tuple[str, Dict[str, Any]]],
+    rows: Generator[Tuple[str, Dict[str, Any]], None, None],
+    limit: Optional[int],
+) -> Iterator[str]:
+    previous = None
+    try:
+        for count, (cursor, entry) in enumerate(
+            itertools.chain([first] if first else [], rows)
+        ):
+            if limit is not None and count == limit:
+                yield _ndjson({"next_cursor": previous})
+                return
+            previous = cursor
+            yield _ndjson(entry)
+    finally:
+        rows.close()
+
 @app.get("/api/patient/{patient_id}/timeline")
-async def get_patient_timeline(patient_id: str):
+async def get_patient_timeline(
+    request: Request,
+    patient_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    selected = (
+        tuple(field.strip() for field in fields.split(",") if field.strip())
+        if fields
+        else DEFAULT_TIMELINE_FIELDS
+    )
     try:
-        timeline = get_timeline(patient_id)
-        return {"patient_id": patient_id, "timeline": timeline}
+        if format == "ndjson":
+            # Validate the fields and cursor before the response starts.
+            rows = iter_timeline(
+                patient_id,
+                selected,
+                since,
+                until,
+                cursor,
+                None if limit is None else limit + 1,
+            )
+            first = await run_in_pool("io", next, rows, None)
+            return StreamingResponse(
+                _timeline_lines(first, rows, limit), media_type="application/x-ndjson"
+            )
+
+        def build() -> Dict[str, Any]:
+            timeline, next_cursor = timeline_page(
+                patient_id, selected, since, until, cursor, limit
+            )
+            return {
+                "patient_id": patient_id,
+                "timeline": timeline,
+                "next_cursor": next_cursor,
+            }
+
+        return await _conditional_json(
+            request,
+            patient_id,
+            "timeline",
+            (selected, since, until, cursor, limit),
+            build,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _snapshot(patient_id: str) -> Optional[Dict[str, Any]]:
+    snapshot = get_snapshot(patient_id)
+    if snapshot is None:
+        return None
+    last_study, trend = snapshot
+    return {
+        "patient_id": patient_id,
+        "last_study": last_study,
+        "timeline_summary": {
+            **summarize_trend(trend),
+            "study_count": trend["study_count"],
+            "first_date": trend["first_date"],
+            "last_date": trend["last_date"],
+            "ewma": trend["ewma"],
+            "slope_per_year": slope_per_year(trend)
+        }
+    }
+
 @app.get("/api/patient/{patient_id}/snapshot")
-async def get_patient_snapshot(patient_id: str):
+async def get_patient_snapshot(request: Request, patient_id: str):
     try:
-        last_study = get_last_study(patient_id)
-        if not last_study:
+        response = await _conditional_json(
+            request,
+            patient_id,
+            "snapshot",
+            (),
+            functools.partial(_snapshot, patient_id),
+        )
+        if response is None:
             raise HTTPException(status_code=404, detail="No studies found for patient")
-        
-        timeline = get_timeline(patient_id)
-        trend = trend_summary([(entry["date"], entry["progression_score"]) for entry in timeline])
-        
-        return {
-            "patient_id": patient_id,
-            "last_study": last_study,
-            "timeline_summary": trend
-        }
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/cohort/progression")
+async def get_cohort_progression(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    window_days: int = 30,
+    rolling_studies: int = 3,
+    min_studies: int = 2,
+    min_window_delta: Optional[float] = None,
+    max_window_delta: Optional[float] = None,
+    min_slope: Optional[float] = None,
+    max_slope: Optional[float] = None,
+    label: Optional[str] = None,
+    min_label_slope: Optional[float] = None,
+    sort_by: str = "window_delta",
+    descending: bool = True,
+    limit: int = 100,
+    offset: int = 0
+):
+    try:
+        return await run_in_pool(
+            "io",
+            cohort_progression,
+            since=since,
+            until=until,
+            window_days=window_days,
+            rolling_studies=rolling_studies,
+            sort_by=sort_by,
+            descending=descending,
+            limit=limit,
+            offset=offset,
+            min_studies=min_studies,
+            min_window_delta=min_window_delta,
+            max_window_delta=max_window_delta,
+            min_slope=min_slope,
+            max_slope=max_slope,
+            label=label,
+            min_label_slope=min_label_slope,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
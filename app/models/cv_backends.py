@@ -0,0 +1,164 @@
+import inspect
+import os
+import tempfile
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+BACKENDS = (
+    "eager",
+    "channels_last",
+    "int8_dynamic",
+    "int8_static",
+    "torchscript",
+    "compile",
+    "onnx",
+)
+
+Runner = Callable[[torch.Tensor], torch.Tensor]
+
+
+def set_num_threads(num_threads: int) -> None:
+    if num_threads > 0 and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+
+def example_batch(
+    batch_size: int = 2, image_size: int = 224, seed: int = 0
+) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randn(batch_size, 3, image_size, image_size, generator=generator)
+
+
+def build_backend(
+    model: nn.Module,
+    backend: str,
+    calibration: Optional[torch.Tensor] = None,
+    num_threads: int = 0,
+) -> Runner:
+    """Return a callable mapping a normalized ``Nx3xHxW`` batch to logits.
+
+    ``model`` must already be in eval mode. The ``channels_last`` backend
+    converts its weights in place; every other backend leaves it untouched.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unsupported CV backend: {backend} (choose from {', '.join(BACKENDS)})"
+        )
+    set_num_threads(num_threads)
+
+    if backend == "eager":
+        return _no_grad(model)
+
+    if backend == "channels_last":
+        model = model.to(memory_format=torch.channels_last)
+        runner = _no_grad(model)
+        return lambda x: runner(x.contiguous(memory_format=torch.channels_last))
+
+    if backend == "int8_dynamic":
+        # Dynamic quantization covers Linear/RNN layers only: for the CNN
+        # backbones this quantizes the classifier head.
+        quantized = torch.ao.quantization.quantize_dynamic(
+            model, {nn.Linear}, dtype=torch.qint8
+        )
+        return _no_grad(quantized)
+
+    if backend == "int8_static":
+        return _no_grad(
+            _quantize_static(
+                model, calibration if calibration is not None else example_batch(8)
+            )
+        )
+
+    if backend == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example_batch(1), check_trace=False)
+            frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+        return _no_grad(frozen)
+
+    if backend == "compile":
+        return _no_grad(torch.compile(model, dynamic=True))
+
+    return _onnx_runner(model, num_threads)
+
+
+def _no_grad(module: Callable[[torch.Tensor], torch.Tensor]) -> Runner:
+    def run(x: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return module(x)
+    return run
+
+
+def _quantize_static(model: nn.Module, calibration: torch.Tensor) -> nn.Module:
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = torch.backends.quantized.engine
+    prepared = prepare_fx(
+        model, get_default_qconfig_mapping(engine), example_inputs=(calibration[:1],)
+    )
+    with torch.no_grad():
+        for start in range(0, len(calibration), 4):
+            prepared(calibration[start:start + 4])
+    return convert_fx(prepared)
+
+
+def _onnx_runner(model: nn.Module, num_threads: int) -> Runner:
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The onnx CV backend requires the onnxruntime package") from e
+
+    handle, path = tempfile.mkstemp(suffix=".onnx", prefix="cv-model-")
+    os.close(handle)
+    try:
+        with torch.no_grad():
+            export_kwargs = (
+                {"dynamo": False}
+                if "dynamo" in inspect.signature(torch.onnx.export).parameters
+                else {}
+            )
+            torch.onnx.export(
+                model,
+                (example_batch(1),),
+                path,
+                input_names=["input"],
+                output_names=["logits"],
+                dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+                **export_kwargs,
+            )
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+    finally:
+        os.remove(path)
+
+    def run(x: torch.Tensor) -> torch.Tensor:
+        (logits,) = session.run(["logits"], {"input": x.contiguous().numpy()})
+        return torch.from_numpy(logits)
+    return run
+
+
+def drift_report(
+    reference: Runner, candidate: Runner, inputs: torch.Tensor
+) -> Dict[str, float]:
+    """Compare sigmoid probabilities of ``candidate`` against ``reference``."""
+    expected = torch.sigmoid(reference(inputs)).float().numpy()
+    actual = torch.sigmoid(candidate(inputs)).float().numpy()
+    diff = np.abs(expected - actual)
+    return {
+        "max_abs_prob_diff": float(diff.max()),
+        "mean_abs_prob_diff": float(diff.mean()),
+        "top_label_agreement": float(
+            (expected.argmax(axis=1) == actual.argmax(axis=1)).mean()
+        ),
+        "severity_max_abs_diff": float(
+            np.abs(expected.max(axis=1) - actual.max(axis=1)).max()
+        ),
+    }
@@ -1,20 +1,54 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torchvision.transforms as transforms
 from torchvision.models import densenet121, resnet50
 from PIL import Image
 import numpy as np
-from typing import Dict, Tuple
-from app.config import CHEST_XRAY_LABELS
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from app.config import (
+    CHEST_XRAY_LABELS,
+    CV_BACKEND,
+    CV_BACKEND_MAX_DRIFT,
+    CV_CALIBRATION_DIR,
+    CV_CALIBRATION_IMAGES,
+    CV_MODEL_NAME,
+    CV_MODEL_VERSION,
+    CV_NUM_THREADS,
+    SHARED_WEIGHTS_ENABLED,
+)
+from app.models.cv_backends import Runner, build_backend, drift_report, example_batch
+from app.models.shared_weights import load_shared
+from app.services.metrics import MODEL_LOAD_SECONDS, span
+from app.services.parsing import load_pixels_file
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZE = 224
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+ImageInput = Union[Image.Image, np.ndarray]
+
+CALIBRATION_SUFFIXES = (".png", ".jpg", ".jpeg", ".dcm")
 
 class ChestXRayModel(nn.Module):
-    def __init__(self, num_classes: int = 5, model_name: str = "densenet121"):
+    def __init__(
+        self,
+        num_classes: int = 5,
+        model_name: str = "densenet121",
+        pretrained: bool = True,
+    ):
         super().__init__()
         if model_name == "densenet121":
-            self.backbone = densenet121(pretrained=True)
+            self.backbone = densenet121(pretrained=pretrained)
             self.backbone.classifier = nn.Linear(self.backbone.classifier.in_features, num_classes)
         elif model_name == "resnet50":
-            self.backbone = resnet50(pretrained=True)
+            self.backbone = resnet50(pretrained=pretrained)
             self.backbone.fc = nn.Linear(self.backbone.fc.in_features, num_classes)
         else:
             raise ValueError(f"Unsupported model: {model_name}")
@@ -26,32 +60,174 @@ class ChestXRayModel(nn.Module):
         return self.backbone(x)
 
 _cv_model = None
+_cv_runner = None
+_cv_backend: Optional[str] = None
+_cv_runner_lock = threading.Lock()
 
 def get_cv_model() -> ChestXRayModel:
     global _cv_model
     if _cv_model is None:
-        _cv_model = ChestXRayModel()
+        if SHARED_WEIGHTS_ENABLED:
+            _cv_model = load_shared(
+                f"cv-{CV_MODEL_NAME}-v{CV_MODEL_VERSION}",
+                lambda: ChestXRayModel(model_name=CV_MODEL_NAME),
+                lambda: ChestXRayModel(model_name=CV_MODEL_NAME, pretrained=False),
+            )
+        else:
+            _cv_model = ChestXRayModel(model_name=CV_MODEL_NAME)
         _cv_model.eval()
     return _cv_model
 
+def calibration_batch(
+    directory: str = CV_CALIBRATION_DIR, limit: int = CV_CALIBRATION_IMAGES
+) -> torch.Tensor:
+    """Preprocessed images from ``directory``, or random inputs when it has none."""
+    paths = []
+    if directory:
+        if os.path.isdir(directory):
+            paths = sorted(
+                os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if name.lower().endswith(CALIBRATION_SUFFIXES)
+            )[:limit]
+        if not paths:
+            logger.warning(
+                "No calibration images in %s; using random inputs", directory
+            )
+    if not paths:
+        return example_batch(4)
+    return preprocess_batch([load_pixels_file(path) for path in paths])
+
+def _build_runner(model: ChestXRayModel, backend: str) -> Tuple[Runner, str]:
+    """The runner for ``backend`` and the backend it uses: eager on failed drift."""
+    if SHARED_WEIGHTS_ENABLED and backend in (
+        "channels_last",
+        "int8_dynamic",
+        "int8_static",
+        "onnx",
+    ):
+        logger.warning(
+            "CV backend %s converts the weights, so each worker keeps a private copy "
+            "despite SHARED_WEIGHTS_ENABLED",
+            backend,
+        )
+    reference = build_backend(model, "eager", num_threads=CV_NUM_THREADS)
+    if backend == "eager":
+        return reference, "eager"
+    inputs = calibration_batch()
+    expected = reference(inputs)
+    candidate = build_backend(
+        model, backend, calibration=inputs, num_threads=CV_NUM_THREADS
+    )
+    drift = drift_report(lambda _: expected, candidate, inputs)
+    logger.info(
+        "CV backend %s drift vs fp32 on %d images: %s", backend, len(inputs), drift
+    )
+    if drift["max_abs_prob_diff"] > CV_BACKEND_MAX_DRIFT:
+        logger.error(
+            "CV backend %s exceeds the allowed drift of %s; falling back to eager",
+            backend,
+            CV_BACKEND_MAX_DRIFT,
+        )
+        return reference, "eager"
+    return candidate, backend
+
+def get_cv_runner() -> Runner:
+    global _cv_runner, _cv_backend
+    if _cv_runner is None:
+        with _cv_runner_lock:
+            if _cv_runner is None:
+                started = time.perf_counter()
+                _cv_runner, _cv_backend = _build_runner(get_cv_model(), CV_BACKEND)
+                MODEL_LOAD_SECONDS.set(time.perf_counter() - started, "cv")
+    return _cv_runner
+
+def get_cv_backend() -> str:
+    """The backend serving predictions: ``CV_BACKEND``, or eager on failed drift."""
+    get_cv_runner()
+    return _cv_backend
+
+_pil_transform = transforms.Compose([
+    transforms.Grayscale(num_output_channels=3),
+    transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+])
+
+# Normalization folded into one multiply-add: x * (1 / std) - mean / std.
+_scale = (1.0 / torch.tensor(IMAGENET_STD)).view(1, 3, 1, 1)
+_shift = (-torch.tensor(IMAGENET_MEAN) / torch.tensor(IMAGENET_STD)).view(1, 3, 1, 1)
+
 def preprocess_image(image: Image.Image) -> torch.Tensor:
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=3),
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    return transform(image).unsqueeze(0)
-
-def predict(image: Image.Image) -> Tuple[Dict[str, float], float]:
-    model = get_cv_model()
-    tensor = preprocess_image(image)
-    
-    with torch.no_grad():
-        logits = model(tensor)
-        probs = torch.sigmoid(logits).squeeze().numpy()
-    
-    labels = {label: float(prob) for label, prob in zip(CHEST_XRAY_LABELS, probs)}
-    severity_score = float(max(probs))
-    
-    return labels, severity_score
+    return _pil_transform(image).unsqueeze(0)
+
+def to_pixels(image: ImageInput) -> np.ndarray:
+    if isinstance(image, Image.Image):
+        if image.mode != 'L':
+            image = image.convert('L')
+        return np.asarray(image, dtype=np.float32) / 255.0
+    return image
+
+def resize_batch(images: Sequence[ImageInput]) -> torch.Tensor:
+    """Resize grayscale ``[0, 1]`` pixel arrays to a ``Nx1x224x224`` float tensor."""
+    resized = torch.empty(len(images), 1, IMAGE_SIZE, IMAGE_SIZE)
+    for i, image in enumerate(images):
+        pixels = torch.from_numpy(
+            np.ascontiguousarray(to_pixels(image), dtype=np.float32)
+        )
+        if pixels.shape == (IMAGE_SIZE, IMAGE_SIZE):
+            resized[i, 0] = pixels
+        else:
+            resized[i] = F.interpolate(
+                pixels[None, None],
+                size=(IMAGE_SIZE, IMAGE_SIZE),
+                mode="bilinear",
+                align_corners=False,
+                antialias=True,
+            )[0]
+    return resized
+
+def normalize_batch(resized: torch.Tensor) -> torch.Tensor:
+    """Normalize a ``Nx1x224x224`` batch from ``resize_batch`` to ``Nx3x224x224``.
+
+    The single gray channel is broadcast against the per-channel ImageNet
+    statistics, so the three-channel tensor is materialized once, by the
+    normalization itself, rather than by copying the gray plane three times.
+    """
+    return torch.addcmul(_shift, resized.float(), _scale)
+
+def preprocess_batch(images: Sequence[ImageInput]) -> torch.Tensor:
+    return normalize_batch(resize_batch(images))
+
+def preprocess_array(pixels: np.ndarray) -> torch.Tensor:
+    return preprocess_batch([pixels])
+
+def _predictions(logits: torch.Tensor) -> List[Tuple[Dict[str, float], float]]:
+    probs = torch.sigmoid(logits).float().numpy()
+    results = []
+    for row in probs:
+        labels = {label: float(prob) for label, prob in zip(CHEST_XRAY_LABELS, row)}
+        results.append((labels, float(max(row))))
+    return results
+
+def predict_batch(images: Sequence[ImageInput]) -> List[Tuple[Dict[str, float], float]]:
+    runner = get_cv_runner()
+    with span("preprocess"):
+        tensor = preprocess_batch(images)
+
+    with span("cv_forward"):
+        logits = runner(tensor)
+    return _predictions(logits)
+
+def predict_resized(resized: torch.Tensor) -> List[Tuple[Dict[str, float], float]]:
+    """``predict_batch`` for planes already resized by ``resize_batch``.
+
+    These come from the tensor store, for example.
+    """
+    runner = get_cv_runner()
+    with span("cv_forward"):
+        logits = runner(normalize_batch(resized))
+    return _predictions(logits)
+
+def predict(image: ImageInput) -> Tuple[Dict[str, float], float]:
+    return predict_batch([image])[0]
@@ -1,18 +1,42 @@
-import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 SYSTEM = "You are a careful clinical writing assistant. Do not diagnose. Use hedging and uncertainty. Keep it concise."
 
+AUDIENCES = ("clinician", "patient")
+
 def summarize_clinician(findings: str, labels: Dict[str, float], trend: Dict[str, Any]) -> str:
-    if "OPENAI_API_KEY" not in os.environ:
-        return ("Impression (draft): Pattern suggests possible changes in the above labels. "
-                f"Recent trajectory is {trend['direction']} (Δ={trend['last_delta']}). "
-                "Correlate clinically and compare with prior imaging.")
-    return "LLM summary placeholder."
+    return (
+        "Impression (draft): Pattern suggests possible changes in the above labels. "
+        f"Recent trajectory is {trend['direction']} (Δ={trend['last_delta']}). "
+        "Correlate clinically and compare with prior imaging."
+    )
 
 def summarize_patient(findings: str, labels: Dict[str, float], trend: Dict[str, Any]) -> str:
-    if "OPENAI_API_KEY" not in os.environ:
-        return ("Plain-language note: Your recent chest images show signs that may relate to the lungs. "
-                f"Overall trend looks {trend['direction']}. This tool cannot give medical advice—"
-                "please talk to your clinician for interpretation.")
-    return "LLM summary placeholder."
+    return (
+        "Plain-language note: Your recent chest images show signs that may relate "
+        f"to the lungs. Overall trend looks {trend['direction']}. "
+        "This tool cannot give medical advice—"
+        "please talk to your clinician for interpretation."
+    )
+
+TEMPLATES = {"clinician": summarize_clinician, "patient": summarize_patient}
+
+def build_messages(
+    audience: str, findings: str, labels: Dict[str, float], trend: Dict[str, Any]
+) -> List[Dict[str, str]]:
+    label_text = ", ".join(
+        f"{label} {p:.2f}"
+        for label, p in sorted(labels.items(), key=lambda item: -item[1])
+    )
+    if audience == "clinician":
+        task = "Write a two-sentence draft impression for the referring clinician."
+    else:
+        task = (
+            "Write two plain-language sentences for the patient. "
+            "Avoid jargon and advise talking to their clinician."
+        )
+    prompt = (f"{task}\n"
+              f"Findings: {findings or 'not provided'}\n"
+              f"Model label probabilities: {label_text or 'none'}\n"
+              f"Trend: {trend['direction']} (last change {trend['last_delta']})")
+    return [{"role": "system", "content": SYSTEM}, {"role": "user", "content": prompt}]
@@ -1,48 +1,233 @@
 import re
-from typing import Dict, Tuple
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+from app.config import (
+    NLP_BATCH_SIZE,
+    NLP_MAX_LENGTH,
+    NLP_MODE,
+    NLP_MODEL_NAME,
+    SHARED_WEIGHTS_ENABLED,
+)
+from app.services.metrics import MODEL_LOAD_SECONDS
 
 _nlp_model = None
 _tokenizer = None
+_nlp_model_lock = threading.Lock()
+
+CHANGE_LABELS = ["improved", "stable", "worsened"]
+CHANGE_DELTAS = {"improved": -1, "stable": 0, "worsened": 1}
+
+CHANGE_WORDS = {
+    "improved": ["improved", "better", "resolved", "cleared", "decreased"],
+    "worsened": ["worsened", "worse", "increased", "progression", "deteriorated", "new"]
+}
+
+# A negation cue negates change words up to the end of its clause, so
+# "no new effusion" does not count "new" as a worsening. A comma ends the
+# clause too: in "no pneumothorax, new effusion" the "new" is not negated.
+NEGATION_CUES = [
+    "no evidence of",
+    "negative for",
+    "free of",
+    "absence of",
+    "without",
+    "not",
+    "no",
+]
+SCOPE_TERMINATORS = ["but", "however", "although", "though", "except", "whereas"]
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+|[.,;:!?\n]")
+_BOUNDARY_TOKENS = {".", ",", ";", ":", "!", "?", "\n"}
+
+def _compile_rules() -> (
+    Tuple[Dict[str, str], Dict[str, List[Tuple[Tuple[str, ...], str]]]]
+):
+    rules = {"negation": NEGATION_CUES, "terminator": SCOPE_TERMINATORS, **CHANGE_WORDS}
+    single: Dict[str, str] = {}
+    phrases: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+    for kind, words in rules.items():
+        for word in words:
+            first, *rest = word.lower().split()
+            if rest:
+                phrases.setdefault(first, []).append((tuple(rest), kind))
+            else:
+                single[first] = kind
+    for entries in phrases.values():
+        entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+    return single, phrases
+
+# One tokenizing regex plus dict lookups: a single pass over the report with
+# word boundaries for free, and multi-word cues matched by their first token.
+_SINGLE_RULES, _PHRASE_RULES = _compile_rules()
 
 def get_nlp_model():
     global _nlp_model, _tokenizer
     if _nlp_model is None:
-        model_name = "emilyalsentzer/Bio_ClinicalBERT"
-        _tokenizer = AutoTokenizer.from_pretrained(model_name)
-        _nlp_model = AutoModelForSequenceClassification.from_pretrained(
-            model_name, 
-            num_labels=3
-        )
-        _nlp_model.eval()
+        with _nlp_model_lock:
+            if _nlp_model is None:
+                started = time.perf_counter()
+                # The model is published last: callers check it, not the tokenizer.
+                model, _tokenizer = _load_nlp_model()
+                _nlp_model = model
+                MODEL_LOAD_SECONDS.set(time.perf_counter() - started, "nlp")
     return _nlp_model, _tokenizer
 
+def _load_nlp_model():
+    from transformers import (
+        AutoConfig,
+        AutoTokenizer,
+        AutoModelForSequenceClassification,
+    )
+    tokenizer = AutoTokenizer.from_pretrained(NLP_MODEL_NAME)
+    if SHARED_WEIGHTS_ENABLED:
+        from app.models.shared_weights import load_shared
+
+        config = AutoConfig.from_pretrained(
+            NLP_MODEL_NAME, num_labels=len(CHANGE_LABELS)
+        )
+        model = load_shared(
+            f"nlp-{NLP_MODEL_NAME}",
+            lambda: AutoModelForSequenceClassification.from_pretrained(
+                NLP_MODEL_NAME, num_labels=len(CHANGE_LABELS)
+            ),
+            lambda: AutoModelForSequenceClassification.from_config(config),
+        )
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(
+            NLP_MODEL_NAME,
+            num_labels=len(CHANGE_LABELS)
+        )
+    model.eval()
+    return model, tokenizer
+
 def extract_sections(text: str) -> Dict[str, str]:
     findings_match = re.search(r'FINDINGS?:?\s*(.*?)(?=IMPRESSION|CONCLUSION|$)', text, re.IGNORECASE | re.DOTALL)
     impression_match = re.search(r'IMPRESSION?:?\s*(.*?)(?=CONCLUSION|$)', text, re.IGNORECASE | re.DOTALL)
-    
+
     findings = findings_match.group(1).strip() if findings_match else ""
     impression = impression_match.group(1).strip() if impression_match else ""
-    
+
     return {"findings": findings, "impression": impression}
 
-def classify_change(text: str) -> Tuple[str, int]:
-    model, tokenizer = get_nlp_model()
-    
-    change_words = {
-        "improved": ["improved", "better", "resolved", "cleared", "decreased"],
-        "worsened": ["worsened", "worse", "increased", "progression", "deteriorated", "new"]
-    }
-    
-    text_lower = text.lower()
-    
-    improved_count = sum(1 for word in change_words["improved"] if word in text_lower)
-    worsened_count = sum(1 for word in change_words["worsened"] if word in text_lower)
-    
+def match_change_words(text: str) -> Dict[str, List[str]]:
+    """Return the non-negated change words found in ``text`` by category."""
+    found: Dict[str, List[str]] = {"improved": [], "worsened": []}
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    negated = False
+    i, n = 0, len(tokens)
+    while i < n:
+        token = tokens[i]
+        i += 1
+        if token in _BOUNDARY_TOKENS:
+            negated = False
+            continue
+        kind = None
+        for rest, phrase_kind in _PHRASE_RULES.get(token, ()):
+            if tuple(tokens[i:i + len(rest)]) == rest:
+                token = " ".join((token,) + rest)
+                kind = phrase_kind
+                i += len(rest)
+                break
+        if kind is None:
+            kind = _SINGLE_RULES.get(token)
+            if kind is None:
+                continue
+        if kind == "negation":
+            negated = True
+        elif kind == "terminator":
+            negated = False
+        elif not negated:
+            found[kind].append(token)
+    return found
+
+def classify_change_rules(text: str) -> Tuple[str, int]:
+    found = match_change_words(text)
+
+    improved_count = len(set(found["improved"]))
+    worsened_count = len(set(found["worsened"]))
+
     if improved_count > worsened_count:
         return "improved", -1
     elif worsened_count > improved_count:
         return "worsened", 1
     else:
         return "stable", 0
+
+def model_input_text(text: str) -> str:
+    """Keep the findings and impression of a report, falling back to the full text."""
+    sections = extract_sections(text)
+    focused = "\n".join(
+        part for part in (sections["findings"], sections["impression"]) if part
+    )
+    return focused or text
+
+def classify_changes_batch(
+    texts: Sequence[str],
+    batch_size: int = NLP_BATCH_SIZE,
+    max_length: int = NLP_MAX_LENGTH,
+    bucket: bool = True,
+) -> List[Tuple[str, int]]:
+    """Classify many reports with the transformer model.
+
+    Reports are cut down to their findings/impression sections; anything still
+    longer than ``max_length`` tokens is split by the tokenizer into windows
+    overlapping by a quarter of ``max_length``, whose logits are averaged.
+    Windows are sorted by token length before batching so each batch pads to a
+    similar length.
+    """
+    import torch
+
+    results: List[Tuple[str, int]] = [("stable", 0)] * len(texts)
+    owners = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not owners:
+        return results
+
+    model, tokenizer = get_nlp_model()
+    encoded = tokenizer(
+        [model_input_text(texts[i]) for i in owners],
+        truncation=True,
+        max_length=max_length,
+        stride=max_length // 4,
+        return_overflowing_tokens=True,
+    )
+    input_ids = encoded["input_ids"]
+    mapping = encoded.get("overflow_to_sample_mapping", range(len(input_ids)))
+    windows = [(owners[sample], ids) for sample, ids in zip(mapping, input_ids)]
+    order = (
+        sorted(range(len(windows)), key=lambda w: len(windows[w][1]))
+        if bucket
+        else list(range(len(windows)))
+    )
+
+    logit_sums: Dict[int, "torch.Tensor"] = {}
+    counts: Dict[int, int] = {}
+    for start in range(0, len(order), batch_size):
+        chunk = [windows[w] for w in order[start:start + batch_size]]
+        batch = tokenizer.pad(
+            {"input_ids": [ids for _, ids in chunk]},
+            return_tensors="pt"
+        )
+        with torch.inference_mode():
+            logits = model(**batch).logits.float()
+        for (owner, _), row in zip(chunk, logits):
+            logit_sums[owner] = logit_sums[owner] + row if owner in logit_sums else row
+            counts[owner] = counts.get(owner, 0) + 1
+
+    for owner, total in logit_sums.items():
+        change = CHANGE_LABELS[int((total / counts[owner]).argmax())]
+        results[owner] = (change, CHANGE_DELTAS[change])
+    return results
+
+def classify_change_transformer(text: str) -> Tuple[str, int]:
+    return classify_changes_batch([text])[0]
+
+def classify_changes(texts: Sequence[str]) -> List[Tuple[str, int]]:
+    if NLP_MODE == "transformer":
+        return classify_changes_batch(texts)
+    return [classify_change_rules(text) if text else ("stable", 0) for text in texts]
+
+def classify_change(text: str) -> Tuple[str, int]:
+    if NLP_MODE == "transformer":
+        return classify_change_transformer(text)
+    return classify_change_rules(text)
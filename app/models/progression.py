@@ -1,15 +1,107 @@
-from typing import List, Tuple, Dict, Any
+from datetime import date
+from typing import List, Optional, Tuple, Dict, Any
+import numpy as np
+from app.config import DEFAULT_ALPHA, DEFAULT_BETA
 
-def score(severity: float, delta: int, alpha: float = 0.7, beta: float = 0.3) -> float:
+_EPOCH = date(1970, 1, 1).toordinal()
+
+def score(
+    severity: float,
+    delta: int,
+    alpha: float = DEFAULT_ALPHA,
+    beta: float = DEFAULT_BETA,
+) -> float:
     delta_norm = {-1: 0.0, 0: 0.5, 1: 1.0}[int(delta)]
     s = alpha * float(severity) + beta * float(delta_norm)
     return max(0.0, min(1.0, s))
 
+def score_array(severity: np.ndarray, delta: np.ndarray, alpha: float = DEFAULT_ALPHA,
+                beta: float = DEFAULT_BETA) -> np.ndarray:
+    """``score`` over arrays, with the same float64 arithmetic."""
+    delta_norm = (np.clip(np.asarray(delta, dtype=np.float64), -1, 1) + 1) / 2
+    return np.clip(
+        alpha * np.asarray(severity, dtype=np.float64) + beta * delta_norm, 0.0, 1.0
+    )
+
+def _summary(d: float) -> Dict[str, Any]:
+    direction = "up" if d > 0.02 else "down" if d < -0.02 else "flat"
+    return {"last_delta": round(d, 3), "direction": direction}
+
 def trend_summary(ts: List[Tuple[str, float]]) -> Dict[str, Any]:
     if len(ts) < 2:
         return {"last_delta": 0.0, "direction": "flat"}
     last = ts[-1][1]
     prev = ts[-2][1]
-    d = last - prev
-    direction = "up" if d > 0.02 else "down" if d < -0.02 else "flat"
-    return {"last_delta": round(d, 3), "direction": direction}
+    return _summary(last - prev)
+
+def new_trend() -> Dict[str, Any]:
+    return {
+        "study_count": 0, "first_date": None, "prev_date": None, "last_date": None,
+        "prev_score": None, "last_score": None, "ewma": None,
+        "slope_n": 0, "sum_x": 0.0, "sum_y": 0.0, "sum_xx": 0.0, "sum_xy": 0.0,
+    }
+
+def _day_number(study_date: str) -> Optional[int]:
+    try:
+        return date.fromisoformat(study_date[:10]).toordinal() - _EPOCH
+    except ValueError:
+        return None
+
+def update_trend(
+    trend: Dict[str, Any], study_date: str, value: float, ewma_alpha: float = 0.3
+) -> Dict[str, Any]:
+    """Return ``trend`` with one more study folded in.
+
+    Studies are ordered by date, later inserts last among equal dates. Count,
+    dates, last/previous score and the slope sums are exact for any insertion
+    order; the EWMA is only exact when ``study_date`` is not before
+    ``last_date`` (rebuild with ``build_trend`` otherwise).
+    """
+    trend = dict(trend)
+    trend["study_count"] += 1
+    if trend["first_date"] is None or study_date < trend["first_date"]:
+        trend["first_date"] = study_date
+    if trend["last_date"] is None or study_date >= trend["last_date"]:
+        trend["prev_date"], trend["prev_score"] = (
+            trend["last_date"],
+            trend["last_score"],
+        )
+        trend["last_date"], trend["last_score"] = study_date, value
+        ewma = trend["ewma"]
+        trend["ewma"] = (
+            value if ewma is None else ewma_alpha * value + (1 - ewma_alpha) * ewma
+        )
+    elif trend["prev_date"] is None or study_date >= trend["prev_date"]:
+        trend["prev_date"], trend["prev_score"] = study_date, value
+
+    x = _day_number(study_date)
+    if x is not None:
+        trend["slope_n"] += 1
+        trend["sum_x"] += x
+        trend["sum_y"] += value
+        trend["sum_xx"] += x * x
+        trend["sum_xy"] += x * value
+    return trend
+
+def build_trend(ts: List[Tuple[str, float]], ewma_alpha: float = 0.3) -> Dict[str, Any]:
+    """Fold a date-ordered ``(date, score)`` series into a trend state."""
+    trend = new_trend()
+    for study_date, value in ts:
+        trend = update_trend(trend, study_date, value, ewma_alpha)
+    return trend
+
+def summarize_trend(trend: Dict[str, Any]) -> Dict[str, Any]:
+    """``trend_summary`` computed from a trend state instead of the full series."""
+    if trend["prev_score"] is None:
+        return {"last_delta": 0.0, "direction": "flat"}
+    return _summary(trend["last_score"] - trend["prev_score"])
+
+def slope_per_year(trend: Dict[str, Any]) -> Optional[float]:
+    """Least-squares slope of score against study date, in score units per year."""
+    n = trend["slope_n"]
+    denominator = n * trend["sum_xx"] - trend["sum_x"] ** 2
+    if n < 2 or denominator <= 0:
+        return None
+    return (
+        (n * trend["sum_xy"] - trend["sum_x"] * trend["sum_y"]) / denominator * 365.25
+    )
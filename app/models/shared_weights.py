@@ -0,0 +1,65 @@
+"""Model weights shared between worker processes through a memory-mapped file.
+
+The first process to need a model builds it and saves its ``state_dict`` to
+``SHARED_WEIGHTS_DIR``; every process (including the first) then maps that
+file with ``torch.load(mmap=True)`` and assigns the mapped tensors as the
+model's parameters. All workers on a node read the same page-cache pages, so
+N workers cost one copy of the weights instead of N. The mapping is private
+(copy-on-write): a stray in-place write only dirties that worker's copy of
+the touched page and never reaches the file or the other workers.
+"""
+import fcntl
+import logging
+import os
+import re
+from itertools import chain
+from typing import Callable
+
+import torch
+import torch.nn as nn
+
+from app.config import SHARED_WEIGHTS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def weights_path(name: str, directory: str = SHARED_WEIGHTS_DIR) -> str:
+    return os.path.join(directory, re.sub(r"[^\w.-]+", "_", name) + ".pt")
+
+
+def load_shared(
+    name: str,
+    build: Callable[[], nn.Module],
+    skeleton: Callable[[], nn.Module],
+    directory: str = SHARED_WEIGHTS_DIR,
+) -> nn.Module:
+    """Return the model ``name`` with its weights mapped from the shared file.
+
+    ``build`` creates the model with real weights and runs only when the file
+    does not exist yet; ``skeleton`` creates the same architecture, whose
+    weights are then replaced. Delete the file to pick up new weights.
+    """
+    path = weights_path(name, directory)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        # Workers starting together serialize here; only the first one builds.
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                logger.info("Writing shared weights for %s to %s", name, path)
+                temporary = f"{path}.{os.getpid()}.tmp"
+                torch.save(build().state_dict(), temporary)
+                os.replace(temporary, path)
+
+    state = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+    # Built on the meta device so the throwaway initial weights are never allocated.
+    with torch.device("meta"):
+        model = skeleton()
+    model.load_state_dict(state, assign=True)
+    if any(t.is_meta for t in chain(model.parameters(), model.buffers())):
+        # Non-persistent buffers are not in the state dict; build those for real.
+        model = skeleton()
+        model.load_state_dict(state, assign=True)
+    model.eval()
+    model.requires_grad_(False)
+    return model
@@ -60,6 +60,9 @@ class PatientTimeline(BaseModel):
     """Patient timeline response."""
     patient_id: str
     timeline: List[TimelineEntry]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next page"
+    )
 
 
 class PatientSnapshot(BaseModel):
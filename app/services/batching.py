@@ -0,0 +1,209 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import (
+    CV_MAX_BATCH_SIZE,
+    CV_MAX_BATCH_WAIT_MS,
+    NLP_BATCH_SIZE,
+    NLP_MAX_BATCH_WAIT_MS,
+)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects concurrent single-item calls into batched calls of ``fn``.
+
+    The worker takes the first pending item and, if more requests are already
+    queued, keeps collecting until ``max_batch_size`` items or ``max_wait_ms``
+    have elapsed. With an empty queue the item runs on its own immediately, so
+    light traffic pays no batching delay.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._batch_sizes: Counter = Counter()
+        self._queue_depths: Counter = Counter()
+        self._items = 0
+        self._batches = 0
+        self._errors = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, item: Any) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        # Items queued behind the stop marker would otherwise never resolve.
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if entry is not _STOP and entry[1].set_running_or_notify_cancel():
+                entry[1].set_exception(RuntimeError(f"{self.name} is closed"))
+
+    def _collect(
+        self, first: Tuple[Any, Future]
+    ) -> Tuple[List[Tuple[Any, Future]], bool]:
+        batch = [first]
+        if self._queue.empty():
+            return batch, False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            depth = self._queue.qsize() + 1
+            batch, stop = self._collect(entry)
+            self._execute(batch, depth)
+            if stop:
+                return
+
+    def _execute(self, batch: List[Tuple[Any, Future]], depth: int) -> None:
+        batch = [
+            (item, future)
+            for item, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._queue_depths[_bucket(depth)] += 1
+            self._items += len(batch)
+            self._batches += 1
+        try:
+            results = self.fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.name}: expected {len(batch)} results, got {len(results)}"
+                )
+        except BaseException as e:
+            with self._lock:
+                self._errors += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "items": self._items,
+                "batches": self._batches,
+                "errors": self._errors,
+                "mean_batch_size": round(self._items / self._batches, 3)
+                if self._batches
+                else 0.0,
+                "batch_size_histogram": {
+                    str(k): v for k, v in sorted(self._batch_sizes.items())
+                },
+                "queue_depth_histogram": {
+                    str(k): v for k, v in sorted(self._queue_depths.items())
+                },
+            }
+
+
+def _bucket(value: int) -> int:
+    bucket = 1
+    while bucket < value:
+        bucket *= 2
+    return bucket
+
+
+_cv_batcher: Optional[MicroBatcher] = None
+_nlp_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_cv_batcher() -> MicroBatcher:
+    global _cv_batcher
+    if _cv_batcher is None:
+        with _batcher_lock:
+            if _cv_batcher is None:
+                from app.models.cv_model import predict_batch
+
+                _cv_batcher = MicroBatcher(
+                    predict_batch, CV_MAX_BATCH_SIZE, CV_MAX_BATCH_WAIT_MS, name="cv"
+                )
+    return _cv_batcher
+
+
+def get_nlp_batcher() -> MicroBatcher:
+    global _nlp_batcher
+    if _nlp_batcher is None:
+        with _batcher_lock:
+            if _nlp_batcher is None:
+                from app.models.nlp_model import classify_changes_batch
+
+                _nlp_batcher = MicroBatcher(
+                    classify_changes_batch,
+                    NLP_BATCH_SIZE,
+                    NLP_MAX_BATCH_WAIT_MS,
+                    name="nlp",
+                )
+    return _nlp_batcher
+
+
+def batcher_stats() -> Dict[str, Any]:
+    return {
+        "cv": _cv_batcher.stats() if _cv_batcher is not None else None,
+        "nlp": _nlp_batcher.stats() if _nlp_batcher is not None else None,
+    }
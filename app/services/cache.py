@@ -0,0 +1,316 @@
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import (
+    CV_CACHE_MAX_ROWS,
+    CV_CACHE_MEMORY_ITEMS,
+    CV_MODEL_NAME,
+    CV_MODEL_VERSION,
+    RESPONSE_CACHE_ITEMS,
+)
+from app.services.storage import CVResultCache, SessionLocal, _upsert_insert
+
+CVResult = Tuple[Dict[str, float], float]
+
+_EVICTION_CHECK_EVERY = 256
+_TOUCH_FLUSH_EVERY = 256
+_REPLACED_FIELDS = ("model", "labels", "severity_score", "last_used_at")
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Two-tier cache of CV predictions keyed by a hash of the decoded pixels.
+
+    The in-process tier is an LRU of ``memory_items`` entries; the persistent
+    tier is the ``cv_result_cache`` table, trimmed to ``max_rows`` by least
+    recent use. A hit in the table only reads it: its new ``last_used_at`` is
+    kept in memory and written with the next ``put`` or ``evict`` (or every
+    ``_TOUCH_FLUSH_EVERY`` hits), so cache reads do not take SQLite's write
+    lock. Keys include ``model_key``, so changing the model name or weights
+    version misses every old row; those rows are left for eviction rather
+    than deleted, because during a rolling deploy or a rollback processes on
+    both versions share the table.
+    """
+
+    def __init__(self, model_key: str, memory_items: int = 2048, max_rows: int = 100000,
+                 session_factory: Optional[sessionmaker] = None):
+        self.model_key = model_key
+        self._session = session_factory or SessionLocal
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+        self._memory: "OrderedDict[str, CVResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Counter = Counter()
+        self._puts_since_check = 0
+        self._touched: Dict[str, datetime] = {}
+
+    def key(self, pixels: np.ndarray) -> str:
+        pixels = np.ascontiguousarray(pixels)
+        digest = hashlib.sha256()
+        digest.update(self.model_key.encode())
+        digest.update(f"|{pixels.dtype.str}|{pixels.shape}|".encode())
+        digest.update(memoryview(pixels).cast("B"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CVResult]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return _copy(value)
+
+        db = self._session()
+        try:
+            row = db.get(CVResultCache, key)
+            if row is None or row.model != self.model_key:
+                with self._lock:
+                    self._counters["misses"] += 1
+                return None
+            value = (dict(row.labels), float(row.severity_score))
+        finally:
+            db.close()
+
+        with self._lock:
+            self._counters["sqlite_hits"] += 1
+            self._remember(key, value)
+            self._touched[key] = datetime.utcnow()
+            flush = len(self._touched) >= _TOUCH_FLUSH_EVERY
+        if flush:
+            self.flush_touched()
+        return _copy(value)
+
+    def put(self, key: str, value: CVResult) -> None:
+        self.put_many([key], [value])
+
+    def put_many(self, keys: Sequence[str], values: Sequence[CVResult]) -> None:
+        """Store several results with one upsert and one commit."""
+        if not keys:
+            return
+        # Keyed, so a batch holding one image twice upserts it once; PostgreSQL
+        # rejects a multi-row upsert that touches the same row twice.
+        rows: Dict[str, Dict[str, Any]] = {}
+        now = datetime.utcnow()
+        with self._lock:
+            for key, (labels, severity_score) in zip(keys, values):
+                self._remember(key, (dict(labels), float(severity_score)))
+                rows[key] = {
+                    "key": key,
+                    "model": self.model_key,
+                    "labels": dict(labels),
+                    "severity_score": float(severity_score),
+                    "created_at": now,
+                    "last_used_at": now,
+                }
+            self._counters["stores"] += len(rows)
+            self._puts_since_check += len(rows)
+            check_size = self._puts_since_check >= _EVICTION_CHECK_EVERY
+            if check_size:
+                self._puts_since_check = 0
+
+        db = self._session()
+        try:
+            # An upsert, so two requests that miss on one key do not collide.
+            statement = _upsert_insert(CVResultCache, db)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={
+                        field: statement.excluded[field]
+                        for field in _REPLACED_FIELDS
+                    },
+                ),
+                list(rows.values()),
+            )
+            self._write_touched(db)
+            db.commit()
+        except SQLAlchemyError as e:
+            # The caller already has the results; a lost row only costs a rerun.
+            logger.warning("Result cache write failed: %r", e)
+            return
+        finally:
+            db.close()
+
+        if check_size:
+            try:
+                self.evict()
+            except SQLAlchemyError as e:
+                logger.warning("Result cache eviction failed: %r", e)
+
+    def flush_touched(self) -> None:
+        """Write the pending ``last_used_at`` updates of table hits."""
+        db = self._session()
+        try:
+            if self._write_touched(db):
+                db.commit()
+        finally:
+            db.close()
+
+    def _write_touched(self, db: Session) -> int:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            table = CVResultCache.__table__
+            db.execute(
+                update(table).where(table.c.key == bindparam("_key")),
+                [{"_key": key, "last_used_at": at} for key, at in touched.items()],
+            )
+        return len(touched)
+
+    def evict(self) -> int:
+        db = self._session()
+        try:
+            self._write_touched(db)
+            count = db.scalar(select(func.count()).select_from(CVResultCache))
+            excess = count - self.max_rows
+            if excess <= 0:
+                db.commit()
+                return 0
+            oldest = (
+                select(CVResultCache.key)
+                .order_by(CVResultCache.last_used_at)
+                .limit(excess)
+            )
+            db.execute(delete(CVResultCache).where(CVResultCache.key.in_(oldest)))
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._counters["sqlite_evictions"] += excess
+        return excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+        db = self._session()
+        try:
+            db.execute(delete(CVResultCache))
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_size = len(self._memory)
+        hits = counters.get("memory_hits", 0) + counters.get("sqlite_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        return {
+            "model": self.model_key,
+            "memory_size": memory_size,
+            "memory_capacity": self.memory_items,
+            "max_rows": self.max_rows,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **{name: counters.get(name, 0) for name in
+               ("memory_hits", "sqlite_hits", "misses", "stores", "memory_evictions",
+                "sqlite_evictions")},
+        }
+
+    def _remember(self, key: str, value: CVResult) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+
+def _copy(value: CVResult) -> CVResult:
+    return dict(value[0]), value[1]
+
+
+class ResponseCache:
+    """LRU of serialized API responses.
+
+    Keys carry the patient's version stamp, so a write makes the old entries
+    unreachable; they age out of the LRU instead of being invalidated.
+    """
+
+    def __init__(self, max_items: int = 1024):
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Counter = Counter()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self._counters["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self._counters["hits"] += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self._counters["hits"], self._counters["misses"]
+            return {
+                "size": len(self._items),
+                "capacity": self.max_items,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "hits": hits,
+                "misses": misses,
+                "evictions": self._counters["evictions"],
+                "not_modified": self._counters["not_modified"],
+            }
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._counters["not_modified"] += 1
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                from app.models.cv_model import get_cv_backend
+
+                # Keyed on the backend actually running; loads the model if needed.
+                _result_cache = ResultCache(
+                    f"{CV_MODEL_NAME}:{CV_MODEL_VERSION}:{get_cv_backend()}",
+                    CV_CACHE_MEMORY_ITEMS,
+                    CV_CACHE_MAX_ROWS,
+                )
+    return _result_cache
+
+
+_response_cache = ResponseCache(RESPONSE_CACHE_ITEMS)
+
+
+def get_response_cache() -> ResponseCache:
+    return _response_cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "cv": _result_cache.stats() if _result_cache is not None else None,
+        "responses": _response_cache.stats(),
+    }
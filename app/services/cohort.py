@@ -0,0 +1,272 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app.config import TREND_EWMA_ALPHA
+from app.services.storage import LABEL_COLUMNS, Study, engine
+
+METRIC_FIELDS = [
+    "study_count",
+    "last_score",
+    "last_delta",
+    "window_delta",
+    "rolling_mean",
+    "ewma",
+    "slope_per_year",
+]
+LABEL_SLOPE_FIELDS = [f"slope_{label}" for label in LABEL_COLUMNS]
+# Ten years covers any follow-up worth trending; longer windows only add work.
+MAX_WINDOW_DAYS = 3650
+# progression_metrics packs (patient, day) into patient * spacing + day. ISO
+# dates lie within 3 million days of 1970, so windows stay inside one patient
+# while MAX_WINDOW_DAYS is below the spacing minus that range.
+_DAY_KEY_SPACING = 10_000_000
+
+
+def load_scores(since: Optional[str] = None, until: Optional[str] = None,
+                patient_ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Scores and label probabilities in columnar form, sorted by patient then date.
+
+    Reads only the denormalized study columns. Rows whose ``study_date`` is not
+    an ISO date are dropped.
+    """
+    label_columns = [getattr(Study, column) for column in LABEL_COLUMNS.values()]
+    query = select(
+        Study.patient_id, Study.study_date, Study.progression_score, *label_columns
+    )
+    if since:
+        query = query.where(Study.study_date >= since)
+    if until:
+        query = query.where(Study.study_date <= until)
+    if patient_ids:
+        query = query.where(Study.patient_id.in_(list(patient_ids)))
+    query = query.order_by(Study.patient_id, Study.study_date, Study.id)
+
+    return prepare_scores(fetch_frame(query))
+
+
+def fetch_frame(query) -> pd.DataFrame:
+    # Plain DB-API tuples straight into pandas: SQLAlchemy Row objects cost
+    # more than the analytics at a million rows.
+    compiled = query.compile(
+        dialect=engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    positions = compiled.positiontup
+    params = (
+        [compiled.params[name] for name in positions]
+        if positions is not None
+        else compiled.params
+    )
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            cursor.execute(str(compiled), params)
+            columns = [column[0] for column in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        finally:
+            cursor.close()
+
+
+def prepare_scores(frame: pd.DataFrame) -> pd.DataFrame:
+    """Add a ``day`` column (days since 1970) and drop undated rows.
+
+    ``frame`` must be sorted by ``patient_id`` then ``study_date``.
+    """
+    dates = pd.to_datetime(
+        frame["study_date"].str.slice(0, 10), format="%Y-%m-%d", errors="coerce"
+    )
+    frame = frame.assign(day=(dates - pd.Timestamp("1970-01-01")).dt.days)
+    return frame[frame["day"].notna() & frame["progression_score"].notna()].reset_index(
+        drop=True
+    )
+
+
+def _group_slopes(
+    codes: np.ndarray, groups: int, x: np.ndarray, y: np.ndarray
+) -> np.ndarray:
+    """Least-squares slope of ``y`` on ``x`` per group, ignoring NaN ``y``."""
+    valid = ~np.isnan(y)
+    codes, x, y = codes[valid], x[valid], y[valid]
+    counts = np.bincount(codes, minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.bincount(codes, weights=x, minlength=groups) / counts
+        centered = x - mean_x[codes]
+        sxx = np.bincount(codes, weights=centered * centered, minlength=groups)
+        sxy = np.bincount(codes, weights=centered * y, minlength=groups)
+        return np.where(sxx > 0, sxy / sxx, np.nan)
+
+
+def progression_metrics(
+    frame: pd.DataFrame,
+    window_days: int = 30,
+    rolling_studies: int = 3,
+    ewma_alpha: float = TREND_EWMA_ALPHA,
+) -> pd.DataFrame:
+    """Per-patient progression metrics over a ``prepare_scores`` frame, in one pass.
+
+    - ``last_delta``: last score minus the previous one (as ``trend_summary``)
+    - ``window_delta``: last score minus the first score within ``window_days``
+      before the last study
+    - ``rolling_mean``: mean of the last ``rolling_studies`` scores
+    - ``ewma``: same recurrence as ``progression.update_trend``
+    - ``slope_per_year`` and ``slope_<label>``: least-squares slopes over time
+    """
+    codes, patient_ids = pd.factorize(frame["patient_id"], sort=False)
+    groups = len(patient_ids)
+    if groups == 0:
+        return pd.DataFrame(
+            columns=[
+                "patient_id",
+                "first_date",
+                "last_date",
+                *METRIC_FIELDS,
+                *LABEL_SLOPE_FIELDS,
+            ]
+        )
+
+    y = frame["progression_score"].to_numpy(dtype=np.float64)
+    day = frame["day"].to_numpy(dtype=np.int64)
+    positions = np.arange(len(frame))
+    counts = np.bincount(codes, minlength=groups)
+    ends = np.cumsum(counts) - 1
+    starts = ends - counts + 1
+    has_prev = counts > 1
+    prev = np.where(has_prev, ends - 1, ends)
+
+    # Sorted (patient, day) keys let one searchsorted find each window start.
+    keys = codes.astype(np.int64) * _DAY_KEY_SPACING + day
+    window_keys = (
+        np.arange(groups, dtype=np.int64) * _DAY_KEY_SPACING
+        + day[ends]
+        - window_days
+    )
+    window_starts = np.searchsorted(keys, window_keys, side="left")
+
+    cumulative = np.concatenate(([0.0], np.cumsum(y)))
+    rolling_starts = np.maximum(starts, ends + 1 - rolling_studies)
+    rolling_mean = (cumulative[ends + 1] - cumulative[rolling_starts]) / (
+        ends + 1 - rolling_starts
+    )
+
+    # EWMA with adjust=False: weight alpha * (1 - alpha)^k for the k-th score
+    # from the end, and (1 - alpha)^(n - 1) for the first.
+    from_end = ends[codes] - positions
+    weights = ewma_alpha * (1.0 - ewma_alpha) ** from_end
+    first = positions == starts[codes]
+    weights[first] = (1.0 - ewma_alpha) ** from_end[first]
+    ewma = np.bincount(codes, weights=weights * y, minlength=groups)
+
+    study_dates = frame["study_date"].to_numpy()
+    metrics = pd.DataFrame(
+        {
+            "patient_id": patient_ids,
+            "first_date": study_dates[starts],
+            "last_date": study_dates[ends],
+            "study_count": counts,
+            "last_score": y[ends],
+            "last_delta": np.where(has_prev, y[ends] - y[prev], 0.0),
+            "window_delta": y[ends] - y[window_starts],
+            "rolling_mean": rolling_mean,
+            "ewma": ewma,
+            "slope_per_year": _group_slopes(codes, groups, day.astype(np.float64), y)
+            * 365.25,
+        }
+    )
+    # Every label gets a column, NaN when the frame lacks its probabilities.
+    for label, column in LABEL_COLUMNS.items():
+        if column in frame:
+            values = frame[column].to_numpy(dtype=np.float64)
+            metrics[f"slope_{label}"] = (
+                _group_slopes(codes, groups, day.astype(np.float64), values) * 365.25
+            )
+        else:
+            metrics[f"slope_{label}"] = np.nan
+    return metrics
+
+
+def filter_metrics(
+    metrics: pd.DataFrame,
+    min_studies: int = 2,
+    min_window_delta: Optional[float] = None,
+    max_window_delta: Optional[float] = None,
+    min_slope: Optional[float] = None,
+    max_slope: Optional[float] = None,
+    label: Optional[str] = None,
+    min_label_slope: Optional[float] = None,
+) -> pd.DataFrame:
+    mask = metrics["study_count"] >= min_studies
+    if min_window_delta is not None:
+        mask &= metrics["window_delta"] >= min_window_delta
+    if max_window_delta is not None:
+        mask &= metrics["window_delta"] <= max_window_delta
+    if min_slope is not None:
+        mask &= metrics["slope_per_year"] >= min_slope
+    if max_slope is not None:
+        mask &= metrics["slope_per_year"] <= max_slope
+    if label is not None and min_label_slope is not None:
+        mask &= metrics[f"slope_{label}"] >= min_label_slope
+    return metrics[mask]
+
+
+def cohort_progression(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    window_days: int = 30,
+    rolling_studies: int = 3,
+    sort_by: str = "window_delta",
+    descending: bool = True,
+    limit: int = 100,
+    offset: int = 0,
+    **filters: Any,
+) -> Dict[str, Any]:
+    if not 1 <= window_days <= MAX_WINDOW_DAYS:
+        raise ValueError(f"window_days must be between 1 and {MAX_WINDOW_DAYS}")
+    if rolling_studies < 1:
+        raise ValueError("rolling_studies must be at least 1")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    if filters.get("label") is not None and filters["label"] not in LABEL_COLUMNS:
+        raise ValueError(f"Unknown label: {filters['label']}")
+    metrics = progression_metrics(
+        load_scores(since, until), window_days, rolling_studies
+    )
+    if sort_by not in metrics.columns:
+        raise ValueError(f"Cannot sort by: {sort_by}")
+    matched = filter_metrics(metrics, **filters).sort_values(
+        sort_by, ascending=not descending, na_position="last"
+    )
+    page = matched.iloc[offset:offset + limit]
+    return {
+        "cohort_size": len(metrics),
+        "matched": len(matched),
+        "window_days": window_days,
+        "patients": _records(page),
+    }
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    records = []
+    for row in frame.to_dict("records"):
+        record = {
+            key: _json_value(value)
+            for key, value in row.items()
+            if key not in LABEL_SLOPE_FIELDS
+        }
+        record["label_slopes_per_year"] = {
+            column[len("slope_") :]: _json_value(row[column])
+            for column in LABEL_SLOPE_FIELDS
+        }
+        records.append(record)
+    return records
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else round(float(value), 6)
+    return value
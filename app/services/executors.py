@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import (
+    DECODE_POOL_KIND,
+    DECODE_POOL_SIZE,
+    INFERENCE_POOL_SIZE,
+    IO_POOL_SIZE,
+)
+
+POOLS = ("io", "decode", "inference")
+
+_executors: Dict[str, Executor] = {}
+_lock = threading.Lock()
+
+
+def _create_executor(name: str) -> Executor:
+    if name == "io":
+        return ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+    if name == "decode":
+        if DECODE_POOL_KIND == "process":
+            return ProcessPoolExecutor(max_workers=DECODE_POOL_SIZE,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(
+            max_workers=DECODE_POOL_SIZE, thread_name_prefix="decode"
+        )
+    if name == "inference":
+        # Inference stays in-process so concurrent calls share the model and the
+        # CV micro-batcher; the pool must be at least as large as the batch size
+        # for full batches to form.
+        return ThreadPoolExecutor(
+            max_workers=INFERENCE_POOL_SIZE, thread_name_prefix="inference"
+        )
+    raise ValueError(f"Unknown executor pool: {name}")
+
+
+def get_executor(name: str) -> Executor:
+    executor = _executors.get(name)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = _create_executor(name)
+    return executor
+
+
+async def run_in_pool(
+    name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Any:
+    loop = asyncio.get_running_loop()
+    executor = get_executor(name)
+    call = functools.partial(fn, *args, **kwargs)
+    if isinstance(executor, ThreadPoolExecutor):
+        # Carry the request context (e.g. its Server-Timing spans) into the worker.
+        call = functools.partial(contextvars.copy_context().run, call)
+    return await loop.run_in_executor(executor, call)
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
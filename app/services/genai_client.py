@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from app.config import (
+    GENAI_BASE_URL,
+    GENAI_CACHE_ITEMS,
+    GENAI_ENABLED,
+    GENAI_LABEL_DECIMALS,
+    GENAI_MAX_CONCURRENCY,
+    GENAI_MAX_CONNECTIONS,
+    GENAI_MAX_TOKENS,
+    GENAI_MODEL,
+    GENAI_TIMEOUT_S,
+    OPENAI_API_KEY,
+)
+from app.models.genai import AUDIENCES, TEMPLATES, build_messages
+from app.services.cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+Summaries = Dict[str, str]
+SummaryInput = Tuple[str, Dict[str, float], Dict[str, Any]]
+
+
+def summary_key(findings: str, labels: Dict[str, float], trend: Dict[str, Any],
+                decimals: int = 2) -> str:
+    """Cache key over the inputs that reach the prompt, normalized.
+
+    Findings are case- and whitespace-folded and label probabilities rounded to
+    ``decimals``, so near-identical studies share a summary.
+    """
+    normalized = {
+        "findings": " ".join((findings or "").lower().split()),
+        "labels": sorted(
+            (label, round(float(p), decimals)) for label, p in labels.items()
+        ),
+        "trend": [trend["direction"], round(float(trend["last_delta"]), decimals)],
+    }
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def template_summaries(
+    findings: str, labels: Dict[str, float], trend: Dict[str, Any]
+) -> Summaries:
+    return {
+        audience: TEMPLATES[audience](findings, labels, trend) for audience in AUDIENCES
+    }
+
+
+class SummaryClient:
+    """Chat-completions client for the clinician and patient summaries.
+
+    Requests run on a private event loop thread sharing one pooled
+    ``httpx.AsyncClient``, so calls from any worker thread reuse connections.
+    Both summaries for a study are requested concurrently, at most
+    ``max_concurrency`` requests are in flight, and a request that fails or
+    exceeds ``timeout_s`` falls back to the template text. Completed pairs are
+    cached by ``summary_key``; fallbacks are not cached.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        timeout_s: float = 8.0,
+        max_concurrency: int = 8,
+        max_connections: int = 16,
+        max_tokens: int = 160,
+        cache_items: int = 4096,
+        label_decimals: int = 2,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout_s = timeout_s
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_tokens = max_tokens
+        self.label_decimals = label_decimals
+        self.cache = ResponseCache(cache_items)
+        self._lock = threading.Lock()
+        self._counters: Counter = Counter()
+        self._latencies_ms: list = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def summarize(
+        self, findings: str, labels: Dict[str, float], trend: Dict[str, Any]
+    ) -> Summaries:
+        return self.summarize_many([(findings, labels, trend)])[0]
+
+    def summarize_many(self, studies: Sequence[SummaryInput]) -> List[Summaries]:
+        """Summaries for each ``(findings, labels, trend)``; misses run concurrently."""
+        keys = [summary_key(*study, decimals=self.label_decimals) for study in studies]
+        results: List[Optional[Summaries]] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            results.append(dict(cached) if cached is not None else None)
+        misses = {}
+        for key, study, result in zip(keys, studies, results):
+            if result is None:
+                misses.setdefault(key, study)
+        if misses:
+            future = asyncio.run_coroutine_threadsafe(
+                self._summarize_all(list(misses.values())), self._ensure_loop()
+            )
+            generated = dict(zip(misses, future.result()))
+            for key, (summaries, complete) in generated.items():
+                if complete:
+                    self.cache.put(key, tuple(summaries.items()))
+            results = [result if result is not None else dict(generated[key][0])
+                       for key, result in zip(keys, results)]
+        return results
+
+    async def _summarize_all(
+        self, studies: List[SummaryInput]
+    ) -> List[Tuple[Summaries, bool]]:
+        return await asyncio.gather(*(self._summarize(*study) for study in studies))
+
+    async def _summarize(self, findings: str, labels: Dict[str, float],
+                         trend: Dict[str, Any]) -> Tuple[Summaries, bool]:
+        texts = await asyncio.gather(
+            *(
+                self._complete(audience, findings, labels, trend)
+                for audience in AUDIENCES
+            )
+        )
+        summaries, complete = {}, True
+        for audience, text in zip(AUDIENCES, texts):
+            if text is None:
+                text, complete = TEMPLATES[audience](findings, labels, trend), False
+            summaries[audience] = text
+        return summaries, complete
+
+    async def _complete(self, audience: str, findings: str, labels: Dict[str, float],
+                        trend: Dict[str, Any]) -> Optional[str]:
+        payload = {
+            "model": self.model,
+            "messages": build_messages(audience, findings, labels, trend),
+            "max_tokens": self.max_tokens,
+            "temperature": 0.2,
+        }
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self._http.post("/chat/completions", json=payload), self.timeout_s
+                )
+                response.raise_for_status()
+                text = response.json()["choices"][0]["message"]["content"].strip()
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                return None
+            except Exception as e:
+                logger.warning("GenAI %s summary failed: %r", audience, e)
+                self._count("errors")
+                return None
+        with self._lock:
+            self._counters["completions"] += 1
+            self._latencies_ms.append((time.perf_counter() - started) * 1000)
+            del self._latencies_ms[:-1000]
+        return text or None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="genai-client", daemon=True
+                )
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _open(self) -> None:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            limits=limits,
+            timeout=httpx.Timeout(self.timeout_s),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread, self._loop, self._thread = (
+                self._loop,
+                self._thread,
+                None,
+                None,
+            )
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._http.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies_ms)
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "completions": counters.get("completions", 0),
+            "timeouts": counters.get("timeouts", 0),
+            "errors": counters.get("errors", 0),
+            "p50_latency_ms": round(latencies[len(latencies) // 2], 2)
+            if latencies
+            else None,
+            "cache": self.cache.stats(),
+        }
+
+
+_client: Optional[SummaryClient] = None
+_client_lock = threading.Lock()
+
+
+def get_summary_client() -> SummaryClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SummaryClient(
+                    GENAI_BASE_URL,
+                    OPENAI_API_KEY,
+                    GENAI_MODEL,
+                    GENAI_TIMEOUT_S,
+                    GENAI_MAX_CONCURRENCY,
+                    GENAI_MAX_CONNECTIONS,
+                    GENAI_MAX_TOKENS,
+                    GENAI_CACHE_ITEMS,
+                    GENAI_LABEL_DECIMALS,
+                )
+    return _client
+
+
+def generate_summaries(studies: Sequence[SummaryInput]) -> List[Summaries]:
+    """Clinician and patient summaries per study, from the LLM or the templates."""
+    if not GENAI_ENABLED:
+        return [template_summaries(*study) for study in studies]
+    return get_summary_client().summarize_many(studies)
+
+
+def close_summary_client() -> None:
+    if _client is not None:
+        _client.close()
+
+
+def genai_stats() -> Dict[str, Any]:
+    if not GENAI_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_summary_client().stats()}
@@ -0,0 +1,113 @@
+"""Local stand-in for an OpenAI-compatible chat-completions API.
+
+Answers ``POST /chat/completions`` after ``latency_ms`` with a canned summary,
+for tests and benchmarks of the summary client::
+
+    python -m app.services.genai_stub --port 8100 --latency-ms 400
+    GENAI_ENABLED=true GENAI_BASE_URL=http://127.0.0.1:8100 uvicorn app.main:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that time out hang up before the reply; that is expected here.
+        pass
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        server: StubServer = self.server
+        payload = json.loads(
+            self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+        )
+        if self.path.rstrip("/") != "/chat/completions":
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency_ms / 1000)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        prompt = payload["messages"][-1]["content"]
+        audience = "patient" if "plain-language" in prompt else "clinician"
+        text = f"Stub {audience} summary: {prompt.splitlines()[-1]}."
+        self._send(
+            200,
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+            },
+        )
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_stub(
+    latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0
+) -> StubServer:
+    """Serve the stub on a background thread; ``port=0`` picks a free port."""
+    server = StubServer((host, port), latency_ms)
+    threading.Thread(
+        target=server.serve_forever, name="genai-stub", daemon=True
+    ).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+    server = StubServer((args.host, args.port), args.latency_ms)
+    print(f"GenAI stub on {server.url} with {args.latency_ms:.0f} ms latency")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,123 @@
-from typing import Dict, Any, Tuple
-from PIL import Image
-from app.models.cv_model import predict
-from app.models.nlp_model import extract_sections, classify_change
-from app.models.progression import score, trend_summary
-from app.models.genai import summarize_clinician, summarize_patient
-from app.services.storage import upsert_patient, add_study, get_timeline
-
-def analyze_study(patient_id: str, study_date: str, image: Image.Image, 
-                 report_text: str = "") -> Dict[str, Any]:
-    
-    upsert_patient(patient_id)
-    
-    labels, severity_score = predict(image)
-    
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from app.config import (
+    CV_BATCHING_ENABLED,
+    CV_CACHE_ENABLED,
+    NLP_BATCHING_ENABLED,
+    NLP_MODE,
+    DEFAULT_ALPHA,
+    DEFAULT_BETA,
+    TENSOR_STORE_ENABLED,
+    TREND_EWMA_ALPHA,
+)
+from app.models.cv_model import (
+    ImageInput,
+    predict,
+    predict_batch,
+    resize_batch,
+    to_pixels,
+)
+from app.models.nlp_model import extract_sections, classify_change, classify_changes
+from app.models.progression import score, summarize_trend, update_trend
+from app.services.storage import (
+    get_trend,
+    get_trends,
+    insert_studies,
+    record_tensors,
+    score_weights_version,
+    unit_of_work,
+    upsert_patients,
+)
+from app.services.batching import get_cv_batcher, get_nlp_batcher
+from app.services.cache import get_result_cache
+from app.services.genai_client import Summaries, generate_summaries
+from app.services.metrics import span
+from app.services.profiling import capturing
+
+def _predict_uncached(image: ImageInput) -> Tuple[Dict[str, float], float]:
+    # A profiled call runs the model on its own thread, where cProfile sees it.
+    if CV_BATCHING_ENABLED and not capturing():
+        return get_cv_batcher()(image)
+    return predict(image)
+
+def predict_image(image: ImageInput) -> Tuple[Dict[str, float], float]:
+    if not CV_CACHE_ENABLED:
+        return _predict_uncached(image)
+    cache = get_result_cache()
+    pixels = to_pixels(image)
+    key = cache.key(pixels)
+    result = cache.get(key)
+    if result is None:
+        result = _predict_uncached(pixels)
+        cache.put(key, result)
+    return result
+
+def predict_images(
+    images: Sequence[ImageInput],
+) -> List[Tuple[Dict[str, float], float]]:
+    if not CV_CACHE_ENABLED:
+        return predict_batch(images)
+    cache = get_result_cache()
+    pixels = [to_pixels(image) for image in images]
+    keys = [cache.key(p) for p in pixels]
+    results = [cache.get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        computed = predict_batch([pixels[i] for i in misses])
+        for i, result in zip(misses, computed):
+            results[i] = result
+        # One write transaction for the whole batch's misses.
+        cache.put_many([keys[i] for i in misses], computed)
+    return results
+
+def store_images(images: Sequence[ImageInput]) -> Optional[List[Tuple[int, int, int]]]:
+    """Append the resized planes to the tensor store.
+
+    Returns ``(chunk, row, crc32)`` for each plane, or None if the store is off.
+    """
+    if not TENSOR_STORE_ENABLED:
+        return None
+    from app.services.tensor_store import get_tensor_store
+
+    with span("tensor_store"):
+        return get_tensor_store().append(resize_batch(images)[:, 0].numpy())
+
+def _tensor_rows(
+    study_ids: Sequence[int], positions: Optional[Sequence[Tuple[int, int, int]]]
+) -> List[Dict[str, Any]]:
+    if positions is None:
+        return []
+    return [{"study_id": study_id, "chunk": chunk, "row": row, "crc32": crc32}
+            for study_id, (chunk, row, crc32) in zip(study_ids, positions)]
+
+def classify_report(report_text: str) -> Tuple[str, int]:
+    if NLP_MODE == "transformer" and NLP_BATCHING_ENABLED and not capturing():
+        return get_nlp_batcher()(report_text)
+    return classify_change(report_text)
+
+def analyze_report(
+    report_text: str, change: Optional[Tuple[str, int]] = None
+) -> Tuple[Dict[str, str], str, int]:
     sections = extract_sections(report_text) if report_text else {"findings": "", "impression": ""}
-    change, delta = classify_change(report_text) if report_text else ("stable", 0)
-    
+    if change is None:
+        change = classify_report(report_text) if report_text else ("stable", 0)
+    return sections, change[0], change[1]
+
+def build_result(
+    patient_id: str,
+    study_date: str,
+    labels: Dict[str, float],
+    severity_score: float,
+    sections: Dict[str, str],
+    change: str,
+    delta: int,
+    prior_trend: Dict[str, Any],
+    summaries: Summaries,
+) -> Dict[str, Any]:
     progression_score = score(severity_score, delta)
-    
-    timeline = get_timeline(patient_id)
-    trend = trend_summary([(entry["date"], entry["progression_score"]) for entry in timeline])
-    
-    genai_clinician = summarize_clinician(sections.get("findings", ""), labels, trend)
-    genai_patient = summarize_patient(sections.get("findings", ""), labels, trend)
-    
+
+    trend = summarize_trend(prior_trend)
+
     cv_result = {"labels": labels, "severity_score": severity_score}
     nlp_result = {"sections": sections, "change": change, "delta": delta}
     progression_result = {
@@ -32,12 +126,10 @@ def analyze_study(patient_id: str, study_date: str, image: Image.Image,
         "last_delta": trend["last_delta"]
     }
     genai_result = {
-        "clinician_summary": genai_clinician,
-        "patient_summary": genai_patient
+        "clinician_summary": summaries["clinician"],
+        "patient_summary": summaries["patient"]
     }
-    
-    add_study(patient_id, study_date, cv_result, nlp_result, progression_score, genai_result)
-    
+
     return {
         "patient_id": patient_id,
         "study_date": study_date,
@@ -46,3 +138,176 @@ def analyze_study(patient_id: str, study_date: str, image: Image.Image,
         "progression_result": progression_result,
         "genai_result": genai_result
     }
+
+def _study_row(result: Dict[str, Any], score_version: int) -> Dict[str, Any]:
+    return {
+        "patient_id": result["patient_id"],
+        "study_date": result["study_date"],
+        "cv_result": result["cv_result"],
+        "nlp_result": result["nlp_result"],
+        "progression_score": result["progression_result"]["progression_score"],
+        "score_version": score_version,
+        "genai_result": result["genai_result"]
+    }
+
+def analyze_study(
+    patient_id: str,
+    study_date: str,
+    image: ImageInput,
+    report_text: str = "",
+    progress: Optional[Callable[[str], None]] = None,
+    before_commit: Optional[Callable[[Session, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run the full pipeline for one study, calling ``progress`` with each stage.
+
+    ``before_commit`` is called with the session and the result inside the
+    write transaction, after the study insert.
+    """
+    progress = progress or (lambda stage: None)
+
+    progress("cv")
+    with span("cv"):
+        labels, severity_score = predict_image(image)
+    tensors = store_images([image])
+
+    progress("nlp")
+    with span("nlp"):
+        sections, change, delta = analyze_report(report_text)
+
+    progress("summarizing")
+    # Summaries may wait on network round trips, so they are generated before
+    # the write transaction from the last committed trend.
+    with span("trend_read"):
+        trend = summarize_trend(get_trend(patient_id))
+    with span("genai"):
+        (summaries,) = generate_summaries(
+            [(sections.get("findings", ""), labels, trend)]
+        )
+
+    progress("storing")
+    # Registered outside the write transaction; cached after the first call.
+    score_version = score_weights_version(DEFAULT_ALPHA, DEFAULT_BETA)
+    # Patient upsert, trend read and study insert share one transaction;
+    # the upsert goes first so the write lock is taken before the read.
+    with span("storage"), unit_of_work() as db:
+        upsert_patients(db, [patient_id])
+        prior_trend = get_trends(db, [patient_id])[patient_id]
+
+        result = build_result(
+            patient_id,
+            study_date,
+            labels,
+            severity_score,
+            sections,
+            change,
+            delta,
+            prior_trend,
+            summaries,
+        )
+
+        study_ids = insert_studies(db, [_study_row(result, score_version)])
+        record_tensors(db, _tensor_rows(study_ids, tensors))
+        if before_commit is not None:
+            before_commit(db, result)
+
+    return result
+
+def order_studies(studies: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(studies, key=lambda s: (s["patient_id"], s["study_date"]))
+
+def analyze_study_batch(
+    studies: Sequence[Dict[str, Any]],
+    progress: Optional[Callable[[str], None]] = None,
+    before_commit: Optional[Callable[[Session], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Analyze ``studies`` with one CV forward pass and one storage transaction.
+
+    Each study is a dict with ``patient_id``, ``study_date``, ``image`` and
+    optional ``report_text``; pass them in ``order_studies`` order so studies
+    later in the batch see the ones before them in their patient's trend.
+    ``progress`` is called with each stage name as in ``analyze_study``, and
+    ``before_commit`` runs inside the write transaction after the insert.
+    """
+    if not studies:
+        return []
+    progress = progress or (lambda stage: None)
+
+    progress("cv")
+    with span("cv_batch"):
+        predictions = predict_images([study["image"] for study in studies])
+    tensors = store_images([study["image"] for study in studies])
+    progress("nlp")
+    with span("nlp_batch"):
+        changes = classify_changes(
+            [study.get("report_text") or "" for study in studies]
+        )
+        reports = [
+            analyze_report(study.get("report_text") or "", change)
+            for study, change in zip(studies, changes)
+        ]
+    scores = [
+        score(severity_score, delta)
+        for (_, severity_score), (_, _, delta) in zip(predictions, reports)
+    ]
+    patient_ids = {study["patient_id"] for study in studies}
+
+    # All summaries are requested concurrently, outside the write transaction.
+    progress("summarizing")
+    with span("trend_read"), unit_of_work() as db:
+        priors = _prior_trends(get_trends(db, patient_ids), studies, scores)
+    with span("genai_batch"):
+        summaries = generate_summaries(
+            [
+                (sections.get("findings", ""), labels, summarize_trend(prior))
+                for (labels, _), (sections, _, _), prior in zip(
+                    predictions, reports, priors
+                )
+            ]
+        )
+
+    progress("storing")
+    score_version = score_weights_version(DEFAULT_ALPHA, DEFAULT_BETA)
+    results = []
+    with span("storage_batch"), unit_of_work() as db:
+        upsert_patients(db, patient_ids)
+        priors = _prior_trends(get_trends(db, patient_ids), studies, scores)
+
+        for study, (labels, severity_score), (
+            sections,
+            change,
+            delta,
+        ), prior, summary in zip(studies, predictions, reports, priors, summaries):
+            results.append(
+                build_result(
+                    study["patient_id"],
+                    study["study_date"],
+                    labels,
+                    severity_score,
+                    sections,
+                    change,
+                    delta,
+                    prior,
+                    summary,
+                )
+            )
+
+        study_ids = insert_studies(
+            db, [_study_row(result, score_version) for result in results]
+        )
+        record_tensors(db, _tensor_rows(study_ids, tensors))
+        if before_commit is not None:
+            before_commit(db)
+
+    return results
+
+def _prior_trends(trends: Dict[str, Dict[str, Any]], studies: Sequence[Dict[str, Any]],
+                  scores: Sequence[float]) -> List[Dict[str, Any]]:
+    """Each study's prior trend; earlier studies in the batch fold into ``trends``."""
+    priors = []
+    for study, progression_score in zip(studies, scores):
+        patient_id = study["patient_id"]
+        priors.append(trends[patient_id])
+        trends[patient_id] = update_trend(
+            trends[patient_id], study["study_date"], progression_score, TREND_EWMA_ALPHA
+        )
+    return priors
@@ -0,0 +1,425 @@
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import (
+    JOB_JANITOR_INTERVAL_S,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETENTION_HOURS,
+    JOB_SPOOL_DIR,
+    JOB_STALE_SECONDS,
+    JOB_WORKERS,
+)
+from app.services.storage import Job, SessionLocal, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+Progress = Callable[[str], None]
+Complete = Callable[[Session, Dict[str, Any]], None]
+RunJob = Callable[[Dict[str, Any], bytes, Progress, Complete], Dict[str, Any]]
+
+_STOP = object()
+
+
+class _JobRequeued(Exception):
+    """Raised by ``complete`` when another claim has taken over the job."""
+
+
+def analyze_job(
+    job: Dict[str, Any], content: bytes, progress: Progress, complete: Complete
+) -> Dict[str, Any]:
+    from app.services.executors import get_executor
+    from app.services.inference import analyze_study
+    from app.services.parsing import load_pixels
+
+    progress("decoding")
+    pixels = (
+        get_executor("decode").submit(load_pixels, content, job["filename"]).result()
+    )
+    return analyze_study(
+        job["patient_id"],
+        job["study_date"],
+        pixels,
+        job["report_text"] or "",
+        progress=progress,
+        before_commit=complete,
+    )
+
+
+def job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "patient_id": job.patient_id,
+        "study_date": job.study_date,
+        "filename": job.filename,
+        "attempts": job.attempts,
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "finished_at": _iso(job.finished_at),
+        "result": job.result,
+        "error": job.error,
+    }
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() + "Z" if value else None
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return job_dict(job) if job else None
+    finally:
+        db.close()
+
+
+class JobRunner:
+    """Runs persisted analysis jobs on a pool of worker threads.
+
+    Uploads are spooled to ``spool_dir`` and the job row is committed before
+    ``submit`` returns, so queued work survives a restart. While a job runs,
+    a heartbeat refreshes its ``updated_at`` every quarter of
+    ``stale_seconds``, so a long stage is not mistaken for a dead worker. On
+    ``start`` and every ``janitor_interval_s`` after, queued jobs and running
+    jobs whose heartbeat stopped for ``stale_seconds`` are queued again; a job
+    is given up after ``max_attempts`` claims. A restarted process gets a new
+    pid, so its previous jobs are recovered through the missed heartbeat
+    (within ``stale_seconds`` plus one janitor pass); only when host and pid
+    repeat, as in a container, does ``start`` requeue them at once. Claiming
+    is a conditional UPDATE, so several processes can share one database.
+
+    ``run_job`` gets a ``complete(db, result)`` callback to call inside the
+    transaction that stores its output; the job is marked succeeded in that
+    same transaction, so a job that crashes or is requeued after the commit
+    is not run a second time, and a worker that lost its claim rolls back.
+    """
+
+    def __init__(
+        self,
+        run_job: RunJob = analyze_job,
+        workers: int = 2,
+        spool_dir: str = "./data/jobs",
+        retention_hours: float = 24.0,
+        max_attempts: int = 3,
+        stale_seconds: float = 60.0,
+        janitor_interval_s: float = 15.0,
+    ):
+        self.run_job = run_job
+        self.workers = workers
+        self.spool_dir = spool_dir
+        self.retention = timedelta(hours=retention_hours)
+        self.max_attempts = max_attempts
+        self.stale = timedelta(seconds=stale_seconds)
+        self.heartbeat_s = stale_seconds / 4
+        self.janitor_interval_s = janitor_interval_s
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._running: Set[str] = set()
+        self._lock = threading.RLock()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stopped.clear()
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._recover(include_own=True)
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(
+                threading.Thread(target=self._janitor, name="job-janitor", daemon=True)
+            )
+            self._threads.append(
+                threading.Thread(
+                    target=self._heartbeat, name="job-heartbeat", daemon=True
+                )
+            )
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopped.set()
+        for _ in range(self.workers):
+            self._queue.put(_STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def submit(self, patient_id: str, study_date: str, content: bytes, filename: str,
+               report_text: str = "") -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{job_id}.upload")
+        with open(path, "wb") as f:
+            f.write(content)
+        job = Job(
+            id=job_id,
+            status="queued",
+            stage="queued",
+            patient_id=patient_id,
+            study_date=study_date,
+            filename=filename,
+            report_text=report_text,
+            upload_path=path,
+            attempts=0,
+        )
+        try:
+            with unit_of_work() as db:
+                db.add(job)
+                db.flush()
+                submitted = job_dict(job)
+        except Exception:
+            _remove(path)
+            raise
+        self._enqueue(job_id)
+        return submitted
+
+    def cleanup(self) -> int:
+        """Delete finished jobs older than the retention period."""
+        cutoff = datetime.utcnow() - self.retention
+        with unit_of_work() as db:
+            expired = db.execute(
+                select(Job.id, Job.upload_path).where(Job.finished_at < cutoff)
+            ).all()
+            if expired:
+                db.execute(
+                    delete(Job).where(Job.id.in_([job_id for job_id, _ in expired]))
+                )
+        for _, path in expired:
+            _remove(path)
+        return len(expired)
+
+    def _enqueue(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._pending:
+                return
+            self._pending.add(job_id)
+        self._queue.put(job_id)
+
+    def _recover(self, include_own: bool = False) -> None:
+        stale_before = datetime.utcnow() - self.stale
+        orphaned = Job.updated_at < stale_before
+        if include_own:
+            orphaned = or_(orphaned, Job.worker == self.worker_id)
+        with unit_of_work() as db:
+            requeued = db.execute(update(Job).where(Job.status == "running", orphaned)
+                                  .values(status="queued", stage="queued")).rowcount
+            queued = db.scalars(
+                select(Job.id).where(Job.status == "queued").order_by(Job.created_at)
+            ).all()
+        if requeued:
+            logger.warning("Requeued %d interrupted analysis jobs", requeued)
+        for job_id in queued:
+            self._enqueue(job_id)
+
+    def _janitor(self) -> None:
+        while not self._stopped.wait(self.janitor_interval_s):
+            try:
+                self._recover()
+                self.cleanup()
+            except Exception:
+                logger.exception("Job janitor pass failed")
+
+    def _heartbeat(self) -> None:
+        while not self._stopped.wait(self.heartbeat_s):
+            try:
+                self._beat()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    def _beat(self) -> None:
+        with self._lock:
+            running = list(self._running)
+        if running:
+            with unit_of_work() as db:
+                db.execute(update(Job).where(Job.id.in_(running), *self._owned())
+                           .values(updated_at=datetime.utcnow()))
+
+    def _owned(self) -> Tuple[Any, Any]:
+        # A job requeued by another process's janitor no longer belongs to this one.
+        return Job.status == "running", Job.worker == self.worker_id
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is _STOP:
+                return
+            with self._lock:
+                self._pending.discard(job_id)
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception("Job %s crashed its worker", job_id)
+
+    def _claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        with unit_of_work() as db:
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(
+                    status="running",
+                    stage="starting",
+                    worker=self.worker_id,
+                    attempts=Job.attempts + 1,
+                    started_at=now,
+                    updated_at=now,
+                )
+            ).rowcount
+            if not claimed:
+                return None
+            job = db.get(Job, job_id)
+            return {
+                "id": job.id,
+                "patient_id": job.patient_id,
+                "study_date": job.study_date,
+                "filename": job.filename,
+                "report_text": job.report_text,
+                "upload_path": job.upload_path,
+                "attempts": job.attempts,
+            }
+
+    def _set_stage(self, job_id: str, stage: str) -> None:
+        with unit_of_work() as db:
+            db.execute(update(Job).where(Job.id == job_id, *self._owned())
+                       .values(stage=stage, updated_at=datetime.utcnow()))
+
+    def _finish(
+        self,
+        job: Dict[str, Any],
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with unit_of_work() as db:
+            finished = self._mark_finished(db, job, status, result, error)
+        if not finished:
+            _warn_requeued(job)
+            return
+        _remove(job["upload_path"])
+
+    def _mark_finished(
+        self,
+        db: Session,
+        job: Dict[str, Any],
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        now = datetime.utcnow()
+        return bool(
+            db.execute(
+                update(Job)
+                .where(Job.id == job["id"], *self._owned())
+                .values(
+                    status=status,
+                    stage="done",
+                    result=result,
+                    error=error,
+                    finished_at=now,
+                    updated_at=now,
+                )
+            ).rowcount
+        )
+
+    def _run(self, job_id: str) -> None:
+        job = self._claim(job_id)
+        if job is None:
+            return
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            self._run_claimed(job)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _run_claimed(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        if job["attempts"] > self.max_attempts:
+            self._finish(
+                job,
+                "failed",
+                error=f"Gave up after {self.max_attempts} interrupted attempts",
+            )
+            return
+        completed = []
+
+        def complete(db: Session, result: Dict[str, Any]) -> None:
+            if not self._mark_finished(db, job, "succeeded", result=result):
+                raise _JobRequeued(job_id)
+            completed.append(True)
+
+        try:
+            with open(job["upload_path"], "rb") as f:
+                content = f.read()
+            result = self.run_job(
+                job, content, lambda stage: self._set_stage(job_id, stage), complete
+            )
+        except _JobRequeued:
+            _warn_requeued(job)
+            return
+        except Exception as e:
+            logger.warning("Analysis job %s failed: %s", job_id, e)
+            self._finish(job, "failed", error=str(e))
+            return
+        if completed:
+            _remove(job["upload_path"])
+        else:
+            self._finish(job, "succeeded", result=result)
+
+
+def _warn_requeued(job: Dict[str, Any]) -> None:
+    logger.warning(
+        "Analysis job %s was requeued while running here; dropping this result",
+        job["id"],
+    )
+
+
+def _remove(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_job_runner: Optional[JobRunner] = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = JobRunner(
+                    analyze_job,
+                    JOB_WORKERS,
+                    JOB_SPOOL_DIR,
+                    JOB_RETENTION_HOURS,
+                    JOB_MAX_ATTEMPTS,
+                    JOB_STALE_SECONDS,
+                    JOB_JANITOR_INTERVAL_S,
+                )
+    return _job_runner
@@ -0,0 +1,104 @@
+import os
+import resource
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import SHARED_WEIGHTS_DIR, SHARED_WEIGHTS_ENABLED
+
+_ROLLUP_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_clean_bytes",
+    "Shared_Dirty": "shared_dirty_bytes",
+    "Private_Clean": "private_clean_bytes",
+    "Private_Dirty": "private_dirty_bytes",
+    "Anonymous": "anonymous_bytes",
+}
+
+
+def _smaps_fields(lines: List[str]) -> Dict[str, int]:
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in _ROLLUP_FIELDS and rest.strip().endswith("kB"):
+            values[_ROLLUP_FIELDS[key]] = int(rest.split()[0]) * 1024
+    return values
+
+
+def _mapped_files(prefix: str) -> Dict[str, Dict[str, int]]:
+    """Rss/Pss per mapped file under ``prefix``, summed over that file's mappings."""
+    files: Dict[str, Dict[str, int]] = {}
+    current: Optional[Dict[str, int]] = None
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            fields = line.split(None, 5)
+            if "-" in fields[0] and not fields[0].endswith(":"):
+                path = fields[5].strip() if len(fields) > 5 else ""
+                current = files.setdefault(path, {"rss_bytes": 0, "pss_bytes": 0}) \
+                    if path.startswith(prefix) else None
+            elif current is not None and fields[0] in ("Rss:", "Pss:"):
+                current[_ROLLUP_FIELDS[fields[0][:-1]]] += int(fields[1]) * 1024
+    return files
+
+
+def memory_report() -> Dict[str, Any]:
+    """Resident memory of this worker process, split into shared and private pages.
+
+    PSS charges each shared page to its N sharers at 1/N, so summing it over
+    all workers gives the node's real footprint; ``shared_weights`` is the
+    part of it that comes from the memory-mapped model weight files.
+    """
+    report: Dict[str, Any] = {
+        "pid": os.getpid(),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "shared_weights_enabled": SHARED_WEIGHTS_ENABLED,
+    }
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            report.update(_smaps_fields(f.readlines()))
+        files = _mapped_files(os.path.realpath(SHARED_WEIGHTS_DIR) + os.sep)
+    except OSError:
+        # /proc is Linux-only; elsewhere only the peak RSS is available.
+        return report
+    report["uss_bytes"] = report.get("private_clean_bytes", 0) + report.get(
+        "private_dirty_bytes", 0
+    )
+    report["shared_weights"] = {
+        "files": {os.path.basename(path): sizes for path, sizes in files.items()},
+        "rss_bytes": sum(sizes["rss_bytes"] for sizes in files.values()),
+        "pss_bytes": sum(sizes["pss_bytes"] for sizes in files.values()),
+    }
+    return report
+
+
+def memory_metrics() -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+    report = memory_report()
+    families = [
+        (
+            "radprogressor_process_peak_rss_bytes",
+            "gauge",
+            "Peak resident set size of this worker.",
+            [({}, report["peak_rss_bytes"])],
+        )
+    ]
+    for key, description in (
+        ("rss_bytes", "Resident set size of this worker."),
+        (
+            "pss_bytes",
+            "Proportional set size: shared pages divided among their sharers.",
+        ),
+        ("uss_bytes", "Memory resident only in this worker."),
+    ):
+        if key in report:
+            families.append(
+                (
+                    f"radprogressor_process_{key}",
+                    "gauge",
+                    description,
+                    [({}, report[key])],
+                )
+            )
+    if "shared_weights" in report:
+        families.append(("radprogressor_shared_weights_pss_bytes", "gauge",
+                         "PSS of the memory-mapped shared model weights.",
+                         [({}, report["shared_weights"]["pss_bytes"])]))
+    return families
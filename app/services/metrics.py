@@ -0,0 +1,322 @@
+import abc
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], List[Tuple[str, str, str, List[Sample]]]]
+
+
+class _Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _labels(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples(),
+        ]
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for every label set, after HELP and TYPE."""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{self._labels(key)} {_number(value)}" for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative) + overflow, sum].
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self._series.items()
+            )
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket = self._labels(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_metrics: List[_Metric] = []
+_collectors: List[Collector] = []
+
+STAGE_SECONDS = Histogram(
+    "radprogressor_stage_seconds", "Time spent per pipeline stage.", ["stage"]
+)
+HTTP_SECONDS = Histogram(
+    "radprogressor_http_request_duration_seconds",
+    "HTTP request latency until the response starts.",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS = Counter(
+    "radprogressor_http_requests_total",
+    "HTTP requests handled.",
+    ["method", "route", "status"],
+)
+DB_QUERIES = Counter("radprogressor_db_queries_total", "SQL statements executed.")
+DB_SECONDS = Histogram(
+    "radprogressor_db_query_seconds", "SQL statement execution time."
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "radprogressor_model_load_seconds", "Time taken by the last model load.", ["model"]
+)
+
+# Per-request timings: stage -> [seconds, calls]. Set by the HTTP middleware;
+# run_in_pool copies the context into worker threads so spans there count too.
+_request_timings: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = (
+    contextvars.ContextVar("request_timings", default=None)
+)
+# Pool threads of one request share its dict, e.g. a parallel decode gather.
+_timings_lock = threading.Lock()
+
+
+def record(stage: str, seconds: float) -> None:
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    _add_request_timing(stage, seconds)
+
+
+def _add_request_timing(stage: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            entry = timings.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the block into ``radprogressor_stage_seconds`` and Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def start_request() -> contextvars.Token:
+    return _request_timings.set({})
+
+
+def finish_request(token: contextvars.Token) -> Dict[str, List[float]]:
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing(timings: Dict[str, List[float]], total_seconds: float) -> str:
+    parts = []
+    with _timings_lock:
+        stages = [(stage, tuple(entry)) for stage, entry in timings.items()]
+    for stage, (seconds, calls) in stages:
+        part = f"{stage};dur={seconds * 1000:.2f}"
+        if stage == "db":
+            part += f';desc="{calls} queries"'
+        parts.append(part)
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    if METRICS_ENABLED:
+        HTTP_SECONDS.observe(seconds, method, route, str(status))
+        HTTP_REQUESTS.inc(method, route, str(status))
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run on ``engine``."""
+    from sqlalchemy import event
+
+    if not METRICS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.inc()
+        DB_SECONDS.observe(elapsed)
+        _add_request_timing("db", elapsed)
+
+
+def register_collector(collector: Collector) -> None:
+    """Add a callable returning metric families.
+
+    Each family is ``(name, type, description, [(labels, value)])``.
+    Collectors run on every scrape.
+    """
+    _collectors.append(collector)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, kind, description, samples in collector():
+            lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {kind}"])
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{key}="{_escape(val)}"' for key, val in labels.items()
+                )
+                lines.append(
+                    f"{name}{{{label_text}}} {_number(value)}"
+                    if label_text
+                    else f"{name} {_number(value)}"
+                )
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram and a ``Server-Timing`` header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        token = start_request()
+        timings = _request_timings.get()
+        responded = False
+
+        async def send_with_timing(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                elapsed = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        server_timing(timings, elapsed).encode("latin-1"),
+                    )
+                )
+                message = {**message, "headers": headers}
+                observe_request(
+                    scope["method"], _route(scope), message["status"], elapsed
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            if not responded:
+                observe_request(
+                    scope["method"], _route(scope), 500, time.perf_counter() - started
+                )
+            raise
+        finally:
+            finish_request(token)
+
+
+def _route(scope) -> str:
+    # The route template, not the raw path, keeps label cardinality bounded.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
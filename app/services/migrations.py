@@ -0,0 +1,136 @@
+import logging
+from datetime import datetime
+from typing import Callable, Collection, Dict, List
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    delete,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+Backfill = Callable[[Engine], int]
+
+# Resumable backfills that ran to the end, so later starts skip their scan.
+_state = MetaData()
+completed_backfills = Table(
+    "completed_backfills",
+    _state,
+    Column("name", String, primary_key=True),
+    Column("completed_at", DateTime, nullable=False),
+)
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> Dict[str, List[str]]:
+    """Add columns declared in ``metadata`` but missing from existing tables.
+
+    Only nullable columns without server defaults are expected here, which is
+    what ``ALTER TABLE ... ADD COLUMN`` supports on every backend we target.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added: Dict[str, List[str]] = {}
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                statement = (
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                )
+                conn.execute(text(statement))
+                added.setdefault(table.name, []).append(column.name)
+    return added
+
+def create_missing_indexes(engine: Engine, metadata: MetaData) -> List[str]:
+    inspector = inspect(engine)
+    created = []
+    for table in metadata.sorted_tables:
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(bind=engine, checkfirst=True)
+                created.append(index.name)
+    return created
+
+def migrate(
+    engine: Engine,
+    metadata: MetaData,
+    backfills: Dict[str, Backfill],
+    resumable: Collection[str] = (),
+) -> Dict[str, object]:
+    """Bring a new or existing database up to ``metadata``.
+
+    ``create_all`` creates missing tables but never alters existing ones, so
+    missing columns and indexes are added here. ``backfills`` maps a table
+    name to a function that fills it from data already stored elsewhere; it
+    runs when the table was just created or had columns added. Backfills
+    named in ``resumable`` select only the rows they have not filled yet and
+    run on every migration until one finishes, so one interrupted by a
+    restart is finished on the next start instead of leaving those rows empty
+    for good. Finishing is recorded in ``completed_backfills``, so later
+    starts do not scan the table again for rows the backfill cannot fill.
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    metadata.create_all(engine)
+    _state.create_all(engine)
+    with engine.connect() as conn:
+        completed = set(conn.scalars(select(completed_backfills.c.name)))
+    created = [
+        table.name
+        for table in metadata.sorted_tables
+        if table.name not in existing_tables
+    ]
+    added = add_missing_columns(engine, metadata)
+    backfilled = {}
+    for table, backfill in backfills.items():
+        changed = table in added or table in created
+        pending = table in resumable and table not in completed
+        if changed or pending:
+            if table in resumable:
+                _set_completed(engine, table, False)
+            rows = backfill(engine)
+            if table in resumable:
+                _set_completed(engine, table, True)
+            if changed or rows:
+                backfilled[table] = rows
+    indexes = create_missing_indexes(engine, metadata)
+    if existing_tables and (created or added or backfilled or indexes):
+        logger.info(
+            "Migrated database: created tables %s, added columns %s, "
+            "backfilled rows %s, created indexes %s",
+            created,
+            added,
+            backfilled,
+            indexes,
+        )
+    return {
+        "created_tables": created,
+        "added_columns": added,
+        "backfilled_rows": backfilled,
+        "created_indexes": indexes,
+    }
+
+def _set_completed(engine: Engine, name: str, done: bool) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            delete(completed_backfills).where(completed_backfills.c.name == name)
+        )
+        if done:
+            conn.execute(
+                insert(completed_backfills).values(
+                    name=name, completed_at=datetime.utcnow()
+                )
+            )
@@ -2,8 +2,44 @@ import pydicom
 from PIL import Image
 import torch
 import numpy as np
-from typing import Union, Tuple
+from typing import Any, Dict, List, Optional, Union, Tuple
+import csv
 import io
+import json
+import logging
+import os
+import tarfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from contextlib import nullcontext
+
+from app.config import (
+    ARCHIVE_MAX_BYTES,
+    ARCHIVE_MAX_MEMBERS,
+    DICOM_ALLOWED_MODALITIES,
+    DICOM_DECODE_TARGET_SIZE,
+    DICOM_MAX_BYTES,
+    DICOM_MAX_FRAME_PIXELS,
+    DICOM_TRACE_MEMORY,
+)
+
+try:
+    from pydicom.pixels import pixel_array as _frame_array
+except ImportError:  # pydicom < 3
+    _frame_array = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+
+PIXEL_DATA_TAG = 0x7FE00010
+
+_trace_lock = threading.Lock()
+
+class ImageValidationError(ValueError):
+    pass
 
 def load_image(file_content: bytes, filename: str) -> Tuple[Image.Image, torch.Tensor]:
     if filename.lower().endswith('.dcm'):
@@ -11,15 +47,197 @@ def load_image(file_content: bytes, filename: str) -> Tuple[Image.Image, torch.T
     else:
         return load_png_jpg(file_content)
 
-def load_dicom(file_content: bytes) -> Tuple[Image.Image, torch.Tensor]:
-    ds = pydicom.dcmread(io.BytesIO(file_content))
-    pixel_array = ds.pixel_array
+def load_pixels(file_content: bytes, filename: str) -> np.ndarray:
+    if filename.lower().endswith('.dcm'):
+        return dicom_pixels(file_content, target_size=DICOM_DECODE_TARGET_SIZE or None)
+    else:
+        return png_jpg_pixels(file_content)
+
+def load_pixels_file(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        return load_pixels(f.read(), os.path.basename(path))
+
+def read_study_info(path: str) -> Dict[str, str]:
+    """Patient ID and ISO study date from a DICOM header, without the pixel data."""
+    header = pydicom.dcmread(path, stop_before_pixels=True)
+    study_date = str(
+        header.get("StudyDate")
+        or header.get("SeriesDate")
+        or header.get("AcquisitionDate")
+        or ""
+    )
+    if len(study_date) == 8 and study_date.isdigit():
+        study_date = f"{study_date[:4]}-{study_date[4:6]}-{study_date[6:]}"
+    return {"patient_id": str(header.get("PatientID") or ""), "study_date": study_date}
+
+def normalize_pixels(pixel_array: np.ndarray) -> np.ndarray:
+    pixels = pixel_array.astype(np.float32)
+    low, high = float(pixels.min()), float(pixels.max())
+    if high > low:
+        pixels -= low
+        pixels *= 1.0 / (high - low)
+    else:
+        pixels.fill(0.0)
+    return pixels
+
+def dicom_pixels(
+    file_content: bytes, frame: int = 0, target_size: Optional[int] = None
+) -> np.ndarray:
+    pixels, _ = decode_dicom(file_content, frame, target_size)
+    return pixels
+
+def read_dicom_header(file_content: bytes) -> pydicom.Dataset:
+    if len(file_content) > DICOM_MAX_BYTES:
+        raise ImageValidationError(
+            f"DICOM is {len(file_content)} bytes, limit is {DICOM_MAX_BYTES}"
+        )
+    # Large elements (Pixel Data, overlays) stay deferred until accessed.
+    header = pydicom.dcmread(io.BytesIO(file_content), defer_size=1024)
+
+    if PIXEL_DATA_TAG not in header:
+        raise ImageValidationError("DICOM has no pixel data")
+    modality = str(header.get("Modality", "")).upper()
+    if (
+        modality
+        and DICOM_ALLOWED_MODALITIES
+        and modality not in DICOM_ALLOWED_MODALITIES
+    ):
+        raise ImageValidationError(f"Unsupported modality: {modality}")
+    rows, columns = int(header.get("Rows", 0)), int(header.get("Columns", 0))
+    if rows <= 0 or columns <= 0:
+        raise ImageValidationError("DICOM is missing Rows/Columns")
+    if rows * columns > DICOM_MAX_FRAME_PIXELS:
+        raise ImageValidationError(
+            f"Frame of {rows}x{columns} exceeds {DICOM_MAX_FRAME_PIXELS} pixels"
+        )
+    return header
+
+def decode_dicom(
+    file_content: bytes, frame: int = 0, target_size: Optional[int] = None
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Decode one frame of a DICOM to normalized float32 pixels.
+
+    The header is parsed and validated before any pixel data is decoded, and
+    only ``frame`` is decoded. With ``target_size`` the frame is subsampled to
+    no less than twice that edge length; for uncompressed data the subsampled
+    pixels are read straight out of the upload without decoding the full frame.
+    """
+    with _trace_lock if DICOM_TRACE_MEMORY else nullcontext():
+        if DICOM_TRACE_MEMORY:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            header = read_dicom_header(file_content)
+            frames = int(header.get("NumberOfFrames", 1) or 1)
+            if not 0 <= frame < frames:
+                raise ImageValidationError(
+                    f"Frame {frame} out of range for {frames} frame(s)"
+                )
+
+            rows, columns = int(header.Rows), int(header.Columns)
+            step = _subsample_step(rows, columns, target_size)
+            pixel_array = _read_native_frame(file_content, header, frame, step)
+            direct = pixel_array is not None
+            if not direct:
+                pixel_array = _decode_frame(file_content, header, frame, frames)
+                if pixel_array.ndim == 3:
+                    pixel_array = pixel_array[:, :, 0]
+                pixel_array = np.ascontiguousarray(pixel_array[::step, ::step])
+            decoded_bytes = (
+                pixel_array.nbytes
+                if direct
+                else rows * columns * _frame_itemsize(header)
+            )
+
+            pixels = normalize_pixels(pixel_array)
+            peak_bytes = (
+                tracemalloc.get_traced_memory()[1] if DICOM_TRACE_MEMORY else None
+            )
+        finally:
+            if DICOM_TRACE_MEMORY:
+                tracemalloc.stop()
+
+    stats = {
+        "rows": rows,
+        "columns": columns,
+        "frames": frames,
+        "frame": frame,
+        "transfer_syntax": str(header.file_meta.get("TransferSyntaxUID", "")),
+        "subsample_step": step,
+        "decoded_shape": list(pixels.shape),
+        "input_bytes": len(file_content),
+        "decoded_bytes": decoded_bytes,
+        "output_bytes": pixels.nbytes,
+        "peak_bytes": peak_bytes,
+        "decode_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    logger.debug("Decoded DICOM frame: %s", stats)
+    return pixels, stats
+
+def _subsample_step(rows: int, columns: int, target_size: Optional[int]) -> int:
+    if not target_size:
+        return 1
+    return max(1, min(rows, columns) // (2 * target_size))
+
+def _frame_itemsize(header: pydicom.Dataset) -> int:
+    return max(1, int(header.get("BitsAllocated", 8)) // 8) * int(
+        header.get("SamplesPerPixel", 1)
+    )
+
+def _read_native_frame(file_content: bytes, header: pydicom.Dataset, frame: int,
+                       step: int) -> Optional[np.ndarray]:
+    transfer_syntax = header.file_meta.get("TransferSyntaxUID")
+    if (
+        transfer_syntax is None
+        or transfer_syntax.is_compressed
+        or transfer_syntax.is_deflated
+    ):
+        return None
+    bits_allocated = int(header.get("BitsAllocated", 0))
+    bits_stored = int(header.get("BitsStored", bits_allocated))
+    signed = int(header.get("PixelRepresentation", 0)) == 1
+    if (bits_allocated not in (8, 16, 32) or int(header.get("SamplesPerPixel", 1)) != 1
+            or (signed and bits_stored != bits_allocated)):
+        return None
+    try:
+        element = header.get_item(PIXEL_DATA_TAG, keep_deferred=True)
+    except TypeError:  # pydicom < 3 never converts in get_item
+        element = header.get_item(PIXEL_DATA_TAG)
+    offset = getattr(element, "value_tell", None)
+    if offset is None or element.value is not None:
+        return None
+
+    rows, columns = int(header.Rows), int(header.Columns)
+    byte_order = "<" if transfer_syntax.is_little_endian else ">"
+    dtype = np.dtype(f"{byte_order}{'i' if signed else 'u'}{bits_allocated // 8}")
+    frame_offset = offset + frame * rows * columns * dtype.itemsize
+    if frame_offset + rows * columns * dtype.itemsize > len(file_content):
+        raise ImageValidationError("Pixel data is truncated")
+    view = np.frombuffer(
+        file_content, dtype=dtype, count=rows * columns, offset=frame_offset
+    )
+    return np.ascontiguousarray(view.reshape(rows, columns)[::step, ::step])
+
+def _decode_frame(
+    file_content: bytes, header: pydicom.Dataset, frame: int, frames: int
+) -> np.ndarray:
+    if _frame_array is not None:
+        return _frame_array(io.BytesIO(file_content), index=frame)
+    pixel_array = header.pixel_array
+    return pixel_array[frame] if frames > 1 else pixel_array
+
+def png_jpg_pixels(file_content: bytes) -> np.ndarray:
+    image = Image.open(io.BytesIO(file_content))
     
-    if len(pixel_array.shape) == 3:
-        pixel_array = pixel_array[:, :, 0]
+    if image.mode in ('I', 'I;16', 'I;16B', 'F'):
+        return normalize_pixels(np.asarray(image))
+    if image.mode != 'L':
+        image = image.convert('L')
     
-    pixel_array = ((pixel_array - pixel_array.min()) / 
-                   (pixel_array.max() - pixel_array.min()) * 255).astype(np.uint8)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+def load_dicom(file_content: bytes) -> Tuple[Image.Image, torch.Tensor]:
+    pixel_array = (dicom_pixels(file_content) * 255).astype(np.uint8)
     
     image = Image.fromarray(pixel_array, mode='L')
     tensor = torch.from_numpy(pixel_array).float() / 255.0
@@ -35,3 +253,122 @@ def load_png_jpg(file_content: bytes) -> Tuple[Image.Image, torch.Tensor]:
     tensor = torch.from_numpy(np.array(image)).float() / 255.0
     
     return image, tensor
+
+def read_archive(
+    file_content: bytes,
+    filename: str,
+    max_members: int = ARCHIVE_MAX_MEMBERS,
+    max_bytes: int = ARCHIVE_MAX_BYTES,
+) -> Dict[str, bytes]:
+    """Files in a zip or tar upload.
+
+    Raises ``ValueError`` for a corrupt or truncated archive, past
+    ``max_members`` files or past ``max_bytes`` uncompressed. Limits are
+    checked against the sizes in the member headers before any member is
+    read, and reads never go past those sizes.
+    """
+    name = filename.lower()
+    if name.endswith(".zip"):
+        read = _read_zip
+    elif name.endswith((".tar", ".tar.gz", ".tgz")):
+        read = _read_tar
+    else:
+        raise ValueError(f"Unsupported archive type: {filename}")
+    try:
+        return read(file_content, max_members, max_bytes)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        # Corrupt or truncated uploads; a truncated gzip stream ends in EOFError.
+        raise ValueError(f"Unreadable archive: {filename}") from e
+
+def _read_zip(
+    file_content: bytes, max_members: int, max_bytes: int
+) -> Dict[str, bytes]:
+    members: Dict[str, bytes] = {}
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+        infos = [info for info in archive.infolist() if not info.is_dir()]
+        _check_archive_size(
+            len(infos),
+            sum(info.file_size for info in infos),
+            max_members,
+            max_bytes,
+        )
+        for info in infos:
+            members[info.filename] = archive.read(info)
+    return members
+
+def _read_tar(
+    file_content: bytes, max_members: int, max_bytes: int
+) -> Dict[str, bytes]:
+    members: Dict[str, bytes] = {}
+    with tarfile.open(fileobj=io.BytesIO(file_content), mode="r:*") as archive:
+        count, total = 0, 0
+        # Iterated lazily so a compressed bomb is rejected before it is fully
+        # expanded.
+        for member in archive:
+            if member.isfile():
+                count, total = count + 1, total + member.size
+                _check_archive_size(count, total, max_members, max_bytes)
+                members[member.name] = archive.extractfile(member).read()
+    return members
+
+def _check_archive_size(
+    count: int, total: int, max_members: int, max_bytes: int
+) -> None:
+    if count > max_members:
+        raise ValueError(f"Archive has more than {max_members} files")
+    if total > max_bytes:
+        raise ValueError(f"Archive expands to more than {max_bytes} bytes")
+
+def parse_manifest(
+    content: Union[str, bytes], filename: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    if filename is None:
+        is_csv = content.lstrip()[:1] not in ("[", "{")
+    else:
+        is_csv = filename.lower().endswith(".csv")
+    if is_csv:
+        entries = list(csv.DictReader(io.StringIO(content)))
+    else:
+        entries = json.loads(content)
+        if isinstance(entries, dict):
+            entries = entries.get("studies", [])
+        if not isinstance(entries, list):
+            raise ValueError("Manifest must be a list of studies")
+    studies = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError(f"Manifest entry {entry!r} is not an object")
+        missing = [
+            key
+            for key in ("filename", "patient_id", "study_date")
+            if not entry.get(key)
+        ]
+        if missing:
+            raise ValueError(
+                f"Manifest entry {entry!r} is missing {', '.join(missing)}"
+            )
+        studies.append({
+            "filename": entry["filename"],
+            "patient_id": str(entry["patient_id"]),
+            "study_date": str(entry["study_date"]),
+            "report_text": entry.get("report") or entry.get("report_text") or "",
+        })
+    return studies
+
+def find_manifest(files: Dict[str, bytes]) -> Tuple[str, bytes]:
+    for path, content in files.items():
+        if os.path.basename(path).lower() in MANIFEST_NAMES:
+            return path, content
+    raise ValueError("No manifest provided and none found in archive")
+
+def match_file(files: Dict[str, bytes], filename: str) -> bytes:
+    if filename in files:
+        return files[filename]
+    matches = [
+        path for path in files if os.path.basename(path) == os.path.basename(filename)
+    ]
+    if len(matches) != 1:
+        raise ValueError(f"File not found in upload: {filename}")
+    return files[matches[0]]
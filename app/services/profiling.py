@@ -0,0 +1,218 @@
+import cProfile
+import functools
+import hmac
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.config import (
+    PROFILE_DIR,
+    PROFILE_MAX_BYTES,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_TOKEN,
+    PROFILING_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+_FILE_NAME = re.compile(r"^[\w-]+\.(trace\.json|pstats)$")
+_capturing: ContextVar[bool] = ContextVar("profiling_capturing", default=False)
+
+
+class Profiler:
+    """Captures a torch.profiler Chrome trace and cProfile stats around selected calls.
+
+    A call is profiled when its request asks for it with the ``X-Profile``
+    header, when captures were armed through the admin endpoint, or by random
+    sampling at ``sample_rate``. One capture runs at a time: torch.profiler is
+    process-wide, so overlapping requests run unprofiled instead of waiting.
+
+    cProfile only sees the capturing thread, so while ``capturing()`` is true
+    the inference code bypasses the micro-batcher threads and runs the models
+    inline. Work done on other threads, such as GenAI requests on the summary
+    client's event loop, shows up in the stats only as waiting.
+    """
+
+    def __init__(
+        self,
+        directory: str = PROFILE_DIR,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        max_bytes: int = PROFILE_MAX_BYTES,
+        token: Optional[str] = PROFILE_TOKEN,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.token = token
+        self._lock = threading.Lock()
+        self._capture_lock = threading.Lock()
+        self._armed = 0
+
+    def arm(self, count: int) -> int:
+        with self._lock:
+            self._armed = max(0, count)
+            return self._armed
+
+    def authorized(self, header: Optional[str]) -> bool:
+        """Whether ``header`` carries the admin token; always False without a token."""
+        return (
+            bool(self.token)
+            and header is not None
+            and hmac.compare_digest(header.encode(), self.token.encode())
+        )
+
+    def should_profile(self, header: Optional[str] = None) -> bool:
+        if header is not None and hmac.compare_digest(
+            header.encode(), (self.token or "1").encode()
+        ):
+            return True
+        with self._lock:
+            if self._armed > 0:
+                self._armed -= 1
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def capture(self, label: str) -> Iterator[Optional[str]]:
+        """Profile the block; yields the profile id, or None if another capture runs."""
+        if not self._capture_lock.acquire(blocking=False):
+            yield None
+            return
+        from torch.profiler import ProfilerActivity, profile
+
+        profile_id = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{_safe(label)}-{uuid.uuid4().hex[:6]}"
+        )
+        python_profiler = cProfile.Profile()
+        torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+        capturing = _capturing.set(True)
+        try:
+            # Saved even when the call fails: slow failures are worth a look too.
+            with torch_profiler:
+                python_profiler.enable()
+                try:
+                    yield profile_id
+                finally:
+                    python_profiler.disable()
+        finally:
+            _capturing.reset(capturing)
+            try:
+                self._save(profile_id, torch_profiler, python_profiler)
+            finally:
+                self._capture_lock.release()
+
+    def _save(
+        self, profile_id: str, torch_profiler: Any, python_profiler: cProfile.Profile
+    ) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            torch_profiler.export_chrome_trace(
+                os.path.join(self.directory, f"{profile_id}.trace.json")
+            )
+            python_profiler.dump_stats(
+                os.path.join(self.directory, f"{profile_id}.pstats")
+            )
+            self.rotate()
+            logger.info("Saved profile %s", profile_id)
+        except Exception:
+            logger.exception("Could not save profile %s", profile_id)
+
+    def wrap(
+        self, fn: Callable[..., Any], label: str, on_capture: Callable[[str], None]
+    ) -> Callable[..., Any]:
+        """``fn`` run under ``capture``.
+
+        ``on_capture`` receives the profile id before ``fn`` starts.
+        """
+        @functools.wraps(fn)
+        def profiled(*args: Any, **kwargs: Any) -> Any:
+            with self.capture(label) as profile_id:
+                if profile_id is not None:
+                    on_capture(profile_id)
+                return fn(*args, **kwargs)
+        return profiled
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for entry in os.scandir(self.directory):
+            if not _FILE_NAME.match(entry.name):
+                continue
+            stat = entry.stat()
+            profile_id = entry.name.split(".", 1)[0]
+            profile = profiles.setdefault(
+                profile_id,
+                {
+                    "id": profile_id,
+                    "created_at": stat.st_mtime,
+                    "bytes": 0,
+                    "files": [],
+                },
+            )
+            profile["created_at"] = min(profile["created_at"], stat.st_mtime)
+            profile["bytes"] += stat.st_size
+            profile["files"].append(entry.name)
+        for profile in profiles.values():
+            profile["files"].sort()
+        return sorted(
+            profiles.values(), key=lambda profile: profile["created_at"], reverse=True
+        )
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a saved profile file, or None for unknown or malformed names."""
+        if not _FILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def rotate(self) -> None:
+        """Delete the oldest profiles until the directory fits in ``max_bytes``.
+
+        The newest profile is always kept.
+        """
+        profiles = self.list()
+        total = sum(profile["bytes"] for profile in profiles)
+        while len(profiles) > 1 and total > self.max_bytes:
+            oldest = profiles.pop()
+            for name in oldest["files"]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            total -= oldest["bytes"]
+
+
+def _safe(label: str) -> str:
+    return re.sub(r"[^\w-]+", "_", label)[:40]
+
+
+_profiler: Optional[Profiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = Profiler()
+    return _profiler
+
+
+def capturing() -> bool:
+    """True inside a ``capture`` block, in its thread."""
+    return _capturing.get()
+
+
+def profiling_requested(header: Optional[str]) -> bool:
+    # Checked before anything else so a disabled profiler costs one branch per request.
+    return PROFILING_ENABLED and get_profiler().should_profile(header)
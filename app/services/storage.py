@@ -1,12 +1,43 @@
-from sqlalchemy import create_engine, Column, String, Float, DateTime, Text, Integer
+from sqlalchemy import (
+    create_engine,
+    event,
+    Column,
+    String,
+    Float,
+    DateTime,
+    Text,
+    Integer,
+    Index,
+    bindparam,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.dialects.sqlite import JSON
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import JSON, insert as sqlite_insert
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Set, Tuple
+import base64
 import json
 
-from app.config import DATABASE_URL
+from app.config import (
+    CHEST_XRAY_LABELS,
+    DATABASE_URL,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_MB,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE_MB,
+    SQLITE_SYNCHRONOUS,
+    TREND_EWMA_ALPHA,
+)
+from app.models.progression import build_trend, new_trend, update_trend
+from app.services.metrics import instrument_engine
+from app.services.migrations import migrate
 
 Base = declarative_base()
 
@@ -25,9 +56,264 @@ class Study(Base):
     progression_score = Column(Float)
     genai_result = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Copies of the fields timeline queries read, so they never decode the
+    # JSON blobs above. Filled on write; see summary_columns().
+    severity_score = Column(Float)
+    change = Column(String)
+    delta = Column(Integer)
+    # ScoreWeights.version that produced progression_score; NULL for rows
+    # written before weights were versioned.
+    score_version = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_studies_patient_date", "patient_id", "study_date", "id"),
+    )
+
+# One probability column per configured label, e.g. ``p_effusion``.
+LABEL_COLUMNS = {label: f"p_{label}" for label in CHEST_XRAY_LABELS}
+for _label, _column in LABEL_COLUMNS.items():
+    setattr(Study, _column, Column(_column, Float))
+
+def summary_columns(
+    cv_result: Optional[Dict], nlp_result: Optional[Dict]
+) -> Dict[str, Any]:
+    cv_result = cv_result or {}
+    nlp_result = nlp_result or {}
+    labels = cv_result.get("labels") or {}
+    columns = {
+        "severity_score": cv_result.get("severity_score"),
+        "change": nlp_result.get("change", "stable"),
+        "delta": nlp_result.get("delta", 0),
+    }
+    for label, column in LABEL_COLUMNS.items():
+        columns[column] = labels.get(label)
+    return columns
+
+class PatientTrend(Base):
+    """Per-patient aggregate of the study series, kept current by ``insert_studies``.
+
+    See ``progression.update_trend`` for the fields; ``sum_*`` are the
+    least-squares sums over (days since 1970, score).
+    """
+    __tablename__ = "patient_trends"
+    patient_id = Column(String, primary_key=True)
+    study_count = Column(Integer, nullable=False)
+    first_date = Column(String)
+    prev_date = Column(String)
+    last_date = Column(String)
+    prev_score = Column(Float)
+    last_score = Column(Float)
+    ewma = Column(Float)
+    slope_n = Column(Integer, nullable=False)
+    sum_x = Column(Float, nullable=False)
+    sum_y = Column(Float, nullable=False)
+    sum_xx = Column(Float, nullable=False)
+    sum_xy = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped on every write to the patient's studies; HTTP caching keys on it.
+    version = Column(Integer, default=1)
+
+TREND_FIELDS = list(new_trend())
+
+class Job(Base):
+    """An asynchronous analysis request; see ``app.services.jobs``."""
+    __tablename__ = "jobs"
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    stage = Column(String, nullable=False)
+    patient_id = Column(String, nullable=False)
+    study_date = Column(String, nullable=False)
+    filename = Column(String)
+    report_text = Column(Text)
+    upload_path = Column(String)
+    worker = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
+
+class IngestedFile(Base):
+    """Checkpoint of a source file loaded by ``scripts/ingest.py``."""
+    __tablename__ = "ingested_files"
+    source = Column(String, primary_key=True)
+    status = Column(String, nullable=False)
+    patient_id = Column(String)
+    study_date = Column(String)
+    error = Column(Text)
+    ingested_at = Column(DateTime, default=datetime.utcnow)
+
+class ScoreWeights(Base):
+    """A set of progression score weights; studies scored with it carry ``version``."""
+    __tablename__ = "score_weights"
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    alpha = Column(Float, nullable=False)
+    beta = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ux_score_weights_alpha_beta", "alpha", "beta", unique=True),
+    )
+
+class StudyTensor(Base):
+    """Where a study's preprocessed image lives in ``app.services.tensor_store``."""
+    __tablename__ = "study_tensors"
+    study_id = Column(Integer, primary_key=True)
+    chunk = Column(Integer, nullable=False)
+    row = Column(Integer, nullable=False)
+    crc32 = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_study_tensors_chunk_row", "chunk", "row"),
+    )
+
+class CVResultCache(Base):
+    __tablename__ = "cv_result_cache"
+    key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    labels = Column(JSON, nullable=False)
+    severity_score = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_cv_result_cache_model", "model"),
+        Index("ix_cv_result_cache_last_used_at", "last_used_at"),
+    )
+
+def _backfill_studies(bind, chunk_size: int = 5000) -> int:
+    table = Study.__table__
+    pending = (select(table.c.id, table.c.cv_result, table.c.nlp_result)
+               .where(table.c.severity_score.is_(None), table.c.cv_result.is_not(None),
+                      table.c.id > bindparam("after"))
+               .order_by(table.c.id).limit(chunk_size))
+    fill = update(table).where(table.c.id == bindparam("_id"))
+    total, after = 0, 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(pending, {"after": after}).all()
+            if not rows:
+                return total
+            conn.execute(
+                fill,
+                [
+                    {"_id": row.id, **summary_columns(row.cv_result, row.nlp_result)}
+                    for row in rows
+                ],
+            )
+        total += len(rows)
+        after = rows[-1].id
+
+def configure_sqlite(engine) -> None:
+    """Apply the ``SQLITE_*`` pragmas to every new connection of ``engine``.
+
+    WAL lets readers run alongside the single writer, and with
+    ``synchronous=NORMAL`` a commit no longer fsyncs the database file (only
+    checkpoints do). ``busy_timeout`` makes a second writer wait for the lock
+    instead of failing with "database is locked".
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_MB * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+# Dialects whose INSERT supports ON CONFLICT, which the upserts below rely on.
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+def check_upsert_dialect(engine) -> None:
+    if engine.dialect.name not in _UPSERT_INSERTS:
+        raise RuntimeError(
+            f"DATABASE_URL uses {engine.dialect.name}, which has no ON CONFLICT "
+            f"upsert; use one of {sorted(_UPSERT_INSERTS)}"
+        )
+
+def _upsert_insert(table, bind):
+    """``INSERT`` into ``table`` supporting ``on_conflict_do_*`` on ``bind``."""
+    dialect = bind.get_bind().dialect if isinstance(bind, Session) else bind.dialect
+    return _UPSERT_INSERTS[dialect.name](table)
+
+def _trend_upsert(bind):
+    """Insert-or-replace trend rows, bumping ``version`` on replace."""
+    statement = _upsert_insert(PatientTrend, bind)
+    return statement.on_conflict_do_update(
+        index_elements=["patient_id"],
+        set_={**{field: statement.excluded[field] for field in TREND_FIELDS},
+              "updated_at": statement.excluded.updated_at,
+              "version": func.coalesce(PatientTrend.version, 0) + 1},
+    )
+
+def _trend_rows(trends: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return [
+        {"patient_id": patient_id, **trend, "updated_at": now, "version": 1}
+        for patient_id, trend in trends.items()
+    ]
+
+def rebuild_trends(
+    bind, chunk_size: int = 5000, patient_ids: Optional[Iterable[str]] = None
+) -> int:
+    """Recompute the ``patient_trends`` rows (all, or ``patient_ids``) from studies."""
+    if patient_ids is not None:
+        patient_ids = sorted(set(patient_ids))
+        return sum(_rebuild_trends(bind, chunk_size, patient_ids[start:start + 500])
+                   for start in range(0, len(patient_ids), 500))
+    return _rebuild_trends(bind, chunk_size)
+
+def _rebuild_trends(
+    bind, chunk_size: int, patient_ids: Optional[List[str]] = None
+) -> int:
+    table = Study.__table__
+    query = (select(table.c.patient_id, table.c.study_date, table.c.progression_score)
+             .order_by(table.c.patient_id, table.c.study_date, table.c.id))
+    if patient_ids is not None:
+        query = query.where(table.c.patient_id.in_(patient_ids))
+    trends: Dict[str, Dict[str, Any]] = {}
+    patients = 0
+    with bind.begin() as conn:
+        current, trend = None, None
+        for patient_id, study_date, progression_score in conn.execute(query):
+            if patient_id != current:
+                if current is not None:
+                    trends[current] = trend
+                current, trend = patient_id, new_trend()
+                patients += 1
+            trend = update_trend(trend, study_date, progression_score, TREND_EWMA_ALPHA)
+            if len(trends) >= chunk_size:
+                conn.execute(_trend_upsert(conn), _trend_rows(trends))
+                trends = {}
+        if current is not None:
+            trends[current] = trend
+        if trends:
+            conn.execute(_trend_upsert(conn), _trend_rows(trends))
+    return patients
 
 engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(engine)
+check_upsert_dialect(engine)
+configure_sqlite(engine)
+instrument_engine(engine)
+migrate(
+    engine,
+    Base.metadata,
+    backfills={"studies": _backfill_studies, "patient_trends": rebuild_trends},
+    resumable=("studies",),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db() -> Session:
@@ -37,63 +323,390 @@ def get_db() -> Session:
     finally:
         db.close()
 
-def upsert_patient(patient_id: str) -> None:
+@contextmanager
+def unit_of_work(session_factory: Optional[sessionmaker] = None) -> Iterator[Session]:
+    """One session and one transaction: commit on success, roll back on error.
+
+    Issue writes before reads inside a unit of work. SQLite takes the write
+    lock at the first write, so a transaction that reads first can find that
+    another writer committed in between and fail instead of waiting.
+    """
+    db = (session_factory or SessionLocal)()
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def upsert_patients(db: Session, patient_ids: Iterable[str]) -> None:
+    rows = [{"patient_id": patient_id} for patient_id in sorted(set(patient_ids))]
+    if rows:
+        db.execute(
+            _upsert_insert(Patient, db).on_conflict_do_nothing(
+                index_elements=["patient_id"]
+            ),
+            rows,
+        )
+
+def insert_studies(db: Session, studies: Sequence[Dict[str, Any]]) -> List[int]:
+    """Bulk insert study rows (``add_study`` keyword dicts); returns their ids in order.
+
+    The patients' ``patient_trends`` rows are updated in the same transaction.
+    """
+    if not studies:
+        return []
+    ids = db.execute(insert(Study).returning(Study.id, sort_by_parameter_order=True), [
+        {**study, **summary_columns(study.get("cv_result"), study.get("nlp_result"))}
+        for study in studies
+    ]).scalars().all()
+    _update_trends(db, studies)
+    return list(ids)
+
+_score_versions: Dict[Tuple[float, float], int] = {}
+
+def score_weights_version(alpha: float, beta: float) -> int:
+    """Version id of the ``(alpha, beta)`` weights, registering them on first use."""
+    key = (float(alpha), float(beta))
+    version = _score_versions.get(key)
+    if version is None:
+        with engine.begin() as conn:
+            conn.execute(
+                _upsert_insert(ScoreWeights, conn).on_conflict_do_nothing(
+                    index_elements=["alpha", "beta"]
+                ),
+                {"alpha": key[0], "beta": key[1], "created_at": datetime.utcnow()},
+            )
+            version = conn.execute(select(ScoreWeights.version).where(
+                ScoreWeights.alpha == key[0], ScoreWeights.beta == key[1])).scalar_one()
+        _score_versions[key] = version
+    return version
+
+def score_weights() -> List[Dict[str, Any]]:
+    """Every registered weight version with the number of studies it scored."""
+    with engine.connect() as conn:
+        counts = dict(
+            conn.execute(
+                select(Study.score_version, func.count()).group_by(Study.score_version)
+            ).all()
+        )
+        return [
+            {
+                "version": row.version,
+                "alpha": row.alpha,
+                "beta": row.beta,
+                "studies": counts.get(row.version, 0),
+            }
+            for row in conn.execute(select(ScoreWeights).order_by(ScoreWeights.version))
+        ]
+
+def record_tensors(db: Session, rows: Sequence[Dict[str, Any]]) -> None:
+    """Insert ``study_tensors`` rows (``study_id``, ``chunk``, ``row``, ``crc32``)."""
+    if rows:
+        db.execute(
+            insert(StudyTensor),
+            [{**row, "created_at": datetime.utcnow()} for row in rows],
+        )
+
+def record_ingested(db: Session, rows: Sequence[Dict[str, Any]]) -> None:
+    """Upsert ``ingested_files`` rows (``source``, ``status`` and optionally
+    ``patient_id``, ``study_date``, ``error``)."""
+    if rows:
+        rows = [
+            {
+                "patient_id": None,
+                "study_date": None,
+                "error": None,
+                **row,
+                "ingested_at": datetime.utcnow(),
+            }
+            for row in rows
+        ]
+        statement = _upsert_insert(IngestedFile, db)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["source"],
+                set_={
+                    column: statement.excluded[column]
+                    for column in (
+                        "status",
+                        "patient_id",
+                        "study_date",
+                        "error",
+                        "ingested_at",
+                    )
+                },
+            ),
+            rows,
+        )
+
+def ingested_sources(statuses: Sequence[str] = ("ingested",)) -> Set[str]:
     db = SessionLocal()
     try:
-        patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
-        if not patient:
-            patient = Patient(patient_id=patient_id)
-            db.add(patient)
-            db.commit()
+        return set(
+            db.scalars(
+                select(IngestedFile.source).where(
+                    IngestedFile.status.in_(list(statuses))
+                )
+            )
+        )
     finally:
         db.close()
 
+def get_trends(db: Session, patient_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Trend state per patient (``progression.new_trend()`` if it has no studies)."""
+    patient_ids = sorted(set(patient_ids))
+    trends = {patient_id: new_trend() for patient_id in patient_ids}
+    if patient_ids:
+        columns = [getattr(PatientTrend, field) for field in TREND_FIELDS]
+        query = select(PatientTrend.patient_id, *columns).where(
+            PatientTrend.patient_id.in_(patient_ids)
+        )
+        for patient_id, *values in db.execute(query):
+            trends[patient_id] = dict(zip(TREND_FIELDS, values))
+    return trends
+
+def _update_trends(db: Session, studies: Sequence[Dict[str, Any]]) -> None:
+    by_patient: Dict[str, List[Tuple[str, float]]] = {}
+    for study in studies:
+        by_patient.setdefault(study["patient_id"], []).append(
+            (study["study_date"], study["progression_score"])
+        )
+
+    trends = get_trends(db, by_patient)
+    backdated = []
+    for patient_id, points in by_patient.items():
+        points.sort(key=lambda point: point[0])
+        trend = trends[patient_id]
+        if trend["last_date"] is not None and points[0][0] < trend["last_date"]:
+            # An earlier study changes the EWMA of everything after it.
+            backdated.append(patient_id)
+            continue
+        for study_date, value in points:
+            trend = update_trend(trend, study_date, value, TREND_EWMA_ALPHA)
+        trends[patient_id] = trend
+    for patient_id, history in score_histories(db, backdated).items():
+        trends[patient_id] = build_trend(history, TREND_EWMA_ALPHA)
+
+    db.execute(_trend_upsert(db), _trend_rows(trends))
+
+def score_histories(
+    db: Session, patient_ids: Iterable[str]
+) -> Dict[str, List[Tuple[str, float]]]:
+    """``(date, score)`` series for each patient, oldest first, in one query."""
+    patient_ids = sorted(set(patient_ids))
+    histories: Dict[str, List[Tuple[str, float]]] = {
+        patient_id: [] for patient_id in patient_ids
+    }
+    if not patient_ids:
+        return histories
+    query = (select(Study.patient_id, Study.study_date, Study.progression_score)
+             .where(Study.patient_id.in_(patient_ids))
+             .order_by(Study.patient_id, Study.study_date, Study.id))
+    for patient_id, date, progression_score in db.execute(query):
+        histories[patient_id].append((date, progression_score))
+    return histories
+
+def upsert_patient(patient_id: str) -> None:
+    with unit_of_work() as db:
+        upsert_patients(db, [patient_id])
+
 def add_study(patient_id: str, study_date: str, cv_result: Dict, nlp_result: Dict, 
               progression_score: float, genai_result: Dict) -> None:
-    db = SessionLocal()
+    with unit_of_work() as db:
+        insert_studies(db, [{
+            "patient_id": patient_id,
+            "study_date": study_date,
+            "cv_result": cv_result,
+            "nlp_result": nlp_result,
+            "progression_score": progression_score,
+            "genai_result": genai_result
+        }])
+
+def add_studies(studies: List[Dict[str, Any]]) -> None:
+    with unit_of_work() as db:
+        upsert_patients(db, (study["patient_id"] for study in studies))
+        insert_studies(db, studies)
+
+TIMELINE_FIELDS = (
+    "id",
+    "date",
+    "progression_score",
+    "severity_score",
+    "key_labels",
+    "change",
+    "delta",
+)
+DEFAULT_TIMELINE_FIELDS = ("date", "progression_score", "key_labels", "change")
+
+_TIMELINE_COLUMNS = {
+    "progression_score": [Study.progression_score],
+    "severity_score": [Study.severity_score],
+    "key_labels": [getattr(Study, column) for column in LABEL_COLUMNS.values()],
+    "change": [Study.change],
+    "delta": [Study.delta],
+}
+
+def encode_cursor(study_date: str, study_id: int) -> str:
+    """Opaque cursor for the timeline position just after ``(study_date, study_id)``."""
+    return (
+        base64.urlsafe_b64encode(json.dumps([study_date, study_id]).encode())
+        .decode()
+        .rstrip("=")
+    )
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
     try:
-        study = Study(
-            patient_id=patient_id,
-            study_date=study_date,
-            cv_result=cv_result,
-            nlp_result=nlp_result,
-            progression_score=progression_score,
-            genai_result=genai_result
+        study_date, study_id = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
         )
-        db.add(study)
-        db.commit()
+        return str(study_date), int(study_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def iter_timeline(
+    patient_id: str,
+    fields: Sequence[str] = DEFAULT_TIMELINE_FIELDS,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    chunk_size: int = 500,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(cursor, entry)`` per study in ``(study_date, id)`` order.
+
+    Rows are streamed from the database ``chunk_size`` at a time, so memory
+    does not grow with the length of the history. ``cursor`` resumes after
+    the entry it was returned with; ``since``/``until`` are inclusive dates.
+    Only the columns behind ``fields`` are read.
+    """
+    unknown = [field for field in fields if field not in TIMELINE_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown timeline fields: {', '.join(unknown)} "
+            f"(choose from {', '.join(TIMELINE_FIELDS)})"
+        )
+    columns = [Study.id, Study.study_date]
+    for field in fields:
+        columns.extend(_TIMELINE_COLUMNS.get(field, []))
+
+    query = select(*columns).where(Study.patient_id == patient_id)
+    if since:
+        query = query.where(Study.study_date >= since)
+    if until:
+        query = query.where(Study.study_date <= until)
+    if cursor:
+        query = query.where(tuple_(Study.study_date, Study.id) > decode_cursor(cursor))
+    query = query.order_by(Study.study_date, Study.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    with engine.connect() as conn:
+        rows = conn.execution_options(
+            stream_results=True, yield_per=chunk_size
+        ).execute(query)
+        for row in rows:
+            yield (
+                encode_cursor(row.study_date, row.id),
+                _timeline_entry(row._mapping, fields),
+            )
+
+def _timeline_entry(row, fields: Sequence[str]) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {}
+    for field in fields:
+        if field == "date":
+            entry["date"] = row["study_date"]
+        elif field == "key_labels":
+            entry["key_labels"] = {
+                label: row[column]
+                for label, column in LABEL_COLUMNS.items()
+                if row[column] is not None
+            }
+        elif field == "change":
+            entry["change"] = row["change"] or "stable"
+        else:
+            entry[field] = row[field]
+    return entry
+
+def timeline_page(
+    patient_id: str,
+    fields: Sequence[str] = DEFAULT_TIMELINE_FIELDS,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of the timeline and the cursor for the next page (None at the end)."""
+    rows = list(
+        iter_timeline(
+            patient_id,
+            fields,
+            since,
+            until,
+            cursor,
+            None if limit is None else limit + 1,
+        )
+    )
+    if limit is not None and len(rows) > limit:
+        return [entry for _, entry in rows[:limit]], rows[limit - 1][0]
+    return [entry for _, entry in rows], None
+
+def get_timeline(patient_id: str) -> List[Dict[str, Any]]:
+    return timeline_page(patient_id)[0]
+
+def get_score_history(patient_id: str) -> List[Tuple[str, float]]:
+    db = SessionLocal()
+    try:
+        return score_histories(db, [patient_id])[patient_id]
     finally:
         db.close()
 
-def get_timeline(patient_id: str) -> List[Dict[str, Any]]:
+def get_trend(patient_id: str) -> Dict[str, Any]:
     db = SessionLocal()
     try:
-        studies = db.query(Study).filter(Study.patient_id == patient_id).order_by(Study.study_date).all()
-        timeline = []
-        for study in studies:
-            timeline.append({
-                "date": study.study_date,
-                "progression_score": study.progression_score,
-                "key_labels": study.cv_result.get("labels", {}),
-                "change": study.nlp_result.get("change", "stable")
-            })
-        return timeline
+        return get_trends(db, [patient_id])[patient_id]
     finally:
         db.close()
 
+def get_patient_version(patient_id: str) -> Optional[Tuple[int, datetime]]:
+    """``(version, updated_at)`` of the patient's studies, or None if they have none."""
+    db = SessionLocal()
+    try:
+        row = db.execute(select(PatientTrend.version, PatientTrend.updated_at)
+                         .where(PatientTrend.patient_id == patient_id)).first()
+        return (row.version or 0, row.updated_at) if row else None
+    finally:
+        db.close()
+
+def get_snapshot(patient_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """The latest study and the trend state, read in one session."""
+    db = SessionLocal()
+    try:
+        study = (db.query(Study).filter(Study.patient_id == patient_id)
+                 .order_by(Study.study_date.desc(), Study.id.desc()).first())
+        if study is None:
+            return None
+        return _study_dict(study), get_trends(db, [patient_id])[patient_id]
+    finally:
+        db.close()
+
+def _study_dict(study: Study) -> Dict[str, Any]:
+    return {
+        "patient_id": study.patient_id,
+        "study_date": study.study_date,
+        "cv_result": study.cv_result,
+        "nlp_result": study.nlp_result,
+        "progression_score": study.progression_score,
+        "genai_result": study.genai_result
+    }
+
 def get_last_study(patient_id: str) -> Optional[Dict[str, Any]]:
     db = SessionLocal()
     try:
-        study = db.query(Study).filter(Study.patient_id == patient_id).order_by(Study.study_date.desc()).first()
-        if study:
-            return {
-                "patient_id": study.patient_id,
-                "study_date": study.study_date,
-                "cv_result": study.cv_result,
-                "nlp_result": study.nlp_result,
-                "progression_score": study.progression_score,
-                "genai_result": study.genai_result
-            }
-        return None
+        study = (db.query(Study).filter(Study.patient_id == patient_id)
+                 .order_by(Study.study_date.desc(), Study.id.desc()).first())
+        return _study_dict(study) if study else None
     finally:
         db.close()
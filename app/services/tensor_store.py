@@ -0,0 +1,258 @@
+"""Append-only store of resized study images for re-analysis without decoding.
+
+Each analyzed study's ``resize_batch`` plane (``IMAGE_SIZE x IMAGE_SIZE`` in
+``TENSOR_STORE_DTYPE``) is appended to a chunk file of ``TENSOR_STORE_CHUNK_ROWS``
+fixed-size rows under ``TENSOR_STORE_DIR``. The ``study_tensors`` table maps
+the study id to its ``(chunk, row)`` and a CRC-32 of the row bytes; index rows
+are written in the same transaction as their study. Reads memory-map the
+chunk files, so a run of consecutive rows is a zero-copy view.
+
+Appends from threads and from other processes are serialized by a file lock.
+A row whose transaction rolled back is never indexed; ``compact`` reclaims
+such rows and the rows of deleted studies.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, select, update
+
+from app.config import (
+    TENSOR_STORE_CHUNK_ROWS,
+    TENSOR_STORE_COMPACT_GRACE_SECONDS,
+    TENSOR_STORE_DIR,
+    TENSOR_STORE_DTYPE,
+)
+from app.models.cv_model import IMAGE_SIZE
+from app.services.storage import Study, StudyTensor, engine
+
+DTYPES = ("float32", "float16")
+_CHUNK_NAME = re.compile(r"^chunk-(\d{6})\.bin$")
+
+Position = Tuple[int, int]
+
+
+class TensorStore:
+    def __init__(
+        self,
+        directory: str = TENSOR_STORE_DIR,
+        dtype: str = TENSOR_STORE_DTYPE,
+        chunk_rows: int = TENSOR_STORE_CHUNK_ROWS,
+        size: int = IMAGE_SIZE,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(
+                f"Unsupported tensor store dtype: {dtype} "
+                f"(choose from {', '.join(DTYPES)})"
+            )
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.shape = (size, size)
+        self.row_bytes = size * size * self.dtype.itemsize
+        self._lock = threading.Lock()
+        self._maps: Dict[int, np.memmap] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._check_layout()
+
+    def _check_layout(self) -> None:
+        # Rows are addressed by offset, so the layout is fixed for the store's life.
+        layout = {
+            "dtype": self.dtype.name,
+            "shape": list(self.shape),
+            "chunk_rows": self.chunk_rows,
+        }
+        path = os.path.join(self.directory, "store.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                existing = json.load(f)
+            if existing != layout:
+                raise ValueError(
+                    f"Tensor store at {self.directory} has layout {existing}, "
+                    f"configured {layout}"
+                )
+        else:
+            with open(path, "w") as f:
+                json.dump(layout, f)
+
+    def chunk_path(self, chunk: int) -> str:
+        return os.path.join(self.directory, f"chunk-{chunk:06d}.bin")
+
+    def chunks(self) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in map(_CHUNK_NAME.match, os.listdir(self.directory))
+            if match
+        )
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        with self._lock, open(os.path.join(self.directory, "store.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def append(self, planes: np.ndarray) -> List[Tuple[int, int, int]]:
+        """Append ``N x H x W`` planes; returns ``(chunk, row, crc32)`` for each."""
+        planes = np.ascontiguousarray(planes, dtype=self.dtype).reshape(-1, *self.shape)
+        positions = []
+        with self._exclusive():
+            chunks = self.chunks()
+            chunk = chunks[-1] if chunks else 1
+            path = self.chunk_path(chunk)
+            # A torn trailing row from a crashed writer is overwritten.
+            row = os.path.getsize(path) // self.row_bytes if os.path.exists(path) else 0
+            done = 0
+            while done < len(planes):
+                if row >= self.chunk_rows:
+                    chunk, row = chunk + 1, 0
+                count = min(len(planes) - done, self.chunk_rows - row)
+                block = planes[done:done + count]
+                fd = os.open(self.chunk_path(chunk), os.O_WRONLY | os.O_CREAT, 0o644)
+                try:
+                    if os.pwrite(fd, block, row * self.row_bytes) != block.nbytes:
+                        raise OSError(f"Short write to {self.chunk_path(chunk)}")
+                finally:
+                    os.close(fd)
+                positions.extend(
+                    (chunk, row + i, zlib.crc32(plane)) for i, plane in enumerate(block)
+                )
+                done += count
+                row += count
+        return positions
+
+    def _map(self, chunk: int, rows: int) -> np.memmap:
+        mapped = self._maps.get(chunk)
+        if mapped is None or len(mapped) < rows:
+            # The active chunk grows; remap it when a read goes past the old end.
+            length = os.path.getsize(self.chunk_path(chunk)) // self.row_bytes
+            if length < rows:
+                raise IndexError(f"Row {rows - 1} is past the end of chunk {chunk}")
+            # Copy-on-write mapping: writable views for torch.from_numpy that
+            # never write back.
+            mapped = np.memmap(
+                self.chunk_path(chunk),
+                dtype=self.dtype,
+                mode="c",
+                shape=(length, *self.shape),
+            )
+            self._maps[chunk] = mapped
+        return mapped
+
+    def read(self, positions: Sequence[Position]) -> np.ndarray:
+        """Planes at ``(chunk, row)`` positions.
+
+        Consecutive rows come back as a view of the mapped file.
+        """
+        chunk, first = positions[0]
+        if all(position == (chunk, first + i) for i, position in enumerate(positions)):
+            return self._map(chunk, first + len(positions))[
+                first : first + len(positions)
+            ]
+        return np.stack([self._map(chunk, row + 1)[row] for chunk, row in positions])
+
+    @staticmethod
+    def mismatches(planes: np.ndarray, checksums: Sequence[int]) -> List[int]:
+        """Indices of ``planes`` whose CRC-32 differs from ``checksums``."""
+        return [
+            i
+            for i, (plane, crc) in enumerate(zip(planes, checksums))
+            if zlib.crc32(plane) != crc
+        ]
+
+    def forget(self, chunks: Sequence[int]) -> None:
+        for chunk in chunks:
+            self._maps.pop(chunk, None)
+
+    def stats(self) -> Dict[str, Any]:
+        chunks = self.chunks()
+        size = sum(os.path.getsize(self.chunk_path(chunk)) for chunk in chunks)
+        return {
+            "directory": self.directory,
+            "dtype": self.dtype.name,
+            "chunks": len(chunks),
+            "rows": size // self.row_bytes,
+            "bytes": size,
+        }
+
+
+def compact(
+    store: TensorStore,
+    batch_size: int = 256,
+    grace_seconds: float = TENSOR_STORE_COMPACT_GRACE_SECONDS,
+) -> Dict[str, Any]:
+    """Rewrite the live rows of sealed chunks with dead rows, then delete them.
+
+    Live rows are re-appended through ``append`` and their index rows updated
+    batch by batch. An analysis appends its row before its transaction
+    commits the index row, so a chunk written to within ``grace_seconds`` may
+    hold rows that only look dead; such chunks are left for a later run.
+    Analyses can keep appending meanwhile. The stored checksum is kept, not
+    recomputed, so corruption is still detected after a move. Run it when
+    nothing reads the store by position.
+    """
+    table = StudyTensor.__table__
+    before = store.stats()
+    with engine.begin() as conn:
+        orphans = conn.execute(delete(StudyTensor).where(
+            StudyTensor.study_id.not_in(select(Study.id)))).rowcount
+    sealed = store.chunks()[:-1]
+    moved, removed, recent = 0, [], 0
+    for chunk in sealed:
+        if time.time() - os.path.getmtime(store.chunk_path(chunk)) < grace_seconds:
+            recent += 1
+            continue
+        with engine.connect() as conn:
+            live = conn.execute(
+                select(StudyTensor.study_id, StudyTensor.row)
+                .where(StudyTensor.chunk == chunk)
+                .order_by(StudyTensor.row)
+            ).all()
+        stored_rows = os.path.getsize(store.chunk_path(chunk)) // store.row_bytes
+        if len(live) == stored_rows == store.chunk_rows:
+            continue
+        for start in range(0, len(live), batch_size):
+            batch = live[start:start + batch_size]
+            positions = store.append(store.read([(chunk, row) for _, row in batch]))
+            with engine.begin() as conn:
+                conn.execute(
+                    update(table).where(table.c.study_id == bindparam("_id")),
+                    [
+                        {"_id": study_id, "chunk": new_chunk, "row": new_row}
+                        for (study_id, _), (new_chunk, new_row, _) in zip(
+                            batch, positions
+                        )
+                    ],
+                )
+            moved += len(batch)
+        store.forget([chunk])
+        os.remove(store.chunk_path(chunk))
+        removed.append(chunk)
+    after = store.stats()
+    return {
+        "orphaned_index_rows": orphans,
+        "chunks_removed": len(removed),
+        "chunks_in_grace_period": recent,
+        "rows_moved": moved,
+        "bytes_before": before["bytes"],
+        "bytes_after": after["bytes"],
+    }
+
+
+_store: Optional[TensorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_tensor_store() -> TensorStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TensorStore()
+    return _store
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import NLP_BATCH_SIZE, NLP_MODE, WARMUP_BATCH_SIZES
+from app.models.cv_model import IMAGE_SIZE, get_cv_runner, predict_batch
+from app.models.nlp_model import (
+    classify_change_rules,
+    classify_changes_batch,
+    get_nlp_model,
+)
+from app.services.storage import engine
+
+logger = logging.getLogger(__name__)
+
+WARMUP_REPORT = "FINDINGS: No new effusion. IMPRESSION: Stable appearance."
+
+_ready = threading.Event()
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "stages": {},
+    "error": None,
+    "started_at": None,
+    "finished_at": None,
+}
+
+
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    yield
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    with _lock:
+        _state["stages"][name] = elapsed_ms
+    logger.info("Startup stage %s took %.1f ms", name, elapsed_ms)
+
+
+def warm_up(batch_sizes: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """Load the configured models, run warm-up passes and mark the app ready."""
+    batch_sizes = batch_sizes or WARMUP_BATCH_SIZES
+    with _lock:
+        _state.update(stages={}, error=None, started_at=time.time(), finished_at=None)
+    try:
+        with _stage("database"):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+        with _stage("cv_load"):
+            get_cv_runner()
+        blank = np.zeros((IMAGE_SIZE, IMAGE_SIZE), dtype=np.float32)
+        for size in batch_sizes:
+            with _stage(f"cv_forward_batch_{size}"):
+                predict_batch([blank] * size)
+
+        if NLP_MODE == "transformer":
+            with _stage("nlp_load"):
+                get_nlp_model()
+            for size in sorted({1, NLP_BATCH_SIZE}):
+                with _stage(f"nlp_forward_batch_{size}"):
+                    classify_changes_batch([WARMUP_REPORT] * size)
+        else:
+            with _stage("nlp_rules"):
+                classify_change_rules(WARMUP_REPORT)
+    except Exception as e:
+        logger.exception("Warm-up failed; the app will not report ready")
+        with _lock:
+            _state["error"] = str(e)
+        raise
+    finally:
+        with _lock:
+            _state["finished_at"] = time.time()
+
+    mark_ready()
+    with _lock:
+        total = _state["finished_at"] - _state["started_at"]
+    logger.info("Warm-up finished in %.1f ms", total * 1000)
+    return readiness()
+
+
+def mark_ready() -> None:
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def readiness() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "ready": _ready.is_set(),
+            "stages_ms": dict(_state["stages"]),
+            "error": _state["error"],
+        }
@@ -0,0 +1,146 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+LABELS = ["atelectasis", "consolidation", "effusion", "infiltration", "pneumonia"]
+
+
+def synthetic_scores(patients: int, mean_studies: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, 2 * mean_studies, size=patients)
+    codes = np.repeat(np.arange(patients), counts)
+    # Offsetting by patient before sorting orders days within each patient.
+    days = (
+        np.sort(
+            rng.integers(16000, 20000, size=len(codes))
+            + codes.astype(np.int64) * 100000
+        )
+        % 100000
+    )
+    frame = pd.DataFrame({
+        "patient_id": np.char.add("P", np.char.zfill(codes.astype(str), 7)),
+        "study_date": pd.to_datetime(days, unit="D").strftime("%Y-%m-%d"),
+        "progression_score": rng.random(len(codes)),
+    })
+    for label in LABELS:
+        frame[f"p_{label}"] = rng.random(len(codes))
+    return frame
+
+
+def per_patient_loop(frame: pd.DataFrame, window_days: int) -> int:
+    # Baseline: the per-patient pure-Python path (build_trend + window scan).
+    from app.models.progression import build_trend, slope_per_year, summarize_trend
+
+    matched = 0
+    for _, group in frame.groupby("patient_id", sort=False):
+        points = list(zip(group["study_date"], group["progression_score"]))
+        trend = build_trend(points)
+        summarize_trend(trend)
+        slope_per_year(trend)
+        last_day = group["day"].iloc[-1]
+        window = [
+            v
+            for d, v in zip(group["day"], group["progression_score"])
+            if d >= last_day - window_days
+        ]
+        matched += (points[-1][1] - window[0]) > 0.1
+    return matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cohort progression analytics throughput."
+    )
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--mean-studies", type=int, default=10)
+    parser.add_argument(
+        "--loop-patients",
+        type=int,
+        default=5_000,
+        help="patients for the per-patient baseline",
+    )
+    parser.add_argument(
+        "--with-db",
+        action="store_true",
+        help="also time loading the scores from a SQLite database",
+    )
+    args = parser.parse_args()
+
+    if args.with_db:
+        workdir = tempfile.mkdtemp(prefix="bench-cohort-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from app.services.cohort import (
+        filter_metrics,
+        load_scores,
+        prepare_scores,
+        progression_metrics,
+    )
+
+    raw = synthetic_scores(args.patients, args.mean_studies)
+    frame = prepare_scores(raw)
+
+    start = time.perf_counter()
+    metrics = progression_metrics(frame, window_days=30)
+    vectorized_s = time.perf_counter() - start
+    matched = filter_metrics(metrics, min_window_delta=0.1)
+
+    subset = frame[
+        frame["patient_id"].isin(metrics["patient_id"].iloc[: args.loop_patients])
+    ]
+    start = time.perf_counter()
+    per_patient_loop(subset, 30)
+    loop_s = time.perf_counter() - start
+
+    report = {
+        "patients": args.patients,
+        "studies": len(frame),
+        "vectorized_s": round(vectorized_s, 3),
+        "per_patient_loop_s_extrapolated": round(
+            loop_s * args.patients / args.loop_patients, 3
+        ),
+        "matched_window_delta_gt_0.1": len(matched),
+    }
+
+    if args.with_db:
+        from app.services.storage import insert_studies, unit_of_work
+        rows = raw.to_dict("records")
+        start = time.perf_counter()
+        for offset in range(0, len(rows), 50_000):
+            with unit_of_work() as db:
+                insert_studies(
+                    db,
+                    [
+                        {
+                            "patient_id": row["patient_id"],
+                            "study_date": row["study_date"],
+                            "progression_score": row["progression_score"],
+                            "cv_result": {
+                                "labels": {label: row[f"p_{label}"] for label in LABELS}
+                            },
+                            "nlp_result": {"change": "stable", "delta": 0},
+                            "genai_result": {},
+                        }
+                        for row in rows[offset : offset + 50_000]
+                    ],
+                )
+        report["db_insert_s"] = round(time.perf_counter() - start, 1)
+        start = time.perf_counter()
+        loaded = load_scores()
+        report["db_load_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        progression_metrics(loaded)
+        report["db_metrics_s"] = round(time.perf_counter() - start, 3)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import copy
+import json
+import statistics
+import time
+
+import torch
+
+from app.config import CV_MODEL_NAME
+from app.models.cv_backends import BACKENDS, build_backend, drift_report, example_batch
+from app.models.cv_model import ChestXRayModel, calibration_batch
+
+
+def latency(runner, batch: torch.Tensor, iterations: int) -> dict:
+    runner(batch)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        runner(batch)
+        timings.append(time.perf_counter() - start)
+    p50 = statistics.median(timings)
+    return {
+        "p50_ms": round(p50 * 1000, 2),
+        "images_per_sec": round(len(batch) / p50, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare CPU inference backends for the CV model."
+    )
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--batch-sizes", default="1,16")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument(
+        "--threads", type=int, default=0, help="intra-op threads (0 = torch default)"
+    )
+    parser.add_argument(
+        "--random-weights",
+        action="store_true",
+        help="skip the pretrained weight download",
+    )
+    parser.add_argument(
+        "--calibration-dir",
+        default="",
+        help="real images for drift and int8_static calibration "
+        "(default: random inputs)",
+    )
+    args = parser.parse_args()
+
+    base = ChestXRayModel(
+        model_name=CV_MODEL_NAME, pretrained=not args.random_weights
+    ).eval()
+    reference = build_backend(copy.deepcopy(base), "eager", num_threads=args.threads)
+    calibration = (
+        calibration_batch(args.calibration_dir)
+        if args.calibration_dir
+        else example_batch(16, seed=3)
+    )
+    drift_inputs = calibration if args.calibration_dir else example_batch(8, seed=1)
+    batches = {
+        size: example_batch(size, seed=2)
+        for size in map(int, args.batch_sizes.split(","))
+    }
+
+    report = {"threads": torch.get_num_threads(), "backends": {}}
+    for backend in args.backends.split(","):
+        try:
+            started = time.perf_counter()
+            runner = build_backend(
+                copy.deepcopy(base),
+                backend,
+                calibration=calibration,
+                num_threads=args.threads,
+            )
+            build_s = time.perf_counter() - started
+            result = {
+                "build_s": round(build_s, 2),
+                "drift": drift_report(reference, runner, drift_inputs),
+            }
+            result["latency"] = {
+                str(size): latency(runner, batch, args.iterations)
+                for size, batch in batches.items()
+            }
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        report["backends"][backend] = result
+        print(json.dumps({backend: result}), file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
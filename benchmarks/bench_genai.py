@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.models.genai import AUDIENCES, build_messages
+from app.services.genai_client import SummaryClient
+from app.services.genai_stub import start_stub
+
+TRENDS = [
+    {"direction": direction, "last_delta": delta}
+    for direction in ("improving", "stable", "worsening")
+    for delta in (-0.1, 0.0, 0.1)
+]
+
+
+def make_studies(count: int, distinct: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    pool = [
+        (
+            f"finding variant {i}",
+            {"effusion": round(rng.random(), 2), "pneumonia": round(rng.random(), 2)},
+            rng.choice(TRENDS),
+        )
+        for i in range(distinct)
+    ]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def serial_summaries(url: str, study: tuple) -> None:
+    # The previous shape: one blocking request per summary, a new connection each.
+    findings, labels, trend = study
+    for audience in AUDIENCES:
+        payload = {
+            "model": "stub",
+            "messages": build_messages(audience, findings, labels, trend),
+        }
+        httpx.post(
+            f"{url}/chat/completions", json=payload, timeout=30
+        ).raise_for_status()
+
+
+def run(fn, studies: list, workers: int) -> dict:
+    latencies = []
+
+    def timed(study):
+        started = time.perf_counter()
+        fn(study)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(timed, studies))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "studies_per_s": round(len(studies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Summary generation latency against the local GenAI stub."
+    )
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--studies", type=int, default=200)
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        default=100,
+        help="distinct summary inputs among the studies",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms)
+    studies = make_studies(args.studies, args.distinct)
+    client = SummaryClient(
+        server.url, max_concurrency=args.max_concurrency, timeout_s=30
+    )
+    uncached = SummaryClient(
+        server.url, max_concurrency=args.max_concurrency, timeout_s=30, cache_items=0
+    )
+    try:
+        results = {
+            "serial_new_connections": run(
+                lambda study: serial_summaries(server.url, study), studies, args.workers
+            ),
+            "pooled_parallel_no_cache": run(
+                lambda study: uncached.summarize(*study), studies, args.workers
+            ),
+            "pooled_parallel_cached": run(
+                lambda study: client.summarize(*study), studies, args.workers
+            ),
+        }
+        results["pooled_parallel_cached"]["cache"] = client.stats()["cache"]
+    finally:
+        client.close()
+        uncached.close()
+        server.shutdown()
+
+    print(
+        json.dumps(
+            {
+                "stub_latency_ms": args.latency_ms,
+                "studies": args.studies,
+                "distinct": args.distinct,
+                "workers": args.workers,
+                "max_concurrency": args.max_concurrency,
+                **results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
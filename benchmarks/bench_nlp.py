@@ -0,0 +1,150 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import time
+from typing import Callable, List, Tuple
+
+from app.models.nlp_model import (
+    CHANGE_WORDS,
+    classify_change_rules,
+    classify_change_transformer,
+    classify_changes_batch,
+)
+
+FINDINGS = [
+    "{change} bilateral lower lobe opacities",
+    "{change} small left pleural effusion",
+    "no new consolidation",
+    "{change} right basilar atelectasis",
+    "cardiomediastinal silhouette is within normal limits",
+    "no pneumothorax",
+    "{change} interstitial markings",
+    "no evidence of new infiltrate",
+]
+CHANGES = [
+    "Increased",
+    "Decreased",
+    "New",
+    "Improved",
+    "Resolved",
+    "Stable",
+    "Worsened",
+    "Unchanged",
+]
+IMPRESSIONS = [
+    "Findings have {change} compared to prior study.",
+    "Overall {change} appearance.",
+    "No acute cardiopulmonary process.",
+]
+
+
+def synthetic_corpus(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(size):
+        findings = ". ".join(
+            template.format(change=rng.choice(CHANGES))
+            for template in rng.sample(FINDINGS, rng.randint(2, 5))
+        )
+        impression = rng.choice(IMPRESSIONS).format(change=rng.choice(CHANGES).lower())
+        reports.append(f"FINDINGS: {findings}. IMPRESSION: {impression}")
+    return reports
+
+
+def load_corpus(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line)["report"] for line in f if line.strip()]
+        return [block.strip() for block in f.read().split("\n\n") if block.strip()]
+
+
+def legacy_classify(text: str) -> Tuple[str, int]:
+    text_lower = text.lower()
+    improved_count = sum(1 for word in CHANGE_WORDS["improved"] if word in text_lower)
+    worsened_count = sum(1 for word in CHANGE_WORDS["worsened"] if word in text_lower)
+    if improved_count > worsened_count:
+        return "improved", -1
+    elif worsened_count > improved_count:
+        return "worsened", 1
+    return "stable", 0
+
+
+def throughput(
+    fn: Callable[[str], Tuple[str, int]], reports: List[str], repeat: int
+) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for report in reports:
+            fn(report)
+    elapsed = time.perf_counter() - start
+    return {
+        "reports_per_sec": round(len(reports) * repeat / elapsed, 1),
+        "us_per_report": round(elapsed / (len(reports) * repeat) * 1e6, 3),
+    }
+
+
+def batch_throughput(reports: List[str], batch_size: int, bucket: bool) -> dict:
+    start = time.perf_counter()
+    classify_changes_batch(reports, batch_size=batch_size, bucket=bucket)
+    elapsed = time.perf_counter() - start
+    return {
+        "reports_per_sec": round(len(reports) / elapsed, 1),
+        "batch_size": batch_size,
+    }
+
+
+def transformer_report(reports: List[str], batch_size: int) -> dict:
+    classify_changes_batch(reports[:batch_size], batch_size=batch_size)
+    single = reports[:max(batch_size, 32)]
+    return {
+        "per_report": throughput(classify_change_transformer, single, 1),
+        "batched_unbucketed": batch_throughput(reports, batch_size, bucket=False),
+        "batched_bucketed": batch_throughput(reports, batch_size, bucket=True),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Report change-classification throughput."
+    )
+    parser.add_argument(
+        "--corpus",
+        help="text file (reports separated by blank lines) "
+        "or .jsonl with a 'report' field",
+    )
+    parser.add_argument("--size", type=int, default=5000, help="synthetic corpus size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--transformer",
+        action="store_true",
+        help="also benchmark the NLP_MODEL_NAME transformer (per-report vs batched)",
+    )
+    parser.add_argument("--transformer-reports", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    reports = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size)
+    agreement = sum(
+        legacy_classify(r) == classify_change_rules(r) for r in reports
+    ) / len(reports)
+
+    report = {
+        "reports": len(reports),
+        "legacy_substring": throughput(legacy_classify, reports, args.repeat),
+        "rules": throughput(classify_change_rules, reports, args.repeat),
+        "rules_agreement_with_legacy": round(agreement, 4),
+        "transformers_imported": "transformers" in sys.modules,
+    }
+    if args.transformer:
+        report["transformer"] = transformer_report(
+            reports[: args.transformer_reports], args.batch_size
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
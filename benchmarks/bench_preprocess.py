@@ -0,0 +1,141 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import io
+import json
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import pydicom
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import (
+    ExplicitVRLittleEndian,
+    SecondaryCaptureImageStorage,
+    generate_uid,
+)
+
+from app.models.cv_model import preprocess_image, preprocess_array
+from app.services.parsing import load_image, load_pixels
+
+
+def make_dicom(pixels: np.ndarray) -> bytes:
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.Modality = "DX"
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.PixelData = pixels.astype(np.uint16).tobytes()
+    buffer = io.BytesIO()
+    try:
+        pydicom.dcmwrite(buffer, ds, enforce_file_format=True)
+    except TypeError:
+        pydicom.dcmwrite(buffer, ds, write_like_original=False)
+    return buffer.getvalue()
+
+
+def legacy_preprocess(image) -> torch.Tensor:
+    # The pre-tensor-native path: a fresh Compose per call and a PIL
+    # grayscale-to-RGB conversion.
+    transform = transforms.Compose([
+        transforms.Grayscale(num_output_channels=3),
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+    return transform(image).unsqueeze(0)
+
+
+def legacy_path(content: bytes, filename: str) -> torch.Tensor:
+    image, _ = load_image(content, filename)
+    return legacy_preprocess(image)
+
+
+def cached_pil_path(content: bytes, filename: str) -> torch.Tensor:
+    image, _ = load_image(content, filename)
+    return preprocess_image(image)
+
+
+def tensor_path(content: bytes, filename: str) -> torch.Tensor:
+    return preprocess_array(load_pixels(content, filename))
+
+
+def measure(fn, content: bytes, filename: str, iterations: int) -> dict:
+    fn(content, filename)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(content, filename)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn(content, filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with torch.profiler.profile(
+        activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True
+    ) as prof:
+        fn(content, filename)
+    torch_bytes = sum(
+        max(event.self_cpu_memory_usage, 0) for event in prof.key_averages()
+    )
+
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "python_peak_bytes": peak,
+        "torch_alloc_bytes": torch_bytes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare preprocessing paths per image."
+    )
+    parser.add_argument(
+        "--size", type=int, default=2048, help="synthetic image edge length"
+    )
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 4096, size=(args.size, args.size), dtype=np.uint16)
+    inputs = {
+        "dicom": (make_dicom(pixels), "synthetic.dcm"),
+    }
+
+    buffer = io.BytesIO()
+    Image.fromarray((pixels >> 4).astype(np.uint8), mode="L").save(buffer, format="PNG")
+    inputs["png"] = (buffer.getvalue(), "synthetic.png")
+
+    report = {}
+    for kind, (content, filename) in inputs.items():
+        legacy = legacy_path(content, filename)
+        tensor = tensor_path(content, filename)
+        report[kind] = {
+            "legacy": measure(legacy_path, content, filename, args.iterations),
+            "cached_pil": measure(cached_pil_path, content, filename, args.iterations),
+            "tensor": measure(tensor_path, content, filename, args.iterations),
+            "max_abs_diff_vs_legacy": float((legacy - tensor).abs().max()),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
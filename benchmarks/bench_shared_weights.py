@@ -0,0 +1,97 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import tempfile
+
+
+def _worker(mode: str, model_name: str, weights_dir: str, results, done) -> None:
+    # Runs in a spawned process, like a uvicorn worker.
+    import torch
+
+    from app.models.cv_model import ChestXRayModel
+    from app.models.shared_weights import load_shared
+    from app.services.memory import _mapped_files, _smaps_fields
+
+    torch.set_num_threads(1)
+    if mode == "shared":
+        model = load_shared(
+            f"cv-{model_name}",
+            lambda: ChestXRayModel(model_name=model_name, pretrained=False),
+            lambda: ChestXRayModel(model_name=model_name, pretrained=False),
+            weights_dir,
+        )
+    else:
+        model = ChestXRayModel(model_name=model_name, pretrained=False).eval()
+    with torch.inference_mode():
+        model(torch.zeros(1, 3, 224, 224))
+    with open("/proc/self/smaps_rollup") as f:
+        report = _smaps_fields(f.readlines())
+    weights = _mapped_files(os.path.realpath(weights_dir) + os.sep)
+    report["weights_pss_bytes"] = sum(sizes["pss_bytes"] for sizes in weights.values())
+    results.put(report)
+    # Stay alive until every worker has measured, so shared pages are counted as shared.
+    done.wait()
+
+
+def measure(mode: str, workers: int, model_name: str, weights_dir: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results, done = context.Queue(), context.Event()
+    processes = [
+        context.Process(
+            target=_worker, args=(mode, model_name, weights_dir, results, done)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=600) for _ in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    mb = 1024 * 1024
+    return {
+        "workers": workers,
+        "rss_mb_per_worker": round(
+            sum(r["rss_bytes"] for r in reports) / workers / mb, 1
+        ),
+        "pss_mb_total": round(sum(r["pss_bytes"] for r in reports) / mb, 1),
+        "pss_mb_per_worker": round(
+            sum(r["pss_bytes"] for r in reports) / workers / mb, 1
+        ),
+        "weights_pss_mb_total": round(
+            sum(r["weights_pss_bytes"] for r in reports) / mb, 1
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Node memory for N model workers: private vs shared weights."
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--model", default="resnet50", choices=("densenet121", "resnet50")
+    )
+    args = parser.parse_args()
+
+    weights_dir = tempfile.mkdtemp(prefix="bench-weights-")
+    try:
+        results = {
+            mode: measure(mode, args.workers, args.model, weights_dir)
+            for mode in ("private", "shared")
+        }
+    finally:
+        shutil.rmtree(weights_dir, ignore_errors=True)
+    results["pss_saved_mb"] = round(
+        results["private"]["pss_mb_total"] - results["shared"]["pss_mb_total"], 1
+    )
+    print(json.dumps({"model": args.model, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, List
+
+LABELS = ["atelectasis", "consolidation", "effusion", "infiltration", "pneumonia"]
+CHANGES = [("improved", -1), ("stable", 0), ("worsened", 1)]
+
+# The studies table as it was before the denormalized columns and index.
+LEGACY_SCHEMA = """
+CREATE TABLE patients (patient_id VARCHAR NOT NULL PRIMARY KEY, created_at DATETIME);
+CREATE TABLE studies (
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR NOT NULL,
+    study_date VARCHAR NOT NULL,
+    cv_result JSON,
+    nlp_result JSON,
+    progression_score FLOAT,
+    genai_result JSON,
+    created_at DATETIME
+);
+"""
+
+
+def build_legacy_db(path: str, rows: int, patients: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    summary = (
+        "Findings are described in detail for the clinician "
+        "with comparison to the prior study. " * 4
+    )
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO patients VALUES (?, '2024-01-01')",
+                     [(f"P{i:07d}",) for i in range(patients)])
+    start = date(2015, 1, 1)
+
+    def study(i: int):
+        labels = {label: round(rng.random(), 4) for label in LABELS}
+        change, delta = rng.choice(CHANGES)
+        cv_result = {"labels": labels, "severity_score": max(labels.values())}
+        nlp_result = {
+            "sections": {
+                "findings": "Mild bibasilar opacities. " * 3,
+                "impression": "See findings.",
+            },
+            "change": change,
+            "delta": delta,
+        }
+        genai_result = {"clinician_summary": summary, "patient_summary": summary}
+        return (
+            f"P{rng.randrange(patients):07d}",
+            (start + timedelta(days=rng.randrange(3650))).isoformat(),
+            json.dumps(cv_result),
+            json.dumps(nlp_result),
+            rng.random(),
+            json.dumps(genai_result),
+        )
+
+    for offset in range(0, rows, 50000):
+        conn.executemany(
+            "INSERT INTO studies (patient_id, study_date, cv_result, nlp_result, "
+            "progression_score, genai_result, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, '2024-01-01')",
+            [study(i) for i in range(offset, min(rows, offset + 50000))],
+        )
+        conn.commit()
+    conn.close()
+
+
+def legacy_timeline(conn: sqlite3.Connection, patient_id: str) -> list:
+    # What the ORM did before: load every column and decode every JSON blob.
+    timeline = []
+    for row in conn.execute(
+        "SELECT * FROM studies WHERE patient_id = ? ORDER BY study_date", (patient_id,)
+    ):
+        cv_result, nlp_result, _ = (
+            json.loads(row[3]),
+            json.loads(row[4]),
+            json.loads(row[6]),
+        )
+        timeline.append(
+            {
+                "date": row[2],
+                "progression_score": row[5],
+                "key_labels": cv_result.get("labels", {}),
+                "change": nlp_result.get("change", "stable"),
+            }
+        )
+    return timeline
+
+
+def latency(fn: Callable[[str], list], patient_ids: List[str]) -> dict:
+    timings = []
+    for patient_id in patient_ids:
+        start = time.perf_counter()
+        fn(patient_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Timeline query latency before and after the indexed, "
+        "projected schema."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--legacy-queries",
+        type=int,
+        default=20,
+        help="full-scan queries are slow; sample fewer",
+    )
+    parser.add_argument(
+        "--db", help="database path (default: a temporary file, removed afterwards)"
+    )
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(
+        tempfile.mkdtemp(prefix="bench-storage-"), "bench.db"
+    )
+    start = time.perf_counter()
+    build_legacy_db(path, args.rows, args.patients)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    patient_ids = [f"P{rng.randrange(args.patients):07d}" for _ in range(args.queries)]
+
+    conn = sqlite3.connect(path)
+    legacy = latency(
+        lambda p: legacy_timeline(conn, p), patient_ids[: args.legacy_queries]
+    )
+
+    # Importing storage against the legacy file runs the migration.
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    start = time.perf_counter()
+    from app.services.storage import SessionLocal, Study, get_timeline
+    migrate_s = time.perf_counter() - start
+
+    def orm_full_rows(patient_id: str) -> list:
+        db = SessionLocal()
+        try:
+            studies = (
+                db.query(Study)
+                .filter(Study.patient_id == patient_id)
+                .order_by(Study.study_date)
+                .all()
+            )
+            return [
+                {
+                    "date": s.study_date,
+                    "progression_score": s.progression_score,
+                    "key_labels": s.cv_result.get("labels", {}),
+                    "change": s.nlp_result.get("change", "stable"),
+                }
+                for s in studies
+            ]
+        finally:
+            db.close()
+
+    conn.close()
+    indexed_full_rows = latency(orm_full_rows, patient_ids)
+    projected = latency(get_timeline, patient_ids)
+    # A fresh connection: the one above still has the pre-migration schema cached.
+    conn = sqlite3.connect(path)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT study_date, progression_score FROM studies "
+        "WHERE patient_id = ? ORDER BY study_date, id",
+        (patient_ids[0],),
+    ).fetchall()
+    conn.close()
+
+    print(json.dumps({
+        "rows": args.rows,
+        "patients": args.patients,
+        "db_mb": round(os.path.getsize(path) / 2**20, 1),
+        "build_s": round(build_s, 1),
+        "migration_s": round(migrate_s, 1),
+        "timeline_legacy_full_scan": legacy,
+        "timeline_indexed_full_rows": indexed_full_rows,
+        "timeline_indexed_projected": projected,
+        "query_plan": [row[-1] for row in plan],
+    }, indent=2))
+
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+
+def seed(patient_id: str, studies: int) -> None:
+    from app.services.storage import insert_studies, unit_of_work
+
+    for offset in range(0, studies, 50_000):
+        with unit_of_work() as db:
+            insert_studies(
+                db,
+                [
+                    {
+                        "patient_id": patient_id,
+                        "study_date": (
+                            f"{2000 + i // 4000:04d}-{1 + i // 334 % 12:02d}"
+                            f"-{1 + i % 28:02d}"
+                        ),
+                        "progression_score": (i % 100) / 100,
+                        "cv_result": {
+                            "labels": {"effusion": 0.5, "pneumonia": 0.25},
+                            "severity_score": 0.5,
+                        },
+                        "nlp_result": {"change": "stable", "delta": 0},
+                        "genai_result": {"clinician_summary": "x" * 500},
+                    }
+                    for i in range(offset, min(studies, offset + 50_000))
+                ],
+            )
+
+
+def measure(fn) -> dict:
+    # Time without tracing first; tracemalloc slows allocation-heavy code a lot.
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": count,
+        "seconds": round(elapsed, 3),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Timeline read memory: full document vs streamed vs paged."
+    )
+    parser.add_argument("--studies", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-timeline-")
+    # Imported here so DATABASE_URL points at the scratch database first.
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from app.services.storage import iter_timeline, timeline_page
+
+    seed("LONG", args.studies)
+
+    def full_document() -> int:
+        timeline = timeline_page("LONG")[0]
+        json.dumps(timeline)
+        return len(timeline)
+
+    def streamed() -> int:
+        count = 0
+        for _, entry in iter_timeline("LONG"):
+            json.dumps(entry)
+            count += 1
+        return count
+
+    def paged() -> int:
+        count, cursor = 0, None
+        while True:
+            page, cursor = timeline_page("LONG", cursor=cursor, limit=args.page_size)
+            count += len(page)
+            if cursor is None:
+                return count
+
+    print(json.dumps({
+        "studies": args.studies,
+        "full_document": measure(full_document),
+        "ndjson_stream": measure(streamed),
+        f"cursor_pages_of_{args.page_size}": measure(paged),
+    }, indent=2))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+_workdir = ""
+
+
+def study_row(rng: random.Random, patient_id: str, index: int) -> dict:
+    score = rng.random()
+    return {
+        "patient_id": patient_id,
+        "study_date": f"2024-{1 + index % 12:02d}-{1 + index % 28:02d}",
+        "cv_result": {"labels": {"effusion": score}, "severity_score": score},
+        "nlp_result": {"sections": {}, "change": "stable", "delta": 0},
+        "progression_score": score,
+        "genai_result": {"clinician_summary": "x" * 400, "patient_summary": "x" * 400},
+    }
+
+
+def legacy_write(session_factory, row: dict) -> None:
+    from app.services.storage import Patient, Study, summary_columns
+
+    # The previous analyze_study: three sessions and two commits.
+    db = session_factory()
+    try:
+        if (
+            not db.query(Patient)
+            .filter(Patient.patient_id == row["patient_id"])
+            .first()
+        ):
+            db.add(Patient(patient_id=row["patient_id"]))
+            db.commit()
+    finally:
+        db.close()
+    db = session_factory()
+    try:
+        db.execute(select(Study.study_date, Study.progression_score)
+                   .where(Study.patient_id == row["patient_id"])).all()
+    finally:
+        db.close()
+    db = session_factory()
+    try:
+        db.add(Study(**row, **summary_columns(row["cv_result"], row["nlp_result"])))
+        db.commit()
+    finally:
+        db.close()
+
+
+def unit_of_work_write(session_factory, row: dict) -> None:
+    from app.services.storage import (
+        insert_studies,
+        score_histories,
+        unit_of_work,
+        upsert_patients,
+    )
+
+    with unit_of_work(session_factory) as db:
+        upsert_patients(db, [row["patient_id"]])
+        score_histories(db, [row["patient_id"]])
+        insert_studies(db, [row])
+
+
+def run(
+    name: str, write, tuned: bool, workers: int, studies: int, patients: int
+) -> dict:
+    from app.services.storage import Base, configure_sqlite
+
+    engine = create_engine(f"sqlite:///{os.path.join(_workdir, name + '.db')}")
+    if tuned:
+        configure_sqlite(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    rng = random.Random(0)
+    rows = [
+        study_row(rng, f"P{rng.randrange(patients):05d}", i) for i in range(studies)
+    ]
+    errors = {"locked": 0, "duplicate_patient": 0}
+    lock = threading.Lock()
+
+    def task(row: dict) -> None:
+        try:
+            write(session_factory, row)
+        except OperationalError:
+            with lock:
+                errors["locked"] += 1
+        except IntegrityError:
+            # query-then-insert lets two writers insert the same new patient
+            with lock:
+                errors["duplicate_patient"] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(task, rows))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return {"studies_per_sec": round(studies / elapsed, 1), "errors": errors}
+
+
+def bulk(studies: int, patients: int) -> dict:
+    from app.services.storage import (
+        Base,
+        configure_sqlite,
+        insert_studies,
+        unit_of_work,
+        upsert_patients,
+    )
+
+    engine = create_engine(f"sqlite:///{os.path.join(_workdir, 'bulk.db')}")
+    configure_sqlite(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    rng = random.Random(0)
+    rows = [
+        study_row(rng, f"P{rng.randrange(patients):05d}", i) for i in range(studies)
+    ]
+    start = time.perf_counter()
+    with unit_of_work(session_factory) as db:
+        upsert_patients(db, (row["patient_id"] for row in rows))
+        insert_studies(db, rows)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return {"studies_per_sec": round(studies / elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Concurrent study-write throughput per storage strategy."
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--studies", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=200)
+    args = parser.parse_args()
+
+    global _workdir
+    _workdir = tempfile.mkdtemp(prefix="bench-writes-")
+    # Set before anything imports storage, which connects to DATABASE_URL.
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+
+    print(
+        json.dumps(
+            {
+                "workers": args.workers,
+                "studies": args.studies,
+                "legacy_sessions_default_pragmas": run(
+                    "legacy",
+                    legacy_write,
+                    False,
+                    args.workers,
+                    args.studies,
+                    args.patients,
+                ),
+                "unit_of_work_default_pragmas": run(
+                    "uow",
+                    unit_of_work_write,
+                    False,
+                    args.workers,
+                    args.studies,
+                    args.patients,
+                ),
+                "unit_of_work_wal": run(
+                    "uow_wal",
+                    unit_of_work_write,
+                    True,
+                    args.workers,
+                    args.studies,
+                    args.patients,
+                ),
+                "bulk_insert_wal": bulk(args.studies * 10, args.patients),
+            },
+            indent=2,
+        )
+    )
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
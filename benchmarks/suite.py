@@ -0,0 +1,337 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = (
+    "load_image",
+    "preprocess_image",
+    "predict",
+    "classify_change",
+    "get_timeline",
+    "endpoints",
+)
+
+
+def measure(
+    fn: Callable[[Any], Any],
+    items: Sequence[Any],
+    concurrency: int = 1,
+    warmup: int = 1,
+) -> Dict[str, Any]:
+    """Latency and throughput of ``fn`` over ``items`` with ``concurrency`` threads."""
+    for item in items[:warmup]:
+        fn(item)
+
+    def timed(item: Any) -> float:
+        started = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = np.array(list(pool.map(timed, items)))
+    else:
+        latencies = np.array([timed(item) for item in items])
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "n": len(items),
+        "concurrency": concurrency,
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(latencies.mean()), 4),
+        "throughput_per_s": round(len(items) / elapsed, 2),
+    }
+
+
+def environment(args: argparse.Namespace) -> Dict[str, Any]:
+    import torch
+    from app import config
+
+    def git(*command: str) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *command],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=os.path.dirname(RESULTS_DIR),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "config": {
+            name: getattr(config, name)
+            for name in (
+                "CV_MODEL_NAME",
+                "CV_BACKEND",
+                "CV_BATCHING_ENABLED",
+                "CV_MAX_BATCH_SIZE",
+                "CV_CACHE_ENABLED",
+                "NLP_MODE",
+                "DICOM_DECODE_TARGET_SIZE",
+                "GENAI_ENABLED",
+            )
+        },
+        "args": vars(args),
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    # Imported here so DATABASE_URL points at the scratch database first.
+    from PIL import Image
+    from fastapi.testclient import TestClient
+
+    import app.models.cv_model as cv_model
+    from app.config import CV_MODEL_NAME
+    from app.main import app
+    from app.models.nlp_model import classify_change
+    from app.services.parsing import load_image
+    from app.services.storage import get_timeline, insert_studies, unit_of_work
+    from benchmarks.synthetic import (
+        chest_pixels,
+        cohort,
+        dicom_bytes,
+        png_bytes,
+        study_rows,
+    )
+
+    if args.random_weights:
+        cv_model._cv_model = cv_model.ChestXRayModel(
+            model_name=CV_MODEL_NAME, pretrained=False
+        ).eval()
+
+    rng = np.random.default_rng(args.seed)
+    frames = [chest_pixels(rng, args.image_size) for _ in range(args.images)]
+    encoded = {
+        "png": [png_bytes(frame) for frame in frames],
+        "dicom": [dicom_bytes(frame) for frame in frames],
+    }
+    studies = cohort(rng, args.patients, args.studies_per_patient)
+    stages = set(args.stages.split(","))
+    results: Dict[str, Any] = {}
+
+    if "load_image" in stages:
+        for kind, filename in (("png", "x.png"), ("dicom", "x.dcm")):
+            results[f"load_image_{kind}"] = measure(
+                lambda content: load_image(content, filename), encoded[kind]
+            )
+    if "preprocess_image" in stages:
+        images = [Image.fromarray((frame >> 4).astype(np.uint8)) for frame in frames]
+        results["preprocess_image"] = measure(cv_model.preprocess_image, images)
+    if "predict" in stages:
+        images = [load_image(content, "x.png")[0] for content in encoded["png"]]
+        results["predict"] = measure(cv_model.predict, images[:args.iterations])
+    if "classify_change" in stages:
+        results["classify_change"] = measure(
+            classify_change, [study["report_text"] for study in studies]
+        )
+
+    # Seeded without inference: one long timeline plus the synthetic cohort.
+    long_patient = "BENCH-LONG"
+    with unit_of_work() as db:
+        insert_studies(db, study_rows(rng, studies))
+        long_history = cohort(rng, 1, args.timeline_studies)
+        insert_studies(
+            db,
+            study_rows(
+                rng, [{**study, "patient_id": long_patient} for study in long_history]
+            ),
+        )
+    patients = sorted({study["patient_id"] for study in studies})
+
+    if "get_timeline" in stages:
+        results["get_timeline"] = measure(
+            get_timeline, [patients[i % len(patients)] for i in range(args.iterations)]
+        )
+        results["get_timeline_long"] = measure(
+            get_timeline, [long_patient] * max(1, args.iterations // 5)
+        )
+
+    if "endpoints" in stages:
+        session = _http_session(args.url) if args.url else TestClient(app)
+        requests = list(range(args.requests))
+        # The seeded cohort only exists locally; a remote server is read back
+        # through the patients the analyze benchmark created on it.
+        analyzed = [f"BENCH-{i % args.patients:06d}" for i in requests]
+        readable = sorted(set(analyzed)) if args.url else patients
+
+        def analyze(i: int) -> None:
+            response = session.post(
+                "/api/analyze",
+                data={
+                    "patient_id": analyzed[i],
+                    "study_date": f"2030-01-{1 + i % 28:02d}",
+                    "report": studies[i % len(studies)]["report_text"],
+                },
+                files={
+                    "image": (
+                        "study.dcm",
+                        encoded["dicom"][i % len(frames)],
+                        "application/dicom",
+                    )
+                },
+            )
+            response.raise_for_status()
+
+        def get(path: str) -> Callable[[int], None]:
+            def call(i: int) -> None:
+                session.get(
+                    path.format(patient=readable[i % len(readable)])
+                ).raise_for_status()
+            return call
+
+        for name, fn in (("endpoint_analyze", analyze),
+                         ("endpoint_timeline", get("/api/patient/{patient}/timeline")),
+                         ("endpoint_snapshot", get("/api/patient/{patient}/snapshot"))):
+            results[f"{name}_serial"] = measure(
+                fn, requests[: max(1, args.requests // 4)]
+            )
+            results[f"{name}_concurrent"] = measure(
+                fn, requests, concurrency=args.concurrency
+            )
+    return results
+
+
+def _http_session(url: str):
+    import httpx
+
+    return httpx.Client(base_url=url, timeout=120)
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Print per-benchmark p50/p95 changes; 1 if any regressed past ``threshold``."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(
+        f"{'benchmark':34} {'base p50':>10} {'new p50':>10} "
+        f"{'p50':>8} {'p95':>8} {'throughput':>10}"
+    )
+    regressed = False
+    for name in sorted(set(base["results"]) & set(new["results"])):
+        old, cur = base["results"][name], new["results"][name]
+        changes = [cur[key] / old[key] - 1 if old[key] else 0.0
+                   for key in ("p50_ms", "p95_ms", "throughput_per_s")]
+        flag = changes[0] > threshold or changes[2] < -threshold
+        regressed |= flag
+        print(
+            f"{name:34} {old['p50_ms']:>10.2f} {cur['p50_ms']:>10.2f} "
+            f"{changes[0]:>+8.1%} {changes[1]:>+8.1%} "
+            f"{changes[2]:>+10.1%}{'  REGRESSION' if flag else ''}"
+        )
+    commits = base["environment"].get("commit"), new["environment"].get("commit")
+    print(f"base {commits[0]} -> new {commits[1]}")
+    return 1 if regressed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Pipeline and endpoint latency/throughput suite on synthetic data."
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help=f"comma-separated subset of {','.join(STAGES)}",
+    )
+    parser.add_argument(
+        "--images", type=int, default=32, help="distinct synthetic images"
+    )
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--studies-per-patient", type=int, default=20)
+    parser.add_argument(
+        "--timeline-studies",
+        type=int,
+        default=5000,
+        help="studies for the long-timeline patient",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=20, help="calls per model/timeline benchmark"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=64, help="requests per endpoint benchmark"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--url",
+        default=None,
+        help="benchmark a running server instead of the app in-process",
+    )
+    parser.add_argument(
+        "--random-weights",
+        action="store_true",
+        help="skip the pretrained weight download",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="results file (default: benchmarks/results/<time>-<commit>.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "NEW"),
+        help="compare two results files and exit",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="relative change flagged by --compare",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    workdir = tempfile.mkdtemp(prefix="bench-suite-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("CV_CACHE_ENABLED", "false")
+    try:
+        started = time.perf_counter()
+        report = {"environment": environment(args), "results": run_suite(args)}
+        report["environment"]["seconds"] = round(time.perf_counter() - started, 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = report["environment"]["commit"] or "nogit"
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import io
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import (
+    ExplicitVRLittleEndian,
+    SecondaryCaptureImageStorage,
+    generate_uid,
+)
+
+from app.config import CHEST_XRAY_LABELS
+
+FINDINGS = [
+    "Lungs are clear.",
+    "Mild bibasilar atelectasis.",
+    "Small right pleural effusion.",
+    "Patchy opacity in the left lower lobe.",
+    "Diffuse interstitial markings.",
+]
+CHANGES = {
+    "improved": [
+        "Interval improvement of the opacity.",
+        "Effusion has decreased.",
+        "Resolving consolidation.",
+    ],
+    "worsened": [
+        "Increased effusion compared with prior.",
+        "Worsening bilateral opacities.",
+        "New consolidation.",
+    ],
+    "stable": [
+        "Unchanged from prior.",
+        "No significant interval change.",
+        "Stable appearance.",
+    ],
+}
+
+
+def chest_pixels(rng: np.random.Generator, size: int = 512) -> np.ndarray:
+    """A 12-bit frontal-chest-like frame: bright body, darker lung fields, noise."""
+    y, x = np.mgrid[0:size, 0:size] / size
+    body = np.exp(-(((x - 0.5) / 0.42) ** 2 + ((y - 0.55) / 0.5) ** 2) ** 2)
+    lungs = sum(
+        np.exp(-((((x - cx) / 0.14) ** 2 + ((y - 0.5) / 0.28) ** 2) ** 2))
+        for cx in (0.33, 0.67)
+    )
+    opacity = rng.random() * np.exp(
+        -(((x - rng.uniform(0.25, 0.75)) / 0.08) ** 2 + ((y - 0.6) / 0.1) ** 2)
+    )
+    frame = 2600 * body - 1500 * lungs + 900 * opacity + rng.normal(0, 60, (size, size))
+    return np.clip(frame + 600, 0, 4095).astype(np.uint16)
+
+
+def png_bytes(pixels: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray((pixels >> 4).astype(np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def dicom_bytes(
+    pixels: np.ndarray, patient_id: str = "", study_date: str = "", modality: str = "DX"
+) -> bytes:
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.Modality = modality
+    ds.PatientID = patient_id
+    ds.StudyDate = study_date.replace("-", "")
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.PixelData = pixels.astype(np.uint16).tobytes()
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def report_text(rng: np.random.Generator, change: str) -> str:
+    findings = " ".join(rng.choice(FINDINGS, size=2, replace=False))
+    comparison, impression = rng.choice(CHANGES[change]), rng.choice(CHANGES[change])
+    return f"FINDINGS: {findings} {comparison} IMPRESSION: {impression}"
+
+
+def cohort(rng: np.random.Generator, patients: int, studies_per_patient: int,
+           start: str = "2020-01-01") -> List[Dict[str, Any]]:
+    """Patients with ``studies_per_patient`` dated studies and reports each."""
+    studies = []
+    first = date.fromisoformat(start)
+    for p in range(patients):
+        day = first + timedelta(days=int(rng.integers(0, 365)))
+        for _ in range(studies_per_patient):
+            change = str(rng.choice(list(CHANGES)))
+            studies.append({"patient_id": f"SYN{p:06d}", "study_date": day.isoformat(),
+                            "report_text": report_text(rng, change)})
+            day += timedelta(days=int(rng.integers(7, 120)))
+    return studies
+
+
+def study_rows(
+    rng: np.random.Generator, studies: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """``insert_studies`` rows with random model outputs, to seed without inference."""
+    rows = []
+    for study in studies:
+        labels = {
+            label: float(p)
+            for label, p in zip(CHEST_XRAY_LABELS, rng.random(len(CHEST_XRAY_LABELS)))
+        }
+        severity = max(labels.values())
+        delta = int(rng.integers(-1, 2))
+        rows.append(
+            {
+                "patient_id": study["patient_id"],
+                "study_date": study["study_date"],
+                "cv_result": {"labels": labels, "severity_score": severity},
+                "nlp_result": {
+                    "sections": {"findings": study.get("report_text", "")},
+                    "change": {-1: "improved", 0: "stable", 1: "worsened"}[delta],
+                    "delta": delta,
+                },
+                "progression_score": 0.7 * severity + 0.3 * (delta + 1) / 2,
+                "genai_result": {"clinician_summary": "", "patient_summary": ""},
+            }
+        )
+    return rows
+
+
+def write_archive(
+    out_dir: str,
+    patients: int,
+    studies_per_patient: int,
+    size: int = 512,
+    image_format: str = "dicom",
+    seed: int = 0,
+) -> str:
+    """Write images and ``manifest.csv`` for ``scripts/ingest.py``; return its path."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = os.path.join(out_dir, "manifest.csv")
+    with open(manifest, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "patient_id", "study_date", "report"])
+        for i, study in enumerate(cohort(rng, patients, studies_per_patient)):
+            pixels = chest_pixels(rng, size)
+            if image_format == "dicom":
+                filename, content = (
+                    f"{i:07d}.dcm",
+                    dicom_bytes(pixels, study["patient_id"], study["study_date"]),
+                )
+            else:
+                filename, content = f"{i:07d}.png", png_bytes(pixels)
+            with open(os.path.join(out_dir, filename), "wb") as image:
+                image.write(content)
+            writer.writerow(
+                [
+                    filename,
+                    study["patient_id"],
+                    study["study_date"],
+                    study["report_text"],
+                ]
+            )
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic study archive (images plus manifest.csv)."
+    )
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--studies-per-patient", type=int, default=10)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--format", choices=("dicom", "png"), default="dicom")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = write_archive(
+        args.out,
+        args.patients,
+        args.studies_per_patient,
+        args.size,
+        args.format,
+        args.seed,
+    )
+    print(
+        json.dumps(
+            {"manifest": manifest, "studies": args.patients * args.studies_per_patient}
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""Bulk-load archived studies into the database.
+
+Each input is a manifest (CSV/JSON with ``filename``, ``patient_id``,
+``study_date``, ``report``), or a directory holding ``manifest.csv`` /
+``manifest.json`` or DICOM files (patient and date read from the headers, the
+report from a ``.txt`` file with the same stem). Images are decoded in a
+process pool, analyzed in batches and written in one transaction per batch,
+ordered by patient then date. Each source file is checkpointed in the same
+transaction as its study, so an interrupted run resumes where it stopped:
+
+    python scripts/ingest.py /archive/2019 /archive/2020/manifest.csv
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import multiprocessing
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import CV_MAX_BATCH_SIZE
+from app.services.parsing import (
+    MANIFEST_NAMES,
+    load_pixels_file,
+    parse_manifest,
+    read_study_info,
+)
+
+# app.services.inference and storage are imported in ingest(): spawned decode
+# workers re-run this module's top level and need only the parsing code.
+
+
+def discover(inputs: List[str], pool: Executor) -> List[Dict[str, Any]]:
+    studies = []
+    for path in inputs:
+        if os.path.isdir(path):
+            manifests = [
+                os.path.join(path, name)
+                for name in MANIFEST_NAMES
+                if os.path.isfile(os.path.join(path, name))
+            ]
+            studies.extend(
+                _manifest_studies(manifests[0])
+                if manifests
+                else _dicom_studies(path, pool)
+            )
+        else:
+            studies.extend(_manifest_studies(path))
+    return studies
+
+
+def _manifest_studies(path: str) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        entries = parse_manifest(f.read(), path)
+    root = os.path.dirname(os.path.abspath(path))
+    return [
+        {**entry, "source": os.path.realpath(os.path.join(root, entry["filename"]))}
+        for entry in entries
+    ]
+
+
+def _dicom_studies(root: str, pool: Executor) -> List[Dict[str, Any]]:
+    paths = sorted(
+        os.path.realpath(os.path.join(directory, name))
+        for directory, _, names in os.walk(root)
+        for name in names
+        if name.lower().endswith(".dcm")
+    )
+    studies = []
+    for path, info in zip(paths, pool.map(_study_info, paths, chunksize=64)):
+        report_path = os.path.splitext(path)[0] + ".txt"
+        report_text = ""
+        if os.path.isfile(report_path):
+            with open(report_path, encoding="utf-8", errors="replace") as f:
+                report_text = f.read()
+        studies.append(
+            {
+                **info,
+                "filename": os.path.basename(path),
+                "source": path,
+                "report_text": report_text,
+            }
+        )
+    return studies
+
+
+def _study_info(path: str) -> Dict[str, str]:
+    # Unreadable headers are reported as unidentified rather than aborting the scan.
+    try:
+        return read_study_info(path)
+    except Exception:
+        return {"patient_id": "", "study_date": ""}
+
+
+class StageTimer:
+    """Accumulates wall time per stage from ``analyze_study_batch`` progress calls."""
+
+    def __init__(self):
+        self.seconds: Counter = Counter()
+        self._stage: Optional[str] = None
+        self._started = 0.0
+
+    def __call__(self, stage: Optional[str]) -> None:
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.seconds[self._stage] += now - self._started
+        self._stage, self._started = stage, now
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] += seconds
+
+
+def _batches(
+    studies: List[Dict[str, Any]], size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(studies), size):
+        yield studies[start:start + size]
+
+
+def ingest(
+    inputs: List[str],
+    batch_size: int = CV_MAX_BATCH_SIZE * 2,
+    decode_workers: int = 4,
+    prefetch: int = 4,
+    retry_failed: bool = False,
+    limit: Optional[int] = None,
+    report_every: float = 5.0,
+) -> Dict[str, Any]:
+    from app.services.inference import analyze_study_batch, order_studies
+    from app.services.storage import ingested_sources, record_ingested, unit_of_work
+
+    if decode_workers > 0:
+        pool: Executor = ProcessPoolExecutor(
+            max_workers=decode_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    else:
+        pool = ThreadPoolExecutor(max_workers=1)
+    timer = StageTimer()
+    counts: Counter = Counter()
+    started = time.perf_counter()
+    try:
+        found = discover(inputs, pool)
+        skip = ingested_sources(
+            ("ingested",) if retry_failed else ("ingested", "failed")
+        )
+        unidentified = [
+            study
+            for study in found
+            if not study["patient_id"] or not study["study_date"]
+        ]
+        todo = order_studies(
+            [
+                study
+                for study in found
+                if study["source"] not in skip
+                and study["patient_id"]
+                and study["study_date"]
+            ]
+        )
+        counts.update(
+            found=len(found),
+            skipped=len(found) - len(todo) - len(unidentified),
+            unidentified=len(unidentified),
+        )
+        if limit is not None:
+            todo = todo[:limit]
+        timer.add("discover", time.perf_counter() - started)
+
+        # Decode up to ``prefetch`` batches ahead so workers stay busy during inference.
+        batches = _batches(todo, batch_size)
+        pending: "deque[tuple]" = deque()
+
+        def submit_next() -> None:
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(
+                    (
+                        batch,
+                        [
+                            pool.submit(load_pixels_file, study["source"])
+                            for study in batch
+                        ],
+                    )
+                )
+
+        for _ in range(max(1, prefetch)):
+            submit_next()
+        last_report = time.perf_counter()
+        while pending:
+            batch, futures = pending.popleft()
+            wait_started = time.perf_counter()
+            ready, failed = _collect(batch, futures)
+            timer.add("decode_wait", time.perf_counter() - wait_started)
+            submit_next()
+
+            checkpoint = [
+                {
+                    "source": study["source"],
+                    "status": "ingested",
+                    "patient_id": study["patient_id"],
+                    "study_date": study["study_date"],
+                }
+                for study in ready
+            ] + failed
+            try:
+                if ready:
+                    analyze_study_batch(
+                        ready,
+                        progress=timer,
+                        before_commit=lambda db: record_ingested(db, checkpoint),
+                    )
+                    timer(None)
+                else:
+                    with unit_of_work() as db:
+                        record_ingested(db, checkpoint)
+            except Exception as e:
+                timer(None)
+                failed += [
+                    {
+                        "source": study["source"],
+                        "status": "failed",
+                        "patient_id": study["patient_id"],
+                        "study_date": study["study_date"],
+                        "error": str(e),
+                    }
+                    for study in ready
+                ]
+                ready = []
+                with unit_of_work() as db:
+                    record_ingested(db, failed)
+            counts.update(ingested=len(ready), failed=len(failed))
+
+            if time.perf_counter() - last_report >= report_every or not pending:
+                last_report = time.perf_counter()
+                print(
+                    _progress_line(
+                        counts, len(todo), time.perf_counter() - started, timer
+                    ),
+                    file=sys.stderr,
+                )
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        **{
+            name: counts.get(name, 0)
+            for name in ("found", "skipped", "unidentified", "ingested", "failed")
+        },
+        "elapsed_s": round(elapsed, 2),
+        "studies_per_s": round(counts["ingested"] / elapsed, 2) if elapsed else 0.0,
+        "stage_seconds": {
+            stage: round(seconds, 2) for stage, seconds in timer.seconds.items()
+        },
+    }
+
+
+def _collect(batch: List[Dict[str, Any]], futures: List[Future]) -> tuple:
+    ready, failed = [], []
+    for study, future in zip(batch, futures):
+        try:
+            ready.append({**study, "image": future.result()})
+        except Exception as e:
+            failed.append(
+                {
+                    "source": study["source"],
+                    "status": "failed",
+                    "patient_id": study["patient_id"],
+                    "study_date": study["study_date"],
+                    "error": str(e),
+                }
+            )
+    return ready, failed
+
+
+def _progress_line(
+    counts: Counter, total: int, elapsed: float, timer: StageTimer
+) -> str:
+    done = counts["ingested"] + counts["failed"]
+    stages = " ".join(
+        f"{stage} {seconds:.1f}s" for stage, seconds in timer.seconds.items()
+    )
+    rate, failed = counts["ingested"] / elapsed, counts["failed"]
+    return f"[{done}/{total}] {rate:.1f} studies/s, {failed} failed | {stages}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Bulk-load archived studies (directories or manifests)."
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="directories or manifest CSV/JSON files"
+    )
+    parser.add_argument("--batch-size", type=int, default=CV_MAX_BATCH_SIZE * 2)
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="decode processes; 0 decodes on a thread in this process",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=4, help="batches decoded ahead of inference"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="retry files that failed in earlier runs",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="stop after this many studies"
+    )
+    parser.add_argument(
+        "--report-every", type=float, default=5.0, help="seconds between progress lines"
+    )
+    args = parser.parse_args()
+
+    summary = ingest(
+        args.inputs,
+        args.batch_size,
+        args.decode_workers,
+        args.prefetch,
+        args.retry_failed,
+        args.limit,
+        args.report_every,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
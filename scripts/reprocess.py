@@ -0,0 +1,238 @@
+"""Re-run the CV model over the tensor store instead of re-decoding archives.
+
+Streams the resized planes kept by ``TENSOR_STORE_ENABLED`` in store order,
+checks each row's CRC-32, runs batched inference with the current model and
+rewrites the studies' CV results and progression scores, then rebuilds the
+affected patients' trends. Rows are read from memory-mapped chunk files; a
+batch of consecutive rows reaches the model without being copied.
+
+    python scripts/reprocess.py                 # rescore every stored study
+    python scripts/reprocess.py --dry-run       # report the changes only
+    python scripts/reprocess.py --verify        # checksums only
+    python scripts/reprocess.py --compact       # reclaim space of dead rows
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from sqlalchemy import bindparam, select, tuple_, update
+
+from app.models.cv_model import predict_resized
+from app.config import DEFAULT_ALPHA, DEFAULT_BETA
+from app.models.progression import score
+from app.services.storage import (
+    LABEL_COLUMNS,
+    Study,
+    StudyTensor,
+    engine,
+    rebuild_trends,
+    score_weights_version,
+)
+from app.services.tensor_store import TensorStore, compact, get_tensor_store
+
+
+def iter_entries(batch_size: int, limit: Optional[int] = None,
+                 patient_ids: Optional[Sequence[str]] = None) -> Iterator[List[Any]]:
+    """Index rows joined with their study, in store order, ``batch_size`` at a time."""
+    query = (
+        select(
+            StudyTensor.study_id,
+            StudyTensor.chunk,
+            StudyTensor.row,
+            StudyTensor.crc32,
+            Study.patient_id,
+            Study.delta,
+        )
+        .join(Study, Study.id == StudyTensor.study_id)
+        .where(
+            tuple_(StudyTensor.chunk, StudyTensor.row)
+            > tuple_(bindparam("chunk"), bindparam("row"))
+        )
+        .order_by(StudyTensor.chunk, StudyTensor.row)
+        .limit(bindparam("limit"))
+    )
+    if patient_ids:
+        query = query.where(Study.patient_id.in_(list(patient_ids)))
+    after, remaining = (0, -1), limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        with engine.connect() as conn:
+            entries = conn.execute(
+                query, {"chunk": after[0], "row": after[1], "limit": size}
+            ).all()
+        if not entries:
+            return
+        yield entries
+        after = (entries[-1].chunk, entries[-1].row)
+        if remaining is not None:
+            remaining -= len(entries)
+
+
+def load(
+    store: TensorStore, entries: Sequence[Any]
+) -> Tuple[Sequence[Any], np.ndarray, List[int]]:
+    """Planes for ``entries`` and the indices that are unreadable or corrupt."""
+    positions = [(entry.chunk, entry.row) for entry in entries]
+    try:
+        planes, unreadable = store.read(positions), []
+    except (OSError, IndexError):
+        # A missing chunk or a short file: read row by row to find the bad ones.
+        planes = np.zeros((len(positions), *store.shape), dtype=store.dtype)
+        unreadable = []
+        for i, position in enumerate(positions):
+            try:
+                planes[i] = store.read([position])[0]
+            except (OSError, IndexError):
+                unreadable.append(i)
+    checksums = [entry.crc32 for entry in entries]
+    bad = set(unreadable) | set(store.mismatches(planes, checksums))
+    return entries, planes, sorted(bad)
+
+
+def write_results(rows: List[Dict[str, Any]]) -> None:
+    table = Study.__table__
+    with engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == bindparam("_id")), rows)
+
+
+def reprocess(
+    store: TensorStore,
+    batch_size: int = 64,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+    verify_only: bool = False,
+    patient_ids: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    counts = {"studies": 0, "corrupt": 0, "changed": 0}
+    corrupt_ids: List[int] = []
+    changes: List[float] = []
+    patients = set()
+    score_version = score_weights_version(DEFAULT_ALPHA, DEFAULT_BETA)
+    batches = iter_entries(batch_size, limit, patient_ids)
+    # Checksums of the next batch are computed (and its pages faulted in) while
+    # the model runs.
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = [
+            reader.submit(load, store, batch)
+            for batch in (next(batches, None),)
+            if batch
+        ]
+        while pending:
+            entries, planes, bad = pending.pop().result()
+            following = next(batches, None)
+            if following:
+                pending.append(reader.submit(load, store, following))
+            counts["studies"] += len(entries)
+            counts["corrupt"] += len(bad)
+            corrupt_ids.extend(entries[i].study_id for i in bad)
+            if verify_only:
+                continue
+            keep = [i for i in range(len(entries)) if i not in bad]
+            if not keep:
+                continue
+            resized = torch.from_numpy(
+                planes if len(keep) == len(entries) else planes[keep]
+            )
+            predictions = predict_resized(resized.unsqueeze(1))
+            rows = []
+            with engine.connect() as conn:
+                previous = dict(
+                    conn.execute(
+                        select(Study.id, Study.severity_score).where(
+                            Study.id.in_([entries[i].study_id for i in keep])
+                        )
+                    ).all()
+                )
+            for i, (labels, severity_score) in zip(keep, predictions):
+                entry = entries[i]
+                change = abs(severity_score - (previous.get(entry.study_id) or 0.0))
+                changes.append(change)
+                counts["changed"] += change > 1e-6
+                patients.add(entry.patient_id)
+                rows.append(
+                    {
+                        "_id": entry.study_id,
+                        "cv_result": {
+                            "labels": labels,
+                            "severity_score": severity_score,
+                        },
+                        "severity_score": severity_score,
+                        "progression_score": score(severity_score, entry.delta or 0),
+                        "score_version": score_version,
+                        **{
+                            column: labels.get(label)
+                            for label, column in LABEL_COLUMNS.items()
+                        },
+                    }
+                )
+            if not dry_run:
+                write_results(rows)
+
+    if patients and not dry_run:
+        counts["patients_rebuilt"] = rebuild_trends(engine, patient_ids=patients)
+    elapsed = time.perf_counter() - started
+    summary: Dict[str, Any] = {
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "studies_per_s": round(counts["studies"] / elapsed, 1) if elapsed else 0.0,
+        "corrupt_study_ids": corrupt_ids[:100],
+    }
+    if changes:
+        summary["severity_change"] = {
+            "mean_abs": round(float(np.mean(changes)), 6),
+            "p95_abs": round(float(np.percentile(changes, 95)), 6),
+            "max_abs": round(float(np.max(changes)), 6),
+        }
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Re-run CV inference from the tensor store."
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--limit", type=int, default=None, help="stop after this many studies"
+    )
+    parser.add_argument(
+        "--patient",
+        action="append",
+        dest="patients",
+        help="only this patient (repeatable)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="run the model but write nothing"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="only check the row checksums"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="reclaim the space of rows no study references",
+    )
+    args = parser.parse_args()
+
+    store = get_tensor_store()
+    if args.compact:
+        summary = compact(store)
+    else:
+        summary = reprocess(
+            store, args.batch_size, args.limit, args.dry_run, args.verify, args.patients
+        )
+    summary["store"] = store.stats()
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if summary.get("corrupt") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Recompute progression scores for new weights without re-running any model.
+
+Reads the stored ``severity_score`` and ``delta`` columns in id order,
+``--chunk-size`` rows at a time, recomputes ``alpha * severity + beta *
+delta`` for the whole chunk with NumPy and writes the changed rows back in
+one executemany ``UPDATE`` per chunk. Every rewritten study is stamped with
+the ``score_weights`` version of its weights, so rerunning with the same
+weights only touches rows that are not on them yet. Affected patients'
+trends are rebuilt at the end.
+
+    python scripts/rescore.py --alpha 0.6 --beta 0.4 --dry-run  # score shift only
+    python scripts/rescore.py --alpha 0.6 --beta 0.4
+    python scripts/rescore.py --list                            # weight versions
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, update
+
+from app.config import DEFAULT_ALPHA, DEFAULT_BETA
+from app.models.progression import score_array
+from app.services.cohort import fetch_frame
+from app.services.storage import (
+    Study,
+    engine,
+    rebuild_trends,
+    score_weights,
+    score_weights_version,
+)
+
+
+def iter_chunks(
+    chunk_size: int, patient_ids: Optional[Sequence[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """Scored studies in id order, as frames of ``chunk_size`` rows."""
+    after = 0
+    while True:
+        query = (select(Study.id, Study.patient_id, Study.severity_score, Study.delta,
+                        Study.progression_score, Study.score_version)
+                 .where(Study.id > after, Study.severity_score.is_not(None))
+                 .order_by(Study.id).limit(chunk_size))
+        if patient_ids:
+            query = query.where(Study.patient_id.in_(list(patient_ids)))
+        frame = fetch_frame(query)
+        if frame.empty:
+            return
+        yield frame
+        after = int(frame["id"].iloc[-1])
+
+
+def write_scores(ids: np.ndarray, scores: np.ndarray, version: int) -> None:
+    table = Study.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            update(table).where(table.c.id == bindparam("_id")),
+            [
+                {"_id": study_id, "progression_score": value, "score_version": version}
+                for study_id, value in zip(ids.tolist(), scores.tolist())
+            ],
+        )
+
+
+def distribution(values: np.ndarray, edges: np.ndarray) -> Dict[str, Any]:
+    if not len(values):
+        return {"count": 0}
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), 6),
+        "std": round(float(values.std()), 6),
+        "p5": round(float(p5), 6),
+        "p50": round(float(p50), 6),
+        "p95": round(float(p95), 6),
+        "histogram": np.histogram(values, bins=edges)[0].tolist(),
+    }
+
+
+def rescore(alpha: float, beta: float, chunk_size: int = 20000, dry_run: bool = False,
+            patient_ids: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if dry_run:
+        # Registers nothing; reports the version the weights already have, if any.
+        version = next(
+            (
+                w["version"]
+                for w in score_weights()
+                if (w["alpha"], w["beta"]) == (alpha, beta)
+            ),
+            None,
+        )
+    else:
+        version = score_weights_version(alpha, beta)
+    old_scores: List[np.ndarray] = []
+    new_scores: List[np.ndarray] = []
+    counts = {"studies": 0, "changed": 0, "rewritten": 0}
+    patients = set()
+    for frame in iter_chunks(chunk_size, patient_ids):
+        delta = frame["delta"].to_numpy(dtype=np.float64, na_value=0.0)
+        scores = score_array(
+            frame["severity_score"].to_numpy(dtype=np.float64), delta, alpha, beta
+        )
+        old = frame["progression_score"].to_numpy(dtype=np.float64, na_value=np.nan)
+        versions = frame["score_version"].to_numpy(dtype=np.float64, na_value=np.nan)
+        changed = ~np.isclose(scores, old, rtol=0.0, atol=1e-12)
+        counts["studies"] += len(frame)
+        counts["changed"] += int(changed.sum())
+        old_scores.append(old)
+        new_scores.append(scores)
+        patients.update(frame["patient_id"].to_numpy()[changed].tolist())
+        # Rows already on this version are skipped, so a rerun writes nothing.
+        stale = changed | (versions != version)
+        if not dry_run and stale.any():
+            write_scores(frame["id"].to_numpy()[stale], scores[stale], version)
+            counts["rewritten"] += int(stale.sum())
+
+    if patients and not dry_run:
+        counts["patients_rebuilt"] = rebuild_trends(engine, patient_ids=patients)
+    elapsed = time.perf_counter() - started
+    summary: Dict[str, Any] = {
+        "alpha": alpha,
+        "beta": beta,
+        "score_version": version,
+        "dry_run": dry_run,
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "studies_per_s": round(counts["studies"] / elapsed, 1) if elapsed else 0.0,
+    }
+    if old_scores:
+        old, new = np.concatenate(old_scores), np.concatenate(new_scores)
+        edges = np.linspace(0.0, 1.0, 11)
+        scored = ~np.isnan(old)
+        shift = np.abs(new[scored] - old[scored])
+        summary["before"] = distribution(old[scored], edges)
+        summary["after"] = distribution(new, edges)
+        if len(shift):
+            summary["shift"] = {
+                "mean_abs": round(float(shift.mean()), 6),
+                "max_abs": round(float(shift.max()), 6),
+            }
+        summary["histogram_edges"] = edges.round(2).tolist()
+    if (alpha, beta) != (DEFAULT_ALPHA, DEFAULT_BETA):
+        summary["note"] = (
+            f"New analyses still use DEFAULT_ALPHA={DEFAULT_ALPHA}, "
+            f"DEFAULT_BETA={DEFAULT_BETA}; set DEFAULT_ALPHA={alpha} "
+            f"DEFAULT_BETA={beta} to score them with these weights."
+        )
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recompute progression scores from stored severities."
+    )
+    parser.add_argument(
+        "--alpha", type=float, default=DEFAULT_ALPHA, help="severity weight"
+    )
+    parser.add_argument(
+        "--beta", type=float, default=DEFAULT_BETA, help="change (delta) weight"
+    )
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument(
+        "--patient",
+        action="append",
+        dest="patients",
+        help="only this patient (repeatable)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report the score distribution shift, write nothing",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="list the weight versions and their study counts",
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        print(json.dumps(score_weights(), indent=2))
+        return
+    print(
+        json.dumps(
+            rescore(
+                args.alpha, args.beta, args.chunk_size, args.dry_run, args.patients
+            ),
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
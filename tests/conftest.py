@@ -0,0 +1,57 @@
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import (
+    ExplicitVRLittleEndian,
+    SecondaryCaptureImageStorage,
+    generate_uid,
+)
+
+
+# Tests get their own database and data directories; these must be set before
+# anything imports ``app``, whose config is read at import time.
+_DATA_DIR = tempfile.mkdtemp(prefix="radprogressor-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+for _name in ("JOB_SPOOL_DIR", "PROFILE_DIR", "SHARED_WEIGHTS_DIR", "TENSOR_STORE_DIR"):
+    os.environ[_name] = os.path.join(_DATA_DIR, _name.lower())
+
+
+def _dicom_bytes(
+    pixels: np.ndarray, modality: str = "DX", transfer_syntax=ExplicitVRLittleEndian
+) -> bytes:
+    frames = pixels.shape[0] if pixels.ndim == 3 else 1
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.Modality = modality
+    ds.Rows, ds.Columns = pixels.shape[-2:]
+    if frames > 1:
+        ds.NumberOfFrames = frames
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = pixels.astype(np.uint16).tobytes()
+    if transfer_syntax != ExplicitVRLittleEndian:
+        ds.compress(transfer_syntax)
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_dicom():
+    return _dicom_bytes
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
@@ -0,0 +1,124 @@
+import io
+import json
+import tarfile
+import zipfile
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import main
+from app.services.parsing import read_archive
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.arange(64 * 64, dtype=np.uint8).reshape(64, 64)).save(
+        buffer, format="PNG"
+    )
+    return buffer.getvalue()
+
+def _zip(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def _tar(files) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+@pytest.mark.parametrize(
+    "pack, filename", [(_zip, "upload.zip"), (_tar, "upload.tar.gz")]
+)
+def test_read_archive_limits(pack, filename):
+    content = pack({"a.png": b"a" * 100, "b.png": b"\0" * 1000, "c.png": b"c"})
+    assert sorted(read_archive(content, filename)) == ["a.png", "b.png", "c.png"]
+    with pytest.raises(ValueError, match="more than 2 files"):
+        read_archive(content, filename, max_members=2)
+    with pytest.raises(ValueError, match="more than 1000 bytes"):
+        read_archive(content, filename, max_bytes=1000)
+
+def _fake_batch(studies):
+    return [
+        {"patient_id": study["patient_id"], "study_date": study["study_date"]}
+        for study in studies
+    ]
+
+def test_batch_endpoint_reports_missing_files(monkeypatch):
+    monkeypatch.setattr(main, "analyze_study_batch", _fake_batch)
+    manifest = [
+        {"filename": "a.png", "patient_id": "BATCH-1", "study_date": "2024-01-01"},
+        {
+            "filename": "missing.png",
+            "patient_id": "BATCH-1",
+            "study_date": "2024-02-01",
+        },
+    ]
+    response = TestClient(main.app).post(
+        "/api/analyze/batch",
+        data={"manifest": json.dumps(manifest)},
+        files=[("images", ("a.png", _png(), "image/png"))],
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2
+    missing = next(line for line in lines if line["filename"] == "missing.png")
+    assert "File not found" in missing["error"]
+    assert (
+        next(line for line in lines if line["filename"] == "a.png")["study_date"]
+        == "2024-01-01"
+    )
+
+def test_batch_endpoint_rejects_oversized_archives(monkeypatch):
+    monkeypatch.setattr(main, "analyze_study_batch", _fake_batch)
+    manifest = b"filename,patient_id,study_date\na.png,BATCH-2,2024-01-01\n"
+    archive = _zip({"manifest.csv": manifest, "a.png": _png()})
+    client = TestClient(main.app)
+
+    def post():
+        return client.post(
+            "/api/analyze/batch",
+            files={"archive": ("upload.zip", archive, "application/zip")},
+        )
+
+    assert post().status_code == 200
+    monkeypatch.setattr(main, "ARCHIVE_MAX_MEMBERS", 1)
+    assert post().status_code == 400
+    monkeypatch.setattr(main, "ARCHIVE_MAX_MEMBERS", 10)
+    monkeypatch.setattr(main, "ARCHIVE_MAX_BYTES", 100)
+    response = post()
+    assert response.status_code == 400 and "bytes" in response.json()["detail"]
+
+@pytest.mark.parametrize(
+    "content, filename",
+    [
+        (b"not a zip", "upload.zip"),
+        (_zip({"a.png": b"a" * 1000})[:60], "upload.zip"),
+        (_tar({"a.png": b"a" * 100_000})[:50], "upload.tar.gz"),
+    ],
+)
+def test_batch_endpoint_rejects_corrupt_archives(monkeypatch, content, filename):
+    monkeypatch.setattr(main, "analyze_study_batch", _fake_batch)
+    response = TestClient(main.app).post(
+        "/api/analyze/batch",
+        files={"archive": (filename, content, "application/octet-stream")},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Unreadable archive: {filename}"
+
+@pytest.mark.parametrize("manifest", ['["a.png"]', '{"studies": "a.png"}'])
+def test_batch_endpoint_rejects_malformed_manifests(monkeypatch, manifest):
+    monkeypatch.setattr(main, "analyze_study_batch", _fake_batch)
+    response = TestClient(main.app).post(
+        "/api/analyze/batch",
+        data={"manifest": manifest},
+        files=[("images", ("a.png", _png(), "image/png"))],
+    )
+    assert response.status_code == 400
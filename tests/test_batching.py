@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+
+def test_single_request_runs_immediately():
+    batcher = MicroBatcher(
+        lambda items: [i * 2 for i in items], max_batch_size=8, max_wait_ms=500
+    )
+    start = time.monotonic()
+    assert batcher(21) == 42
+    assert time.monotonic() - start < 0.25
+    assert batcher.stats()["batch_size_histogram"] == {"1": 1}
+    batcher.close()
+
+def test_concurrent_requests_are_batched():
+    release = threading.Event()
+    seen = []
+
+    def fn(items):
+        release.wait(1)
+        seen.append(len(items))
+        return [i + 1 for i in items]
+
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(9)]
+    release.set()
+    assert [f.result(timeout=2) for f in futures] == list(range(1, 10))
+    assert max(seen) <= 4
+    assert sum(seen) == 9
+    assert len(seen) < 9
+    stats = batcher.stats()
+    assert stats["items"] == 9
+    assert stats["batches"] == len(seen)
+    batcher.close()
+
+def test_errors_fan_out_to_every_caller():
+    def fn(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=5)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+    assert batcher.stats()["errors"] >= 1
+    batcher.close()
+
+def test_close_fails_items_queued_behind_the_stop():
+    started, release = threading.Event(), threading.Event()
+
+    def fn(items):
+        started.set()
+        release.wait(2)
+        return items
+
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=5)
+    first = batcher.submit(0)
+    assert started.wait(2)
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    deadline = time.monotonic() + 2
+    while batcher._queue.qsize() < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # A submit that passed _ensure_started just before close queued the stop.
+    late = Future()
+    batcher._queue.put((1, late))
+    release.set()
+    closer.join(2)
+    assert not closer.is_alive()
+    assert first.result(timeout=2) == 0
+    with pytest.raises(RuntimeError, match="closed"):
+        late.result(timeout=2)
@@ -0,0 +1,113 @@
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.services.cache import ResultCache
+from app.services.storage import Base, CVResultCache
+
+@pytest.fixture
+def sessions(tmp_path):
+    # Eviction counts every model's rows, so each test gets its own table.
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def _cache(sessions, **kwargs):
+    return ResultCache(f"test-{uuid.uuid4().hex}", session_factory=sessions, **kwargs)
+
+def test_key_depends_on_pixels_and_model(sessions):
+    cache = _cache(sessions)
+    pixels = np.random.default_rng(0).random((8, 8), dtype=np.float32)
+    assert cache.key(pixels) == cache.key(pixels.copy())
+    assert cache.key(pixels) != cache.key(pixels[:4])
+    assert cache.key(pixels) != _cache(sessions).key(pixels)
+
+def test_memory_and_sqlite_tiers(sessions):
+    cache = _cache(sessions, memory_items=1)
+    first, second = (
+        cache.key(np.zeros(4, dtype=np.float32)),
+        cache.key(np.ones(4, dtype=np.float32)),
+    )
+    assert cache.get(first) is None
+    cache.put(first, ({"effusion": 0.25}, 0.25))
+    cache.put(second, ({"effusion": 0.75}, 0.75))
+    assert cache.get(second) == ({"effusion": 0.75}, 0.75)
+    assert cache.get(first) == ({"effusion": 0.25}, 0.25)
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["sqlite_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["memory_evictions"] >= 1
+
+def _last_used(sessions, key):
+    with sessions() as db:
+        return db.get(CVResultCache, key).last_used_at
+
+def test_sqlite_hits_defer_recency_updates(sessions):
+    cache = _cache(sessions, memory_items=1, max_rows=2)
+    first, second, third = (
+        cache.key(np.full(4, i, dtype=np.float32)) for i in range(3)
+    )
+    cache.put(first, ({"effusion": 0.1}, 0.1))
+    cache.put(second, ({"effusion": 0.2}, 0.2))
+    before = _last_used(sessions, first)
+    assert cache.get(first) == ({"effusion": 0.1}, 0.1)
+    assert _last_used(sessions, first) == before
+
+    cache.put(third, ({"effusion": 0.3}, 0.3))
+    assert _last_used(sessions, first) > before
+    assert cache.evict() == 1
+    fresh = ResultCache(cache.model_key, session_factory=sessions)
+    assert fresh.get(first) is not None and fresh.get(second) is None
+
+def test_model_change_leaves_old_rows_to_eviction(sessions):
+    old = _cache(sessions, max_rows=1)
+    new = _cache(sessions, max_rows=1)
+    pixels = np.zeros(4, dtype=np.float32)
+    old.put(old.key(pixels), ({"effusion": 0.5}, 0.5))
+    assert new.get(new.key(pixels)) is None
+    # A process still on the old model keeps its rows, e.g. mid rolling deploy.
+    restarted_old = ResultCache(old.model_key, session_factory=sessions)
+    assert restarted_old.get(old.key(pixels)) == ({"effusion": 0.5}, 0.5)
+
+    new.put(new.key(pixels), ({"effusion": 0.75}, 0.75))
+    assert new.evict() == 1
+    restarted_old = ResultCache(old.model_key, session_factory=sessions)
+    assert restarted_old.get(old.key(pixels)) is None
+
+def test_put_replaces_a_row_another_process_wrote(sessions):
+    first = _cache(sessions)
+    second = ResultCache(first.model_key, session_factory=sessions)
+    key = first.key(np.zeros(4, dtype=np.float32))
+    assert first.get(key) is None and second.get(key) is None
+    first.put(key, ({"effusion": 0.25}, 0.25))
+    second.put(key, ({"effusion": 0.5}, 0.5))
+    fresh = ResultCache(first.model_key, session_factory=sessions)
+    assert fresh.get(key) == ({"effusion": 0.5}, 0.5)
+
+def test_failed_table_write_is_not_raised(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    cache = _cache(sessionmaker(bind=engine))
+    key = cache.key(np.zeros(4, dtype=np.float32))
+    cache.put(key, ({"effusion": 0.25}, 0.25))
+    assert cache.get(key) == ({"effusion": 0.25}, 0.25)
+    assert "Result cache write failed" in caplog.text
+    engine.dispose()
+
+def test_put_many_writes_a_batch_in_one_commit(sessions):
+    commits = []
+    engine = sessions.kw["bind"]
+    cache = _cache(sessions)
+    keys = [cache.key(np.full(4, i, dtype=np.float32)) for i in range(3)]
+    values = [({"effusion": i / 4}, i / 4) for i in range(3)]
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    # The same image twice in one batch is stored once.
+    cache.put_many(keys + keys[:1], values + values[:1])
+    assert len(commits) == 1
+    fresh = ResultCache(cache.model_key, session_factory=sessions)
+    assert [fresh.get(key) for key in keys] == values
+    assert cache.stats()["stores"] == 3
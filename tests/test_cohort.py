@@ -0,0 +1,141 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.progression import build_trend, slope_per_year, trend_summary
+from app.services.cohort import (
+    LABEL_SLOPE_FIELDS,
+    filter_metrics,
+    prepare_scores,
+    progression_metrics,
+)
+from app.services.storage import add_studies
+
+def _frame(series):
+    rows = [
+        {
+            "patient_id": patient_id,
+            "study_date": study_date,
+            "progression_score": value,
+            "p_effusion": value / 2,
+        }
+        for patient_id, points in sorted(series.items())
+        for study_date, value in points
+    ]
+    return prepare_scores(pd.DataFrame(rows))
+
+def test_metrics_match_per_patient_reference():
+    rng = np.random.default_rng(0)
+    series = {}
+    for i in range(20):
+        days = np.sort(
+            rng.choice(np.arange(0, 400), size=rng.integers(1, 12), replace=False)
+        )
+        series[f"P{i:02d}"] = [
+            (
+                str(pd.Timestamp("2023-01-01") + pd.Timedelta(days=int(d)))[:10],
+                float(rng.random()),
+            )
+            for d in days
+        ]
+    metrics = progression_metrics(
+        _frame(series), window_days=30, rolling_studies=3
+    ).set_index("patient_id")
+
+    for patient_id, points in series.items():
+        row = metrics.loc[patient_id]
+        trend = build_trend(points)
+        assert row["study_count"] == len(points)
+        assert row["last_delta"] == pytest.approx(
+            trend_summary(points)["last_delta"], abs=1e-3
+        )
+        assert row["ewma"] == pytest.approx(trend["ewma"])
+        assert row["rolling_mean"] == pytest.approx(
+            np.mean([v for _, v in points[-3:]])
+        )
+        last_day = pd.Timestamp(points[-1][0])
+        in_window = [
+            v for d, v in points if pd.Timestamp(d) >= last_day - pd.Timedelta(days=30)
+        ]
+        assert row["window_delta"] == pytest.approx(points[-1][1] - in_window[0])
+        expected_slope = slope_per_year(trend)
+        if expected_slope is None:
+            assert np.isnan(row["slope_per_year"])
+        else:
+            assert row["slope_per_year"] == pytest.approx(expected_slope)
+            assert row["slope_effusion"] == pytest.approx(expected_slope / 2)
+
+def test_filters():
+    metrics = progression_metrics(_frame({
+        "RISING": [("2024-01-01", 0.2), ("2024-01-20", 0.5)],
+        "FALLING": [("2024-01-01", 0.6), ("2024-01-20", 0.3)],
+        "SINGLE": [("2024-01-01", 0.9)],
+    }))
+    assert list(filter_metrics(metrics, min_window_delta=0.1)["patient_id"]) == [
+        "RISING"
+    ]
+    assert list(filter_metrics(metrics, max_slope=0.0)["patient_id"]) == ["FALLING"]
+    # A single study has no slope, so no label-slope filter can match it.
+    assert list(
+        filter_metrics(metrics, min_studies=1, label="effusion", min_label_slope=-100)[
+            "patient_id"
+        ]
+    ) == ["FALLING", "RISING"]
+
+def test_empty_cohort_keeps_every_column():
+    empty = prepare_scores(
+        pd.DataFrame(columns=["patient_id", "study_date", "progression_score"])
+    )
+    metrics = progression_metrics(empty)
+    assert set(LABEL_SLOPE_FIELDS) <= set(metrics.columns)
+    assert filter_metrics(metrics, label="effusion", min_label_slope=0).empty
+    # A frame without a label's probabilities still gets its slope column.
+    partial = progression_metrics(_frame({"P": [("2024-01-01", 0.1)]}))
+    assert set(LABEL_SLOPE_FIELDS) <= set(partial.columns)
+
+    response = TestClient(app).get(
+        "/api/cohort/progression",
+        params={"since": "2999-01-01", "label": "effusion", "min_label_slope": 0},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cohort_size"] == 0 and body["patients"] == []
+
+def test_cohort_endpoint():
+    patient_id = f"COHORT-{uuid.uuid4().hex[:8]}"
+    add_studies(
+        [
+            {
+                "patient_id": patient_id,
+                "study_date": date,
+                "cv_result": {"labels": {"effusion": v}},
+                "nlp_result": {"change": "stable", "delta": 0},
+                "progression_score": v,
+                "genai_result": {},
+            }
+            for date, v in [("2031-01-01", 0.1), ("2031-01-15", 0.9)]
+        ]
+    )
+    client = TestClient(app)
+    response = client.get(
+        "/api/cohort/progression",
+        params={"since": "2031-01-01", "min_window_delta": 0.5},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert patient_id in [patient["patient_id"] for patient in body["patients"]]
+    assert (
+        client.get(
+            "/api/cohort/progression", params={"label": "nope", "min_label_slope": 0}
+        ).status_code
+        == 400
+    )
+    for window_days in (0, -20_000_000, 3651, 20_000_000):
+        params = {"window_days": window_days}
+        assert client.get("/api/cohort/progression", params=params).status_code == 400
+    for params in ({"limit": 0}, {"limit": -1}, {"offset": -5}):
+        assert client.get("/api/cohort/progression", params=params).status_code == 400
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.models import cv_model
+from app.models.cv_backends import build_backend, drift_report, example_batch
+from app.models.cv_model import ChestXRayModel
+from app.services import cache
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return ChestXRayModel(pretrained=False).eval()
+
+@pytest.fixture(scope="module")
+def inputs():
+    return example_batch(2, image_size=64)
+
+@pytest.mark.parametrize(
+    "backend, tolerance",
+    [("channels_last", 1e-4), ("torchscript", 1e-4), ("int8_dynamic", 0.05)],
+)
+def test_backend_matches_eager(model, inputs, backend, tolerance):
+    reference = build_backend(model, "eager")
+    candidate = build_backend(model, backend)
+    assert candidate(inputs).shape == (2, 5)
+    assert drift_report(reference, candidate, inputs)["max_abs_prob_diff"] <= tolerance
+
+def test_calibration_batch_loads_images(tmp_path):
+    for i in range(3):
+        Image.fromarray(np.full((32, 32), 40 * i, dtype=np.uint8)).save(
+            tmp_path / f"{i}.png"
+        )
+    (tmp_path / "notes.txt").write_text("not an image")
+    assert cv_model.calibration_batch(str(tmp_path), limit=2).shape == (2, 3, 224, 224)
+    assert torch.equal(
+        cv_model.calibration_batch(str(tmp_path / "missing")), example_batch(4)
+    )
+
+def test_drift_fallback_is_reported_as_eager(model, monkeypatch):
+    monkeypatch.setattr(
+        cv_model, "calibration_batch", lambda: example_batch(2, image_size=64)
+    )
+    monkeypatch.setattr(cv_model, "CV_BACKEND_MAX_DRIFT", 0.05)
+    assert cv_model._build_runner(model, "channels_last")[1] == "channels_last"
+    monkeypatch.setattr(cv_model, "CV_BACKEND_MAX_DRIFT", -1.0)
+    assert cv_model._build_runner(model, "channels_last")[1] == "eager"
+
+def test_result_cache_is_keyed_on_the_running_backend(monkeypatch):
+    monkeypatch.setattr(cv_model, "_cv_runner", lambda x: x)
+    monkeypatch.setattr(cv_model, "_cv_backend", "eager")
+    monkeypatch.setattr(cache, "_result_cache", None)
+    assert cache.get_result_cache().model_key.endswith(":eager")
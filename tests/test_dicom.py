@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from pydicom.uid import RLELossless
+
+from app.services.parsing import ImageValidationError, decode_dicom, dicom_pixels
+
+def _frames():
+    frames = np.zeros((3, 64, 48), dtype=np.uint16)
+    for i in range(3):
+        frames[i] = np.arange(64 * 48).reshape(64, 48) * (i + 1) % 4096
+    return frames
+
+def test_decodes_only_requested_frame(make_dicom):
+    frames = _frames()
+    pixels, stats = decode_dicom(make_dicom(frames), frame=2)
+    expected = frames[2].astype(np.float32)
+    expected = (expected - expected.min()) / (expected.max() - expected.min())
+    assert stats["frames"] == 3
+    assert stats["decoded_shape"] == [64, 48]
+    assert np.allclose(pixels, expected)
+
+def test_reduced_resolution_native_and_compressed_agree(make_dicom):
+    frames = _frames()
+    native, native_stats = decode_dicom(make_dicom(frames), frame=1, target_size=12)
+    compressed, compressed_stats = decode_dicom(
+        make_dicom(frames, transfer_syntax=RLELossless), frame=1, target_size=12
+    )
+    assert native_stats["subsample_step"] == 2
+    assert native.shape == (32, 24)
+    assert native_stats["decoded_bytes"] < compressed_stats["decoded_bytes"]
+    assert np.allclose(native, compressed)
+
+def test_header_validation_runs_before_decode(make_dicom):
+    with pytest.raises(ImageValidationError):
+        dicom_pixels(make_dicom(_frames()[0], modality="MR"))
+    with pytest.raises(ImageValidationError):
+        dicom_pixels(make_dicom(_frames()), frame=5)
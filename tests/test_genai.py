@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from app.models.genai import summarize_clinician, summarize_patient
+from app.services.genai_client import SummaryClient, summary_key
+from app.services.genai_stub import start_stub
+
+TREND = {"direction": "worsening", "last_delta": 0.12}
+LABELS = {"effusion": 0.612, "pneumonia": 0.2}
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def make(latency_ms):
+        servers.append(start_stub(latency_ms))
+        return servers[-1]
+
+    yield make
+    for server in servers:
+        server.shutdown()
+
+def test_summary_key_normalizes_inputs():
+    assert summary_key("Small  right Effusion.", LABELS, TREND) == summary_key(
+        "small right effusion.", {"pneumonia": 0.2, "effusion": 0.6149}, TREND
+    )
+    assert summary_key("small right effusion.", LABELS, TREND) != \
+        summary_key("small right effusion.", {**LABELS, "effusion": 0.7}, TREND)
+
+def test_summaries_are_requested_in_parallel_and_cached(stub):
+    server = stub(300)
+    client = SummaryClient(server.url, timeout_s=5)
+    try:
+        started = time.perf_counter()
+        summaries = client.summarize("Small right effusion.", LABELS, TREND)
+        elapsed = time.perf_counter() - started
+        assert summaries["clinician"].startswith("Stub clinician summary")
+        assert summaries["patient"].startswith("Stub patient summary")
+        assert server.requests == 2 and elapsed < 0.55
+
+        assert (
+            client.summarize(
+                "small right  effusion.", {"effusion": 0.6149, "pneumonia": 0.2}, TREND
+            )
+            == summaries
+        )
+        assert server.requests == 2
+        assert client.stats()["cache"]["hits"] == 1
+    finally:
+        client.close()
+
+def test_concurrency_limit(stub):
+    server = stub(50)
+    client = SummaryClient(server.url, max_concurrency=2, timeout_s=5)
+    try:
+        studies = [(f"finding {i}", LABELS, TREND) for i in range(6)] + [
+            ("finding 0", LABELS, TREND)
+        ]
+        results = client.summarize_many(studies)
+    finally:
+        client.close()
+    assert len(results) == 7 and results[0] == results[6]
+    assert server.requests == 12
+    assert server.max_in_flight <= 2
+
+def test_timeout_falls_back_to_templates_without_caching(stub):
+    server = stub(500)
+    client = SummaryClient(server.url, timeout_s=0.1)
+    try:
+        summaries = client.summarize("", LABELS, TREND)
+        assert summaries == {"clinician": summarize_clinician("", LABELS, TREND),
+                             "patient": summarize_patient("", LABELS, TREND)}
+        client.summarize("", LABELS, TREND)
+        stats = client.stats()
+    finally:
+        client.close()
+    assert stats["timeouts"] == 4 and stats["cache"]["size"] == 0
@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.services.cache import get_response_cache
+from app.services.storage import add_studies, get_patient_version
+
+client = TestClient(app)
+
+def _add(patient_id, study_date, value):
+    add_studies(
+        [
+            {
+                "patient_id": patient_id,
+                "study_date": study_date,
+                "progression_score": value,
+                "cv_result": {"labels": {"effusion": value}, "severity_score": value},
+                "nlp_result": {"change": "stable", "delta": 0},
+                "genai_result": {},
+            }
+        ]
+    )
+
+def test_snapshot_etag_and_not_modified():
+    patient_id = f"HTTP-{uuid.uuid4().hex[:8]}"
+    _add(patient_id, "2024-01-01", 0.2)
+
+    first = client.get(f"/api/patient/{patient_id}/snapshot")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    hits = get_response_cache().stats()["hits"]
+    again = client.get(f"/api/patient/{patient_id}/snapshot")
+    assert again.json() == first.json()
+    assert get_response_cache().stats()["hits"] == hits + 1
+
+    revalidated = client.get(
+        f"/api/patient/{patient_id}/snapshot", headers={"If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+
+    _add(patient_id, "2024-02-01", 0.6)
+    changed = client.get(
+        f"/api/patient/{patient_id}/snapshot", headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["last_study"]["study_date"] == "2024-02-01"
+
+def _freeze_clock(monkeypatch, now):
+    class _Frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(main, "datetime", _Frozen)
+
+def test_last_modified_waits_for_the_write_second_to_end(monkeypatch):
+    patient_id = f"HTTP-{uuid.uuid4().hex[:8]}"
+    _add(patient_id, "2024-01-01", 0.2)
+    written = get_patient_version(patient_id)[1].replace(tzinfo=timezone.utc)
+    since = {"If-Modified-Since": format_datetime(written.replace(microsecond=0),
+                                                  usegmt=True)}
+    url = f"/api/patient/{patient_id}/snapshot"
+
+    # Another write could still land in this second under the same date.
+    _freeze_clock(monkeypatch, written)
+    assert "last-modified" not in client.get(url).headers
+    assert client.get(url, headers=since).status_code == 200
+
+    _freeze_clock(monkeypatch, written.replace(microsecond=0) + timedelta(seconds=1))
+    assert client.get(url).headers["last-modified"] == since["If-Modified-Since"]
+    assert client.get(url, headers=since).status_code == 304
+
+def test_timeline_etag_depends_on_parameters():
+    patient_id = f"HTTP-{uuid.uuid4().hex[:8]}"
+    _add(patient_id, "2024-01-01", 0.2)
+    full = client.get(f"/api/patient/{patient_id}/timeline")
+    dates = client.get(f"/api/patient/{patient_id}/timeline", params={"fields": "date"})
+    assert full.headers["etag"] != dates.headers["etag"]
+    assert dates.json()["timeline"] == [{"date": "2024-01-01"}]
+
+def test_unknown_patient_is_not_cached():
+    assert client.get("/api/patient/NOBODY-HTTP/snapshot").status_code == 404
+    response = client.get("/api/patient/NOBODY-HTTP/timeline")
+    assert response.status_code == 200 and "etag" not in response.headers
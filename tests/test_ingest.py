@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import uuid
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services import inference
+from app.services.storage import get_score_history, get_trend
+
+_spec = importlib.util.spec_from_file_location(
+    "ingest",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "ingest.py"),
+)
+ingest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(ingest)
+
+def _archive(tmp_path, patient_id, count):
+    rows = ["filename,patient_id,study_date,report"]
+    for i in range(count):
+        Image.fromarray(np.full((32, 32), i * 20, dtype=np.uint8)).save(
+            tmp_path / f"{i}.png"
+        )
+        # Listed newest first: ingest has to order each patient's studies by date.
+        rows.append(f"{i}.png,{patient_id},2020-{12 - i:02d}-01,")
+    rows.append(f"missing.png,{patient_id},2021-01-01,")
+    (tmp_path / "manifest.csv").write_text("\n".join(rows))
+
+def test_ingest_resumes_after_interruption(tmp_path, monkeypatch):
+    patient_id = f"INGEST-{uuid.uuid4().hex[:8]}"
+    _archive(tmp_path, patient_id, 6)
+    calls = []
+
+    def fake_predict(images):
+        calls.append(len(images))
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return [
+            ({"effusion": float(image.mean())}, float(image.mean())) for image in images
+        ]
+
+    monkeypatch.setattr(inference, "predict_images", fake_predict)
+    with pytest.raises(KeyboardInterrupt):
+        ingest.ingest([str(tmp_path)], batch_size=4, decode_workers=0, report_every=60)
+    assert len(get_score_history(patient_id)) == 4
+
+    summary = ingest.ingest(
+        [str(tmp_path)], batch_size=4, decode_workers=0, report_every=60
+    )
+    assert summary["found"] == 7 and summary["skipped"] == 4
+    assert summary["ingested"] == 2 and summary["failed"] == 1
+    assert set(summary["stage_seconds"]) >= {"decode_wait", "cv", "storing"}
+
+    dates = [date for date, _ in get_score_history(patient_id)]
+    assert dates == sorted(dates) and len(dates) == 6
+    assert get_trend(patient_id)["study_count"] == 6
+
+    again = ingest.ingest(
+        [str(tmp_path)], batch_size=4, decode_workers=0, report_every=60
+    )
+    assert again["ingested"] == 0 and again["skipped"] == 7
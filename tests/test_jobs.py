@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+
+from app import main
+from app.services import jobs
+from app.services.jobs import JobRunner, get_job
+from app.services.storage import Job, Study, insert_studies, unit_of_work
+
+def _fake_run(job, content, progress, complete):
+    progress("cv")
+    progress("storing")
+    if content == b"boom":
+        raise RuntimeError("decode failed")
+    return {"patient_id": job["patient_id"], "size": len(content)}
+
+class _ProcessDied(BaseException):
+    pass
+
+def _storing_run(job, content, progress, complete):
+    with unit_of_work() as db:
+        insert_studies(
+            db,
+            [
+                {
+                    "patient_id": job["patient_id"],
+                    "study_date": job["study_date"],
+                    "progression_score": 0.5,
+                }
+            ],
+        )
+        complete(db, {"attempt": job["attempts"]})
+    if job["attempts"] == 1:
+        raise _ProcessDied()
+    return {"attempt": job["attempts"]}
+
+def _study_count(patient_id):
+    with unit_of_work() as db:
+        return db.scalar(
+            select(func.count())
+            .select_from(Study)
+            .where(Study.patient_id == patient_id)
+        )
+
+def _wait(job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job(job_id)
+        if job["status"] in jobs.TERMINAL_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_jobs_run_to_completion_and_clean_up_spool(tmp_path):
+    runner = JobRunner(_fake_run, workers=2, spool_dir=str(tmp_path))
+    runner.start()
+    try:
+        ok = runner.submit("JOB-1", "2024-01-01", b"pixels", "a.png")
+        bad = runner.submit("JOB-1", "2024-02-01", b"boom", "b.png")
+        assert ok["status"] == "queued"
+        done, failed = _wait(ok["job_id"]), _wait(bad["job_id"])
+    finally:
+        runner.stop()
+    assert done["status"] == "succeeded" and done["result"] == {
+        "patient_id": "JOB-1",
+        "size": 6,
+    }
+    assert done["attempts"] == 1 and done["finished_at"]
+    assert failed["status"] == "failed" and failed["error"] == "decode failed"
+    assert list(tmp_path.iterdir()) == []
+
+def test_interrupted_jobs_are_requeued_on_start(tmp_path):
+    # Simulate a process that claimed the job and died mid-analysis.
+    job_id = JobRunner(_fake_run, spool_dir=str(tmp_path)).submit(
+        "JOB-2", "2024-01-01", b"x", "a.png"
+    )["job_id"]
+    with unit_of_work() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(
+            status="running", stage="cv", worker="elsewhere:1", attempts=1,
+            updated_at=datetime.utcnow() - timedelta(hours=1)))
+
+    runner = JobRunner(_fake_run, workers=1, spool_dir=str(tmp_path), stale_seconds=60)
+    runner.start()
+    try:
+        job = _wait(job_id)
+    finally:
+        runner.stop()
+    assert job["status"] == "succeeded" and job["attempts"] == 2
+
+def test_restart_requeues_jobs_once_their_heartbeat_stops(tmp_path):
+    # The previous process (another pid) died right after a heartbeat, so the
+    # job is not stale yet when the new process starts.
+    job_id = JobRunner(_fake_run, spool_dir=str(tmp_path)).submit(
+        "JOB-8", "2024-01-01", b"x", "a.png"
+    )["job_id"]
+    with unit_of_work() as db:
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status="running",
+                stage="cv",
+                worker="this-host:1",
+                attempts=1,
+                updated_at=datetime.utcnow(),
+            )
+        )
+
+    runner = JobRunner(
+        _fake_run,
+        workers=1,
+        spool_dir=str(tmp_path),
+        stale_seconds=0.3,
+        janitor_interval_s=0.1,
+    )
+    runner.start()
+    try:
+        assert get_job(job_id)["status"] == "running"
+        job = _wait(job_id)
+    finally:
+        runner.stop()
+    assert job["status"] == "succeeded" and job["attempts"] == 2
+
+def test_heartbeat_keeps_long_stages_from_being_requeued(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def slow_run(job, content, progress, complete):
+        runs.append(job["id"])
+        progress("cv")
+        started.set()
+        release.wait(5)
+        return {"ok": True}
+
+    runner = JobRunner(slow_run, workers=1, spool_dir=str(tmp_path), stale_seconds=0.2)
+    other = JobRunner(slow_run, spool_dir=str(tmp_path), stale_seconds=0.2)
+    other.worker_id = "elsewhere:1"
+    runner.start()
+    try:
+        job_id = runner.submit("JOB-6", "2024-01-01", b"x", "a.png")["job_id"]
+        assert started.wait(5)
+        # Longer than stale_seconds inside one stage, while another process's
+        # janitor runs.
+        for _ in range(3):
+            time.sleep(0.15)
+            other._recover()
+            assert get_job(job_id)["status"] == "running"
+        release.set()
+        job = _wait(job_id)
+    finally:
+        release.set()
+        runner.stop()
+    assert job["status"] == "succeeded" and job["attempts"] == 1
+    assert runs == [job_id]
+
+def test_requeued_job_result_is_not_written_by_the_old_worker(tmp_path):
+    runner = JobRunner(_fake_run, spool_dir=str(tmp_path))
+    job_id = runner.submit("JOB-7", "2024-01-01", b"x", "a.png")["job_id"]
+    job = runner._claim(job_id)
+    with unit_of_work() as db:
+        db.execute(
+            update(Job).where(Job.id == job_id).values(status="queued", stage="queued")
+        )
+    runner._finish(job, "succeeded", result={"stale": True})
+    assert get_job(job_id)["status"] == "queued" and get_job(job_id)["result"] is None
+    assert os.path.exists(job["upload_path"])
+
+def test_job_that_crashes_after_its_commit_stores_one_study(tmp_path):
+    runner = JobRunner(_storing_run, spool_dir=str(tmp_path))
+    job_id = runner.submit("JOB-9", "2024-01-01", b"x", "a.png")["job_id"]
+    with pytest.raises(_ProcessDied):
+        runner._run(job_id)
+
+    # The restarted process finds the job finished rather than interrupted.
+    restarted = JobRunner(_storing_run, workers=1, spool_dir=str(tmp_path))
+    restarted.worker_id = runner.worker_id
+    restarted.start()
+    try:
+        job = _wait(job_id)
+    finally:
+        restarted.stop()
+    assert job["status"] == "succeeded" and job["result"] == {"attempt": 1}
+    assert _study_count("JOB-9") == 1
+
+def test_requeued_job_rolls_back_the_old_workers_study(tmp_path):
+    runner = JobRunner(_storing_run, spool_dir=str(tmp_path))
+    job_id = runner.submit("JOB-10", "2024-01-01", b"x", "a.png")["job_id"]
+    job = runner._claim(job_id)
+    # Another process's janitor requeued the job and claimed it again.
+    with unit_of_work() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(worker="elsewhere:1"))
+    runner._run_claimed(job)
+    assert _study_count("JOB-10") == 0
+    assert get_job(job_id)["status"] == "running"
+
+def test_jobs_give_up_after_max_attempts(tmp_path):
+    job_id = JobRunner(_fake_run, spool_dir=str(tmp_path)).submit(
+        "JOB-3", "2024-01-01", b"x", "a.png"
+    )["job_id"]
+    with unit_of_work() as db:
+        db.execute(update(Job).where(Job.id == job_id).values(attempts=3))
+    runner = JobRunner(_fake_run, workers=1, spool_dir=str(tmp_path), max_attempts=3)
+    runner.start()
+    try:
+        job = _wait(job_id)
+    finally:
+        runner.stop()
+    assert job["status"] == "failed" and "3 interrupted attempts" in job["error"]
+
+def test_cleanup_removes_expired_jobs(tmp_path):
+    runner = JobRunner(_fake_run, spool_dir=str(tmp_path), retention_hours=1)
+    old = runner.submit("JOB-4", "2024-01-01", b"x", "a.png")["job_id"]
+    recent = runner.submit("JOB-4", "2024-01-02", b"x", "b.png")["job_id"]
+    with unit_of_work() as db:
+        db.execute(update(Job).where(Job.id == old).values(
+            status="succeeded", finished_at=datetime.utcnow() - timedelta(hours=2)))
+        db.execute(
+            update(Job)
+            .where(Job.id == recent)
+            .values(status="succeeded", finished_at=datetime.utcnow())
+        )
+    assert runner.cleanup() >= 1
+    assert get_job(old) is None and get_job(recent) is not None
+    assert [path.name for path in tmp_path.iterdir()] == [f"{recent}.upload"]
+
+def test_job_endpoints(tmp_path, monkeypatch):
+    runner = JobRunner(_fake_run, workers=1, spool_dir=str(tmp_path))
+    monkeypatch.setattr(jobs, "_job_runner", runner)
+    monkeypatch.setattr(main, "JOB_EVENTS_POLL_MS", 10)
+    runner.start()
+    try:
+        client = TestClient(main.app)
+        response = client.post(
+            "/api/jobs",
+            data={"patient_id": "JOB-5", "study_date": "2024-01-01"},
+            files={"image": ("a.png", b"pixels", "image/png")},
+        )
+        assert response.status_code == 202
+        body = response.json()
+        assert body["status_url"] == f"/api/jobs/{body['job_id']}"
+
+        events = client.get(f"/api/jobs/{body['job_id']}/events")
+        assert events.headers["content-type"].startswith("text/event-stream")
+        assert "event: succeeded" in events.text
+        job = client.get(body["status_url"]).json()
+        assert job["status"] == "succeeded" and job["result"]["size"] == 6
+    finally:
+        runner.stop()
+    assert client.get("/api/jobs/missing").status_code == 404
+    assert client.get("/api/jobs/missing/events").status_code == 404
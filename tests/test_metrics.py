@@ -0,0 +1,76 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import (
+    Histogram,
+    _metrics,
+    finish_request,
+    record,
+    server_timing,
+    span,
+    start_request,
+)
+
+client = TestClient(app)
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram(
+        "test_latency_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0)
+    )
+    _metrics.remove(histogram)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'a"b')
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{stage="a\\"b",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a\\"b",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="a\\"b",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="a\\"b"} 3' in lines
+
+def test_spans_accumulate_into_server_timing():
+    token = start_request()
+    for _ in range(2):
+        with span("cv"):
+            pass
+    timings = finish_request(token)
+    assert timings["cv"][1] == 2
+    assert re.fullmatch(
+        r"cv;dur=\d+\.\d\d, total;dur=12\.50", server_timing(timings, 0.0125)
+    )
+
+def test_pool_threads_of_one_request_do_not_lose_timings():
+    token = start_request()
+    context = contextvars.copy_context()
+
+    def work(_):
+        for _ in range(500):
+            record("decode", 0.001)
+
+    # As run_in_pool does: every task runs in a copy of the request context.
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: context.copy().run(work, i), range(8)))
+    timings = finish_request(token)
+    assert timings["decode"][1] == 4000
+
+def test_endpoints_report_server_timing_and_metrics():
+    response = client.get("/api/patient/DEMO001/timeline")
+    assert response.status_code == 200
+    assert re.search(
+        r'db;dur=[\d.]+;desc="\d+ queries"', response.headers["server-timing"]
+    )
+    assert "total;dur=" in response.headers["server-timing"]
+
+    metrics = client.get("/api/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    body = metrics.text
+    assert re.search(
+        r'radprogressor_http_requests_total\{method="GET",'
+        r'route="/api/patient/\{patient_id\}/timeline",status="200"\} \d+',
+        body,
+    )
+    assert "# TYPE radprogressor_http_request_duration_seconds histogram" in body
+    assert re.search(r"radprogressor_db_queries_total \d+", body)
+    assert 'radprogressor_cache_hits_total{cache="responses"}' in body
@@ -0,0 +1,201 @@
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+from app.models import nlp_model
+from app.models.nlp_model import (
+    classify_change,
+    classify_changes_batch,
+    match_change_words,
+)
+from app.services import inference
+from app.services.batching import MicroBatcher
+
+def test_negation_scope_ends_at_clause_boundary():
+    assert match_change_words("No new effusion. New opacity.")["worsened"] == ["new"]
+    assert classify_change("No evidence of new consolidation.") == ("stable", 0)
+    assert classify_change("No new effusion but worsened atelectasis") == (
+        "worsened",
+        1,
+    )
+
+def test_negation_scope_ends_at_comma():
+    assert classify_change("No pneumothorax, new left effusion.") == ("worsened", 1)
+    assert classify_change("Not significantly changed, worse consolidation.") == (
+        "worsened",
+        1,
+    )
+    assert classify_change("No effusion. New consolidation.") == ("worsened", 1)
+    assert classify_change("No new effusion, consolidation or pneumothorax.") == (
+        "stable",
+        0,
+    )
+
+def test_word_boundaries():
+    assert classify_change("Decreased effusion") == ("improved", -1)
+    assert classify_change("Renewed follow-up requested") == ("stable", 0)
+
+def test_rules_mode_does_not_import_transformers():
+    code = (
+        "import sys; from app.models.nlp_model import classify_change; "
+        "classify_change('Improved aeration'); assert 'transformers' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+_WORDS = [
+    "findings",
+    "impression",
+    "effusion",
+    "consolidation",
+    "opacity",
+    "new",
+    "worse",
+    "improved",
+    "stable",
+    "no",
+    "left",
+    "right",
+    "lung",
+    "base",
+    "small",
+    "large",
+]
+
+class _Recorder:
+    """Wraps the model and records the shape of every batch it is called with."""
+
+    def __init__(self, model):
+        self.model, self.shapes = model, []
+
+    def __call__(self, **batch):
+        self.shapes.append(tuple(batch["input_ids"].shape))
+        return self.model(**batch)
+
+@pytest.fixture
+def tiny_bert(tmp_path, monkeypatch):
+    from transformers import (
+        BertConfig,
+        BertForSequenceClassification,
+        BertTokenizerFast,
+    )
+
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text(
+        "\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ".", ":", *_WORDS])
+    )
+    tokenizer = BertTokenizerFast(vocab_file=str(vocab))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(_WORDS) + 7,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=128,
+        num_labels=3,
+    )
+    model = BertForSequenceClassification(config).eval()
+    # Centre the logits on sample reports so the label depends on the text.
+    with torch.inference_mode():
+        logits = model(
+            **tokenizer(_reports(32), padding=True, return_tensors="pt")
+        ).logits
+        model.classifier.bias.sub_(logits.mean(0))
+    recorder = _Recorder(model)
+    monkeypatch.setattr(nlp_model, "get_nlp_model", lambda: (recorder, tokenizer))
+    return recorder
+
+def _reports(count):
+    rng = torch.Generator().manual_seed(1)
+    return [
+        " ".join(
+            _WORDS[int(i)]
+            for i in torch.randint(2, len(_WORDS), (int(n),), generator=rng)
+        )
+        for n in torch.randint(3, 40, (count,), generator=rng)
+    ]
+
+def test_batched_classification_matches_single_reports(tiny_bert):
+    reports = _reports(12) + ["", "   "]
+    single = [classify_changes_batch([report], max_length=64)[0] for report in reports]
+    assert len(set(single[:-2])) > 1
+    assert classify_changes_batch(reports, batch_size=4, max_length=64) == single
+    assert (
+        classify_changes_batch(reports, batch_size=4, max_length=64, bucket=False)
+        == single
+    )
+    assert single[-2:] == [("stable", 0), ("stable", 0)]
+
+def test_length_bucketing_pads_less(tiny_bert):
+    reports = _reports(16)
+    classify_changes_batch(reports, batch_size=4, max_length=64, bucket=False)
+    unbucketed, tiny_bert.shapes = tiny_bert.shapes, []
+    classify_changes_batch(reports, batch_size=4, max_length=64)
+    assert sum(rows * length for rows, length in tiny_bert.shapes) < sum(
+        rows * length for rows, length in unbucketed
+    )
+
+def test_long_reports_are_split_into_averaged_windows(tiny_bert):
+    report = " ".join(_WORDS[i % len(_WORDS)] for i in range(100))
+    result = classify_changes_batch([report], batch_size=8, max_length=32)
+    (rows, length), = tiny_bert.shapes
+    assert rows > 1 and length <= 32
+
+    # Same windows by hand: the label comes from the mean of their logits.
+    model, tokenizer = nlp_model.get_nlp_model()
+    encoded = tokenizer(
+        [nlp_model.model_input_text(report)],
+        truncation=True,
+        max_length=32,
+        stride=8,
+        return_overflowing_tokens=True,
+    )
+    assert len(encoded["input_ids"]) == rows
+    with torch.inference_mode():
+        logits = torch.cat(
+            [
+                model(**tokenizer.pad({"input_ids": [ids]}, return_tensors="pt")).logits
+                for ids in encoded["input_ids"]
+            ]
+        )
+    label = nlp_model.CHANGE_LABELS[int(logits.mean(0).argmax())]
+    assert result == [(label, nlp_model.CHANGE_DELTAS[label])]
+
+def test_classify_report_through_the_micro_batcher(tiny_bert, monkeypatch):
+    reports = _reports(8)
+    expected = [classify_changes_batch([report])[0] for report in reports]
+    batcher = MicroBatcher(
+        classify_changes_batch, max_batch_size=4, max_wait_ms=20, name="nlp-test"
+    )
+    monkeypatch.setattr(inference, "NLP_MODE", "transformer")
+    monkeypatch.setattr(inference, "NLP_BATCHING_ENABLED", True)
+    monkeypatch.setattr(inference, "get_nlp_batcher", lambda: batcher)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert list(pool.map(inference.classify_report, reports)) == expected
+    finally:
+        batcher.close()
+    assert batcher.stats()["batches"] < len(reports)
+
+def test_concurrent_first_calls_load_the_model_once(monkeypatch):
+    loads = []
+
+    class _Model:
+        pass
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        return _Model(), "tokenizer"
+
+    monkeypatch.setattr(nlp_model, "_nlp_model", None)
+    monkeypatch.setattr(nlp_model, "_tokenizer", None)
+    monkeypatch.setattr(nlp_model, "_load_nlp_model", slow_load)
+    with ThreadPoolExecutor(8) as pool:
+        loaded = list(pool.map(lambda _: nlp_model.get_nlp_model(), range(8)))
+    assert len(loads) == 1
+    assert all(pair == loaded[0] for pair in loaded)
@@ -0,0 +1,40 @@
+import io
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.models.cv_model import (
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    preprocess_array,
+    preprocess_batch,
+    preprocess_image,
+)
+from app.services.parsing import normalize_pixels, png_jpg_pixels
+
+def test_preprocess_batch_shape_and_normalization():
+    pixels = np.full((300, 256), 0.5, dtype=np.float32)
+    tensor = preprocess_batch([pixels, np.zeros((224, 224), dtype=np.float32)])
+    assert tensor.shape == (2, 3, 224, 224)
+    for channel, (mean, std) in enumerate(zip(IMAGENET_MEAN, IMAGENET_STD)):
+        assert torch.allclose(
+            tensor[0, channel], torch.tensor((0.5 - mean) / std), atol=1e-5
+        )
+        assert torch.allclose(tensor[1, channel], torch.tensor(-mean / std), atol=1e-5)
+
+def test_tensor_path_matches_pil_path():
+    rng = np.random.default_rng(0)
+    gray = (rng.random((224, 224)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(gray, mode="L").save(buffer, format="PNG")
+    pil_tensor = preprocess_image(Image.open(io.BytesIO(buffer.getvalue())))
+    array_tensor = preprocess_array(png_jpg_pixels(buffer.getvalue()))
+    assert torch.allclose(pil_tensor, array_tensor, atol=1e-5)
+
+def test_normalize_pixels_keeps_bit_depth():
+    pixels = normalize_pixels(np.array([[0, 1, 4095]], dtype=np.uint16))
+    assert pixels.dtype == np.float32
+    assert pixels[0, 1] > 0
+    assert pixels[0, 1] < 1 / 255
+    assert normalize_pixels(np.ones((2, 2), dtype=np.uint16)).max() == 0
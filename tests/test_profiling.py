@@ -0,0 +1,108 @@
+import json
+import os
+import pstats
+
+import threading
+
+import torch
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import inference, profiling
+from app.services.profiling import Profiler, capturing
+
+def test_capture_saves_chrome_trace_and_pstats(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=0.0)
+    with profiler.capture("analyze") as profile_id:
+        torch.ones(64, 64) @ torch.ones(64, 64)
+
+    profiles = profiler.list()
+    assert [profile["id"] for profile in profiles] == [profile_id]
+    assert profiles[0]["files"] == [f"{profile_id}.pstats", f"{profile_id}.trace.json"]
+    with open(profiler.path(f"{profile_id}.trace.json")) as f:
+        assert "traceEvents" in json.load(f)
+    assert pstats.Stats(profiler.path(f"{profile_id}.pstats")).total_calls > 0
+    assert (
+        profiler.path("../secret.pstats") is None
+        and profiler.path("missing.pstats") is None
+    )
+
+def test_overlapping_capture_is_skipped(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    with profiler.capture("outer") as outer, profiler.capture("inner") as inner:
+        pass
+    assert outer is not None and inner is None
+
+def test_header_arming_and_sampling(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=0.0, token="secret")
+    assert not profiler.should_profile("1")
+    assert profiler.should_profile("secret")
+    profiler.arm(2)
+    assert [profiler.should_profile(None) for _ in range(3)] == [True, True, False]
+    assert Profiler(str(tmp_path), sample_rate=1.0).should_profile(None)
+
+def test_rotation_drops_oldest_profiles(tmp_path):
+    for i, name in enumerate(["old", "mid", "new"]):
+        for suffix in ("trace.json", "pstats"):
+            path = tmp_path / f"{name}.{suffix}"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+    Profiler(str(tmp_path), max_bytes=450).rotate()
+    assert sorted(os.listdir(tmp_path)) == [
+        "mid.pstats",
+        "mid.trace.json",
+        "new.pstats",
+        "new.trace.json",
+    ]
+
+def test_profiled_calls_bypass_the_batcher_thread(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(inference, "CV_BATCHING_ENABLED", True)
+    monkeypatch.setattr(
+        inference, "get_cv_batcher", lambda: lambda image: calls.append("batcher")
+    )
+    monkeypatch.setattr(
+        inference,
+        "predict",
+        lambda image: calls.append(threading.current_thread().name),
+    )
+    profiler = Profiler(str(tmp_path))
+    assert not capturing()
+    with profiler.capture("analyze"):
+        assert capturing()
+        inference._predict_uncached(None)
+    assert not capturing()
+    inference._predict_uncached(None)
+    assert calls == [threading.current_thread().name, "batcher"]
+
+def test_profile_endpoints_require_token_and_enabled_profiling(tmp_path, monkeypatch):
+    (tmp_path / "p1.pstats").write_bytes(b"x")
+    monkeypatch.setattr(profiling, "_profiler", Profiler(str(tmp_path), token="secret"))
+    client = TestClient(main.app)
+    requests = [
+        ("post", "/api/profiles/arm"),
+        ("get", "/api/profiles"),
+        ("get", "/api/profiles/p1.pstats"),
+    ]
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", False)
+    for method, url in requests:
+        assert (
+            getattr(client, method)(url, headers={"X-Profile": "secret"}).status_code
+            == 403
+        )
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    for method, url in requests:
+        assert getattr(client, method)(url).status_code == 403
+        assert (
+            getattr(client, method)(url, headers={"X-Profile": "wrong"}).status_code
+            == 403
+        )
+        assert (
+            getattr(client, method)(url, headers={"X-Profile": "secret"}).status_code
+            == 200
+        )
+
+    monkeypatch.setattr(profiling, "_profiler", Profiler(str(tmp_path), token=None))
+    assert client.get("/api/profiles", headers={"X-Profile": "1"}).status_code == 403
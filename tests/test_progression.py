@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+from app.models.progression import (
+    build_trend,
+    slope_per_year,
+    summarize_trend,
+    trend_summary,
+    update_trend,
+)
+
+def test_summarize_trend_matches_trend_summary():
+    series = [("2024-01-01", 0.2), ("2024-02-01", 0.5), ("2024-03-01", 0.45)]
+    for n in range(len(series) + 1):
+        assert summarize_trend(build_trend(series[:n])) == trend_summary(series[:n])
+
+def test_update_trend_is_order_independent_except_ewma():
+    series = [(f"2024-{month:02d}-01", month / 20) for month in range(1, 13)]
+    shuffled = series[:]
+    random.Random(0).shuffle(shuffled)
+    expected = build_trend(series)
+    actual = build_trend(shuffled)
+    for field in expected:
+        if field != "ewma":
+            assert actual[field] == pytest.approx(expected[field])
+
+def test_slope_per_year():
+    trend = build_trend([("2023-01-01", 0.2), ("2024-01-01", 0.4), ("2025-01-01", 0.6)])
+    assert slope_per_year(trend) == pytest.approx(0.2, rel=1e-2)
+    assert slope_per_year(update_trend(build_trend([]), "2024-01-01", 0.5)) is None
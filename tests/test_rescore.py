@@ -0,0 +1,96 @@
+import importlib.util
+import os
+import uuid
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models.progression import score, score_array
+from app.services.storage import (
+    SessionLocal,
+    Study,
+    get_trend,
+    insert_studies,
+    score_weights,
+    unit_of_work,
+)
+
+_spec = importlib.util.spec_from_file_location(
+    "rescore",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "rescore.py"),
+)
+rescore = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(rescore)
+
+def _seed(patient_id):
+    rows = [
+        {
+            "patient_id": patient_id,
+            "study_date": f"2022-0{i + 1}-01",
+            "cv_result": {"labels": {}, "severity_score": severity},
+            "nlp_result": {"delta": delta},
+            "progression_score": score(severity, delta),
+        }
+        for i, (severity, delta) in enumerate([(0.2, 0), (0.5, 1), (0.4, -1), (0.9, 1)])
+    ]
+    with unit_of_work() as db:
+        insert_studies(db, rows)
+
+def _scores(patient_id):
+    with SessionLocal() as db:
+        return db.execute(
+            select(Study.progression_score, Study.score_version)
+            .where(Study.patient_id == patient_id)
+            .order_by(Study.study_date)
+        ).all()
+
+def test_score_array_matches_score():
+    severity = np.linspace(0.0, 1.0, 21)
+    for delta in (-1, 0, 1):
+        for alpha, beta in ((0.7, 0.3), (0.5, 0.8), (1.0, 0.0)):
+            expected = [score(s, delta, alpha, beta) for s in severity]
+            assert (
+                score_array(
+                    severity, np.full(len(severity), delta), alpha, beta
+                ).tolist()
+                == expected
+            )
+
+def test_dry_run_reports_shift_without_writing():
+    patient_id = f"RESCORE-{uuid.uuid4().hex[:8]}"
+    _seed(patient_id)
+    before = _scores(patient_id)
+    summary = rescore.rescore(
+        0.5, 0.5, chunk_size=3, dry_run=True, patient_ids=[patient_id]
+    )
+    assert (
+        summary["studies"] == 4
+        and summary["changed"] == 4
+        and summary["rewritten"] == 0
+    )
+    assert summary["after"]["count"] == 4 and sum(summary["after"]["histogram"]) == 4
+    assert summary["shift"]["max_abs"] > 0
+    assert _scores(patient_id) == before
+    assert (0.5, 0.5) not in {(w["alpha"], w["beta"]) for w in score_weights()}
+
+def test_rescore_writes_versioned_scores_and_rebuilds_trends():
+    patient_id = f"RESCORE-{uuid.uuid4().hex[:8]}"
+    _seed(patient_id)
+    summary = rescore.rescore(0.4, 0.6, chunk_size=3, patient_ids=[patient_id])
+    assert summary["rewritten"] == 4 and summary["patients_rebuilt"] == 1
+    expected = [
+        score(s, d, 0.4, 0.6) for s, d in [(0.2, 0), (0.5, 1), (0.4, -1), (0.9, 1)]
+    ]
+    rows = _scores(patient_id)
+    assert [value for value, _ in rows] == expected
+    assert {version for _, version in rows} == {summary["score_version"]}
+    assert get_trend(patient_id)["last_score"] == expected[-1]
+    assert any(
+        w["version"] == summary["score_version"] and w["studies"] >= 4
+        for w in score_weights()
+    )
+
+    again = rescore.rescore(0.4, 0.6, chunk_size=3, patient_ids=[patient_id])
+    assert (
+        again["rewritten"] == 0 and again["score_version"] == summary["score_version"]
+    )
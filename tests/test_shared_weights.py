@@ -0,0 +1,45 @@
+import os
+
+import torch
+import torch.nn as nn
+
+from app.models.shared_weights import load_shared, weights_path
+from app.services.memory import _mapped_files, memory_report
+
+def _net() -> nn.Module:
+    return nn.Sequential(nn.Linear(256, 256), nn.BatchNorm1d(256), nn.Linear(256, 4))
+
+def test_weights_are_built_once_and_mapped_from_the_file(tmp_path):
+    torch.manual_seed(0)
+    reference = _net().eval()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return reference
+
+    first = load_shared("toy", build, _net, str(tmp_path))
+    second = load_shared("toy", build, _net, str(tmp_path))
+    assert len(builds) == 1
+    x = torch.randn(3, 256)
+    with torch.inference_mode():
+        assert torch.equal(first(x), reference(x)) and torch.equal(
+            second(x), reference(x)
+        )
+    assert not any(p.requires_grad for p in second.parameters())
+
+    mapped = _mapped_files(os.path.realpath(tmp_path) + os.sep)
+    assert os.path.realpath(weights_path("toy", str(tmp_path))) in mapped
+
+def test_writes_stay_private_to_the_process(tmp_path):
+    model = load_shared("toy", _net, _net, str(tmp_path))
+    with torch.no_grad():
+        model[0].weight.fill_(7.0)
+    state = torch.load(weights_path("toy", str(tmp_path)), weights_only=True)
+    assert not torch.equal(state["0.weight"], model[0].weight)
+
+def test_memory_report_has_rss_and_pss():
+    report = memory_report()
+    assert report["pid"] == os.getpid()
+    assert report["rss_bytes"] >= report["pss_bytes"] > 0
+    assert "shared_weights" in report
@@ -1,11 +1,43 @@
 import pytest
 import requests
+import io
 import json
+import threading
+import time
+import numpy as np
 from fastapi.testclient import TestClient
+from PIL import Image
+from app import main
 from app.main import app
+from app.services import warmup
+from app.services.storage import add_studies, get_trend
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def demo_patient():
+    # The timeline and snapshot checks need DEMO001 (normally seeded by
+    # scripts/seed_demo.py).
+    if get_trend("DEMO001")["study_count"] == 0:
+        add_studies(
+            [
+                {
+                    "patient_id": "DEMO001",
+                    "study_date": "2024-01-01",
+                    "progression_score": 0.3,
+                    "cv_result": {"labels": {"effusion": 0.3}, "severity_score": 0.3},
+                    "nlp_result": {"sections": {}, "change": "stable", "delta": 0},
+                    "genai_result": {"clinician_summary": "", "patient_summary": ""},
+                }
+            ]
+        )
+
+def _test_image() -> bytes:
+    y, x = np.mgrid[0:256, 0:256]
+    buffer = io.BytesIO()
+    Image.fromarray(((x + y) % 256).astype(np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
 def test_health_endpoint():
     response = client.get("/api/health")
     assert response.status_code == 200
@@ -18,9 +50,8 @@ def test_analyze_endpoint():
         "report": "FINDINGS: No acute findings. IMPRESSION: Normal chest X-ray."
     }
     
-    with open("data/samples/test_image.png", "rb") as f:
-        files = {"image": ("test.png", f, "image/png")}
-        response = client.post("/api/analyze", data=test_data, files=files)
+    files = {"image": ("test.png", _test_image(), "image/png")}
+    response = client.post("/api/analyze", data=test_data, files=files)
     
     assert response.status_code == 200
     result = response.json()
@@ -43,3 +74,26 @@ def test_snapshot_endpoint():
     assert "patient_id" in result
     assert "last_study" in result
     assert "timeline_summary" in result
+
+def test_ready_endpoint(monkeypatch):
+    release = threading.Event()
+
+    def slow_warm_up():
+        release.wait(10)
+        warmup.mark_ready()
+
+    monkeypatch.setattr(warmup, "_ready", threading.Event())
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(main, "warm_up", slow_warm_up)
+    with TestClient(app) as c:
+        response = c.get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False and "stages_ms" in response.json()
+        assert c.get("/api/health").status_code == 200
+
+        release.set()
+        deadline = time.monotonic() + 10
+        while c.get("/api/ready").status_code != 200:
+            assert time.monotonic() < deadline, "warm-up never marked the app ready"
+            time.sleep(0.01)
+        assert c.get("/api/ready").json()["ready"] is True
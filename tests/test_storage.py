@@ -0,0 +1,241 @@
+import json
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, create_mock_engine, func, inspect, select
+from sqlalchemy.dialects import postgresql
+
+from app.models.progression import build_trend
+from app.services.migrations import migrate
+from app.services.storage import (
+    Base,
+    Patient,
+    _backfill_studies,
+    _upsert_insert,
+    add_studies,
+    check_upsert_dialect,
+    engine,
+    get_score_history,
+    get_timeline,
+    get_trend,
+    insert_studies,
+    rebuild_trends,
+    unit_of_work,
+    upsert_patients,
+)
+
+LEGACY_STUDIES = """
+CREATE TABLE studies (
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR NOT NULL,
+    study_date VARCHAR NOT NULL,
+    cv_result JSON,
+    nlp_result JSON,
+    progression_score FLOAT,
+    genai_result JSON,
+    created_at DATETIME
+)
+"""
+
+def _study(patient_id, study_date, score, change="stable", delta=0):
+    return {
+        "patient_id": patient_id,
+        "study_date": study_date,
+        "cv_result": {
+            "labels": {"effusion": score, "pneumonia": 0.1},
+            "severity_score": score,
+        },
+        "nlp_result": {"sections": {}, "change": change, "delta": delta},
+        "progression_score": score,
+        "genai_result": {"clinician_summary": "x" * 1000},
+    }
+
+def test_migrates_and_backfills_legacy_database(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_STUDIES)
+    conn.execute(
+        "INSERT INTO studies (patient_id, study_date, cv_result, nlp_result, "
+        "progression_score) VALUES (?, ?, ?, ?, ?)",
+        (
+            "P1",
+            "2024-01-01",
+            json.dumps({"labels": {"effusion": 0.4}, "severity_score": 0.4}),
+            json.dumps({"change": "worsened", "delta": 1}),
+            0.5,
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    summary = migrate(
+        engine,
+        Base.metadata,
+        backfills={"studies": _backfill_studies, "patient_trends": rebuild_trends},
+    )
+    assert "patient_trends" in summary["created_tables"]
+    assert "p_effusion" in summary["added_columns"]["studies"]
+    assert summary["backfilled_rows"] == {"studies": 1, "patient_trends": 1}
+    assert "ix_studies_patient_date" in summary["created_indexes"]
+    assert {index["name"] for index in inspect(engine).get_indexes("studies")} >= {
+        "ix_studies_patient_date"
+    }
+
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(
+            "SELECT severity_score, change, delta, p_effusion, p_pneumonia FROM studies"
+        ).one()
+        trend = conn.exec_driver_sql(
+            "SELECT study_count, last_score FROM patient_trends"
+        ).one()
+    assert tuple(row) == (0.4, "worsened", 1, 0.4, None)
+    assert tuple(trend) == (1, 0.5)
+
+    again = migrate(
+        engine,
+        Base.metadata,
+        backfills={"studies": _backfill_studies},
+        resumable=("studies",),
+    )
+    assert again == {
+        "created_tables": [],
+        "added_columns": {},
+        "backfilled_rows": {},
+        "created_indexes": [],
+    }
+
+def test_interrupted_backfill_resumes_on_next_start(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_STUDIES)
+    conn.executemany(
+        "INSERT INTO studies (patient_id, study_date, cv_result, nlp_result) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (
+                "P1",
+                f"2024-01-0{i}",
+                json.dumps({"labels": {}, "severity_score": i / 10}),
+                json.dumps({"delta": 0}),
+            )
+            for i in range(1, 4)
+        ]
+        + [("P1", "2024-01-04", None, None)],
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+
+    def interrupted_backfill(bind):
+        # Fills the first row, then the process dies before the rest.
+        _backfill_studies(bind, chunk_size=1)
+        with bind.begin() as conn:
+            conn.exec_driver_sql(
+                "UPDATE studies SET severity_score = NULL WHERE id > 1"
+            )
+        raise RuntimeError("killed mid-backfill")
+
+    with pytest.raises(RuntimeError):
+        migrate(engine, Base.metadata, backfills={"studies": interrupted_backfill})
+    summary = migrate(
+        engine,
+        Base.metadata,
+        backfills={"studies": _backfill_studies},
+        resumable=("studies",),
+    )
+    assert summary["added_columns"] == {} and summary["backfilled_rows"] == {
+        "studies": 2
+    }
+    with engine.connect() as conn:
+        severities = (
+            conn.exec_driver_sql("SELECT severity_score FROM studies ORDER BY id")
+            .scalars()
+            .all()
+        )
+    assert severities == [0.1, 0.2, 0.3, None]
+
+    # Once finished, later starts skip the scan, even for rows still unfilled.
+    scans = []
+
+    def counting_backfill(bind):
+        scans.append(bind)
+        return _backfill_studies(bind)
+
+    again = migrate(
+        engine,
+        Base.metadata,
+        backfills={"studies": counting_backfill},
+        resumable=("studies",),
+    )
+    assert again["backfilled_rows"] == {} and scans == []
+
+def test_timeline_reads_denormalized_columns():
+    patient_id = f"STORAGE-{uuid.uuid4().hex[:8]}"
+    add_studies(
+        [
+            _study(patient_id, "2024-02-01", 0.6, "worsened", 1),
+            _study(patient_id, "2024-01-01", 0.3),
+        ]
+    )
+
+    timeline = get_timeline(patient_id)
+    assert [entry["date"] for entry in timeline] == ["2024-01-01", "2024-02-01"]
+    assert timeline[1] == {
+        "date": "2024-02-01",
+        "progression_score": 0.6,
+        "key_labels": {"effusion": 0.6, "pneumonia": 0.1},
+        "change": "worsened",
+    }
+    assert get_score_history(patient_id) == [("2024-01-01", 0.3), ("2024-02-01", 0.6)]
+
+def test_sqlite_runs_in_wal_mode():
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == "wal"
+
+def test_unit_of_work_upserts_and_rolls_back():
+    patient_id = f"UOW-{uuid.uuid4().hex[:8]}"
+    with unit_of_work() as db:
+        upsert_patients(db, [patient_id, patient_id])
+        upsert_patients(db, [patient_id])
+    with unit_of_work() as db:
+        assert (
+            db.scalar(select(func.count()).where(Patient.patient_id == patient_id)) == 1
+        )
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work() as db:
+            insert_studies(db, [_study(patient_id, "2024-01-01", 0.5)])
+            raise RuntimeError("abort")
+    assert get_timeline(patient_id) == []
+
+def test_trend_state_tracks_inserts_in_any_date_order():
+    patient_id = f"TREND-{uuid.uuid4().hex[:8]}"
+    add_studies(
+        [_study(patient_id, "2024-03-01", 0.5), _study(patient_id, "2024-01-01", 0.2)]
+    )
+    add_studies([_study(patient_id, "2024-04-01", 0.7)])
+    add_studies([_study(patient_id, "2024-02-01", 0.4)])
+
+    trend = get_trend(patient_id)
+    assert trend == build_trend(get_score_history(patient_id))
+    assert (trend["study_count"], trend["first_date"], trend["last_date"]) == (
+        4,
+        "2024-01-01",
+        "2024-04-01",
+    )
+    assert (trend["prev_score"], trend["last_score"]) == (0.5, 0.7)
+
+def test_upserts_follow_the_engine_dialect():
+    statement = _upsert_insert(Patient, create_mock_engine("postgresql://", None))
+    sql = str(
+        statement.on_conflict_do_nothing(index_elements=["patient_id"]).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "ON CONFLICT (patient_id) DO NOTHING" in sql
+    check_upsert_dialect(engine)
+    with pytest.raises(RuntimeError, match="mssql"):
+        check_upsert_dialect(create_mock_engine("mssql://", None))
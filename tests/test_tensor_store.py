@@ -0,0 +1,171 @@
+import importlib.util
+import os
+import time
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.models.cv_model import resize_batch
+from app.services import inference, tensor_store
+from app.models.progression import score
+from app.services.storage import (
+    SessionLocal,
+    Study,
+    StudyTensor,
+    get_score_history,
+    get_trend,
+    insert_studies,
+    record_tensors,
+    unit_of_work,
+)
+from app.services.tensor_store import TensorStore, compact
+
+_spec = importlib.util.spec_from_file_location(
+    "reprocess",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "reprocess.py"),
+)
+reprocess = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(reprocess)
+
+def _planes(count, size=8):
+    return (
+        np.arange(count * size * size, dtype=np.float32).reshape(count, size, size)
+        / 1000
+    )
+
+def test_append_spans_chunks_and_reads_consecutive_rows_without_copying(tmp_path):
+    store = TensorStore(str(tmp_path), chunk_rows=4, size=8)
+    positions = store.append(_planes(6))
+    assert [(chunk, row) for chunk, row, _ in positions] == [
+        (1, 0),
+        (1, 1),
+        (1, 2),
+        (1, 3),
+        (2, 0),
+        (2, 1),
+    ]
+    assert store.append(_planes(1))[0][:2] == (2, 2)
+
+    view = store.read([(1, 1), (1, 2), (1, 3)])
+    assert np.shares_memory(view, store._map(1, 4))
+    np.testing.assert_array_equal(view, _planes(6)[1:4])
+    np.testing.assert_array_equal(store.read([(1, 3), (2, 0)]), _planes(6)[3:5])
+    assert store.mismatches(view, [crc for _, _, crc in positions[1:4]]) == []
+
+    with open(store.chunk_path(2), "r+b") as f:
+        f.seek(10)
+        f.write(b"\xff")
+    planes = store.read([(2, 0), (2, 1)])
+    assert store.mismatches(planes, [crc for _, _, crc in positions[4:6]]) == [0]
+
+def test_layout_is_fixed_once_written(tmp_path):
+    TensorStore(str(tmp_path), chunk_rows=4, size=8)
+    with pytest.raises(ValueError):
+        TensorStore(str(tmp_path), dtype="float16", chunk_rows=4, size=8)
+
+def test_analyzed_studies_are_stored_and_reprocessed(tmp_path, monkeypatch):
+    store = TensorStore(str(tmp_path))
+    monkeypatch.setattr(inference, "TENSOR_STORE_ENABLED", True)
+    monkeypatch.setattr(tensor_store, "_store", store)
+    monkeypatch.setattr(inference, "predict_images",
+                        lambda images: [({"effusion": 0.1}, 0.1) for _ in images])
+    patient_id = f"TENSORS-{uuid.uuid4().hex[:8]}"
+    images = [np.full((64, 64), i / 4, dtype=np.float32) for i in range(3)]
+    results = inference.analyze_study_batch(
+        [
+            {
+                "patient_id": patient_id,
+                "study_date": f"2021-0{i + 1}-01",
+                "image": image,
+            }
+            for i, image in enumerate(images)
+        ]
+    )
+    assert len(results) == 3
+
+    with SessionLocal() as db:
+        entries = (
+            db.execute(
+                select(StudyTensor)
+                .join(Study, Study.id == StudyTensor.study_id)
+                .where(Study.patient_id == patient_id)
+                .order_by(StudyTensor.row)
+            )
+            .scalars()
+            .all()
+        )
+    planes = store.read([(entry.chunk, entry.row) for entry in entries])
+    np.testing.assert_array_equal(planes, resize_batch(images)[:, 0].numpy())
+
+    monkeypatch.setattr(
+        reprocess,
+        "predict_resized",
+        lambda resized: [
+            ({"effusion": float(plane.mean())}, float(plane.mean()))
+            for plane in resized
+        ],
+    )
+    summary = reprocess.reprocess(store, batch_size=2, patient_ids=[patient_id])
+    assert (
+        summary["studies"] == 3
+        and summary["corrupt"] == 0
+        and summary["patients_rebuilt"] == 1
+    )
+    expected = [score(severity, 0) for severity in (0.0, 0.25, 0.5)]
+    assert [
+        progression for _, progression in get_score_history(patient_id)
+    ] == pytest.approx(expected, abs=1e-6)
+    assert get_trend(patient_id)["last_score"] == pytest.approx(expected[-1], abs=1e-6)
+
+def test_compact_spares_recent_chunks_and_reprocess_flags_missing_rows(tmp_path):
+    store = TensorStore(str(tmp_path), chunk_rows=2, size=8)
+    # Start at a chunk number no other test indexes; the index table is shared.
+    open(store.chunk_path(500), "wb").close()
+    positions = store.append(_planes(5))
+    assert [chunk for chunk, _, _ in positions] == [500, 500, 501, 501, 502]
+    patient_id = f"COMPACT-{uuid.uuid4().hex[:8]}"
+    live = [0, 2, 3, 4]  # row (500, 1) is never indexed, as after a rollback
+    with unit_of_work() as db:
+        ids = insert_studies(
+            db,
+            [
+                {
+                    "patient_id": patient_id,
+                    "study_date": f"2020-0{i + 1}-01",
+                    "progression_score": 0.5,
+                }
+                for i in live
+            ],
+        )
+        record_tensors(
+            db,
+            [
+                {"study_id": study_id, "chunk": chunk, "row": row, "crc32": crc}
+                for study_id, (chunk, row, crc) in zip(
+                    ids, [positions[i] for i in live]
+                )
+            ],
+        )
+
+    summary = compact(store, grace_seconds=3600)
+    assert summary["chunks_removed"] == 0 and summary["chunks_in_grace_period"] == 2
+    assert os.path.exists(store.chunk_path(500))
+
+    old = time.time() - 7200
+    for chunk in (500, 501):
+        os.utime(store.chunk_path(chunk), (old, old))
+    summary = compact(store, grace_seconds=3600)
+    assert summary["chunks_removed"] == 1 and summary["rows_moved"] == 1
+    assert not os.path.exists(store.chunk_path(500))
+    with SessionLocal() as db:
+        moved = db.get(StudyTensor, ids[0])
+    plane = store.read([(moved.chunk, moved.row)])[0]
+    np.testing.assert_array_equal(plane, _planes(1)[0])
+
+    os.remove(store.chunk_path(501))
+    store.forget([501])
+    summary = reprocess.reprocess(store, verify_only=True, patient_ids=[patient_id])
+    assert summary["studies"] == 4 and summary["corrupt"] == 2
+    assert sorted(summary["corrupt_study_ids"]) == sorted(ids[1:3])
@@ -0,0 +1,98 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.storage import (
+    add_studies,
+    decode_cursor,
+    encode_cursor,
+    timeline_page,
+)
+
+client = TestClient(app)
+
+def _seed(dates):
+    patient_id = f"TL-{uuid.uuid4().hex[:8]}"
+    add_studies(
+        [
+            {
+                "patient_id": patient_id,
+                "study_date": date,
+                "progression_score": i / 10,
+                "cv_result": {"labels": {"effusion": i / 10}, "severity_score": i / 10},
+                "nlp_result": {"change": "worsened", "delta": 1},
+                "genai_result": {},
+            }
+            for i, date in enumerate(dates)
+        ]
+    )
+    return patient_id
+
+def test_cursor_pages_cover_history_once():
+    # Two studies share a date, so the cursor has to break ties on id.
+    patient_id = _seed(
+        ["2024-01-01", "2024-02-01", "2024-02-01", "2024-03-01", "2024-04-01"]
+    )
+    seen, cursor = [], None
+    while True:
+        page, cursor = timeline_page(
+            patient_id, fields=("date", "progression_score"), cursor=cursor, limit=2
+        )
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert [entry["progression_score"] for entry in seen] == [0.0, 0.1, 0.2, 0.3, 0.4]
+    assert set(seen[0]) == {"date", "progression_score"}
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor("2024-01-01", 42)) == ("2024-01-01", 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_timeline_endpoint_filters_and_fields():
+    patient_id = _seed(["2024-01-01", "2024-02-01", "2024-03-01"])
+    body = client.get(
+        f"/api/patient/{patient_id}/timeline",
+        params={"since": "2024-02-01", "fields": "date,change,delta"},
+    ).json()
+    assert body["timeline"] == [
+        {"date": "2024-02-01", "change": "worsened", "delta": 1},
+        {"date": "2024-03-01", "change": "worsened", "delta": 1},
+    ]
+    assert body["next_cursor"] is None
+
+    default = client.get(f"/api/patient/{patient_id}/timeline").json()["timeline"]
+    assert set(default[0]) == {"date", "progression_score", "key_labels", "change"}
+
+    assert (
+        client.get(
+            f"/api/patient/{patient_id}/timeline", params={"fields": "genai_result"}
+        ).status_code
+        == 400
+    )
+    assert (
+        client.get(
+            f"/api/patient/{patient_id}/timeline", params={"cursor": "bogus"}
+        ).status_code
+        == 400
+    )
+
+def test_timeline_ndjson_stream():
+    patient_id = _seed(["2024-01-01", "2024-02-01", "2024-03-01"])
+    response = client.get(
+        f"/api/patient/{patient_id}/timeline", params={"format": "ndjson", "limit": 2}
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("date") for line in lines[:2]] == ["2024-01-01", "2024-02-01"]
+    rest = client.get(
+        f"/api/patient/{patient_id}/timeline",
+        params={"format": "ndjson", "cursor": lines[2]["next_cursor"]},
+    ).text.splitlines()
+    assert [json.loads(line)["date"] for line in rest] == ["2024-03-01"]
+
+    empty = client.get("/api/patient/NOBODY/timeline", params={"format": "ndjson"})
+    assert empty.status_code == 200 and empty.text == ""